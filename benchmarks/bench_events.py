@@ -0,0 +1,37 @@
+"""Event throughput: ACP callbacks dispatched through the engine and its
+event bus (to the console sink) per second."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.trace import IterationSpan
+
+
+async def _drive(engine: RalphEngine, events: int) -> float:
+    ev = engine.client.events
+    chunk = "x" * 63 + "\n"
+    output = engine._start_output()
+    t0 = time.perf_counter()
+    for n in range(events // 3):
+        await ev.on_text(chunk)
+        await ev.on_tool_start(f"t{n}", "Bash", {})
+        await ev.on_tool_end(f"t{n}", "completed", None)
+    await engine.bus.close()
+    elapsed = time.perf_counter() - t0
+    await engine._close_output(output)
+    return elapsed
+
+
+def run(events: int = 300_000) -> dict[str, float]:
+    engine = RalphEngine(LoopConfig(prompt="bench", output="quiet"))
+    engine._span = IterationSpan(iteration=1)
+    elapsed = asyncio.run(_drive(engine, events))
+    return {"events.per_second": round(events / elapsed)}
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,48 @@
+"""Per-iteration loop overhead and memory against the bundled fake agent."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import tempfile
+import tracemalloc
+
+from ralph.engine import LoopConfig, RalphEngine
+
+
+def run(iterations: int = 50, chunks: int = 200) -> dict[str, float]:
+    """Run a loop that never completes and report per-iteration cost.
+
+    The fake agent streams without delays, so the time per iteration is
+    almost entirely ralph + ACP client overhead.
+    """
+    with tempfile.TemporaryDirectory() as cwd:
+        config = LoopConfig(
+            prompt="bench " * 500,
+            command=sys.executable,
+            command_args=[
+                "-m", "ralph.fake_agent",
+                "--chunks", str(chunks),
+                "--tools", "3",
+                "--permission",
+            ],
+            working_dir=cwd,
+            max_iterations=iterations,
+            timeout_seconds=600,
+            output="quiet",
+        )
+        tracemalloc.start()
+        result = asyncio.run(RalphEngine(config).run())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert result.state == "max_iterations", result
+    return {
+        "loop.iteration_ms": round(result.duration_seconds / iterations * 1000, 2),
+        "loop.peak_traced_mb": round(peak / 2**20, 2),
+    }
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,37 @@
+"""CLI startup time: import, --help and --dry-run, each in a fresh interpreter."""
+
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = {
+    "import": [sys.executable, "-c", "import ralph"],
+    "help": [sys.executable, "-m", "ralph", "--help"],
+    "dry_run": [sys.executable, "-m", "ralph", "task", "--dry-run"],
+}
+
+
+def _time(cmd: list[str], cwd: str) -> float:
+    t0 = time.perf_counter()
+    subprocess.run(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - t0
+
+
+def run(repeat: int = 5) -> dict[str, float]:
+    """Median wall time in milliseconds per case."""
+    with tempfile.TemporaryDirectory() as cwd:
+        return {
+            f"startup.{name}_ms": round(
+                statistics.median(_time(cmd, cwd) for _ in range(repeat)) * 1000, 1
+            )
+            for name, cmd in CASES.items()
+        }
+
+
+if __name__ == "__main__":
+    for key, value in run().items():
+        print(f"{key}: {value}")
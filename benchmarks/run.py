@@ -0,0 +1,70 @@
+"""Run the offline benchmark suite.
+
+    python benchmarks/run.py            # full run, print metrics
+    python benchmarks/run.py --quick    # smaller workloads (CI)
+    python benchmarks/run.py --check    # also fail if a metric breaks its budget
+
+Budgets are deliberately loose: they exist to catch order-of-magnitude
+regressions on shared CI runners, not to track small drifts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bench_events  # noqa: E402
+import bench_loop  # noqa: E402
+import bench_startup  # noqa: E402
+
+# metric -> (limit, "max" | "min")
+BUDGETS = {
+    "startup.dry_run_ms": (500, "max"),
+    "events.per_second": (20_000, "min"),
+    "loop.iteration_ms": (1000, "max"),
+    "loop.peak_traced_mb": (64, "max"),
+}
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="ralph offline benchmarks")
+    p.add_argument("--quick", action="store_true", help="Smaller workloads")
+    p.add_argument("--check", action="store_true", help="Fail when a budget is exceeded")
+    p.add_argument("--json", action="store_true", help="Print metrics as JSON")
+    args = p.parse_args()
+
+    metrics: dict[str, float] = {}
+    if args.quick:
+        metrics.update(bench_startup.run(repeat=3))
+        metrics.update(bench_events.run(events=30_000))
+        metrics.update(bench_loop.run(iterations=10, chunks=50))
+    else:
+        metrics.update(bench_startup.run())
+        metrics.update(bench_events.run())
+        metrics.update(bench_loop.run())
+
+    if args.json:
+        print(json.dumps(metrics, indent=2))
+    else:
+        for key, value in metrics.items():
+            print(f"{key}: {value}")
+
+    failed = []
+    for key, (limit, kind) in BUDGETS.items():
+        value = metrics.get(key)
+        if value is None:
+            continue
+        if (kind == "max" and value > limit) or (kind == "min" and value < limit):
+            failed.append(f"{key}={value} (budget {kind} {limit})")
+    if failed and args.check:
+        print("Budget exceeded: " + ", ".join(failed), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,7 @@ __version__ = "0.2.0"
 
 from ralph.config import load_config_file
 from ralph.detect import detect_promise
-from ralph.engine import LoopConfig, LoopResult, RalphEngine
+from ralph.models import LoopConfig, LoopResult
 
 __all__ = [
     "__version__",
@@ -14,3 +14,13 @@ __all__ = [
     "LoopResult",
     "RalphEngine",
 ]
+
+
+def __getattr__(name: str):
+    # The engine pulls in asyncio and the ACP client stack; only import it
+    # when it is actually used so ``ralph --help`` / ``--dry-run`` stay fast.
+    if name == "RalphEngine":
+        from ralph.engine import RalphEngine
+
+        return RalphEngine
+    raise AttributeError(f"module 'ralph' has no attribute {name!r}")
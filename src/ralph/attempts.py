@@ -0,0 +1,146 @@
+"""Best-of-N: run several independent loops on the same task at once.
+
+Every attempt is a full ``RalphEngine`` loop in its own git worktree copy of
+``working_dir``. The first attempt to complete wins (with ``verify_command``
+set, each loop only completes once its tree passes): the others are
+cancelled, its changes are applied to ``working_dir`` and all worktrees are
+removed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable
+
+from ralph.engine import LoopConfig, LoopResult, RalphEngine
+from ralph.verify import VerifyResult
+from ralph.worktree import (
+    Worktree,
+    apply_diff,
+    create_worktree,
+    remove_worktree,
+    run_prefix,
+    worktree_diff,
+)
+
+if TYPE_CHECKING:
+    from ralph.pool import AgentPool
+
+
+@dataclass
+class Attempt:
+    index: int  # 1-based
+    worktree: Worktree | None = None
+    result: LoopResult | None = None
+    verify: VerifyResult | None = None  # the loop's last verify verdict
+    error: BaseException | None = None
+
+    @property
+    def passed(self) -> bool:
+        return self.result is not None and self.result.state == "complete"
+
+
+@dataclass
+class BestOfResult:
+    result: LoopResult
+    winner: Attempt | None
+    attempts: list[Attempt]
+
+
+def _attempt_config(config: LoopConfig, working_dir: str) -> LoopConfig:
+    return dataclasses.replace(
+        config,
+        working_dir=working_dir,
+        attempts=1,
+        race=[],
+        output="quiet",
+        trace_file=None,
+        record_file=None,
+        checkpoint=False,
+        history=False,
+        transcript=False,
+        resume=False,
+    )
+
+
+# Called with each attempt's engine before it runs, e.g. to subscribe to its bus.
+EngineHook = Callable[[RalphEngine, Attempt], None]
+
+
+async def _run_attempt(
+    config: LoopConfig,
+    attempt: Attempt,
+    name: str,
+    pool: AgentPool | None = None,
+    on_engine: EngineHook | None = None,
+) -> None:
+    attempt.worktree = await asyncio.to_thread(create_worktree, config.working_dir, name)
+    engine = RalphEngine(_attempt_config(config, attempt.worktree.working_dir), pool=pool)
+    if on_engine is not None:
+        on_engine(engine, attempt)
+    try:
+        attempt.result = await engine.run()
+    finally:
+        attempt.verify = engine.verified
+
+
+async def run_best_of(
+    config: LoopConfig,
+    pool: AgentPool | None = None,
+    on_engine: EngineHook | None = None,
+) -> BestOfResult:
+    """Run ``config.attempts`` loops concurrently and keep the first to pass.
+
+    With *pool*, every attempt leases its agent from it.
+    """
+    start = time.monotonic()
+    attempts = [Attempt(i) for i in range(1, config.attempts + 1)]
+    prefix = run_prefix()
+    tasks = {
+        asyncio.ensure_future(
+            _run_attempt(config, a, f"{prefix}-attempt-{a.index}", pool, on_engine)
+        ): a
+        for a in attempts
+    }
+    finished: list[Attempt] = []
+    winner: Attempt | None = None
+    try:
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = tasks[task]
+                if task.exception() is not None:
+                    attempt.error = task.exception()
+                finished.append(attempt)
+                if winner is None and attempt.passed:
+                    winner = attempt
+        if winner is not None:
+            assert winner.worktree is not None
+            patch = await asyncio.to_thread(worktree_diff, winner.worktree)
+            await asyncio.to_thread(apply_diff, winner.worktree, patch)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for attempt in attempts:
+            if attempt.worktree is not None:
+                await asyncio.to_thread(remove_worktree, attempt.worktree)
+
+    duration = time.monotonic() - start
+    if winner is not None:
+        assert winner.result is not None
+        result = dataclasses.replace(winner.result, duration_seconds=duration)
+        return BestOfResult(result, winner, attempts)
+
+    # No winner: report the first attempt to finish.
+    first = next((a for a in finished if a.result is not None), None)
+    if first is None:
+        error = next((a.error for a in finished if a.error is not None), None)
+        raise error or RuntimeError("no attempt finished")
+    assert first.result is not None
+    result = dataclasses.replace(first.result, duration_seconds=duration)
+    return BestOfResult(result, None, attempts)
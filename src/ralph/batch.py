@@ -0,0 +1,172 @@
+"""Batch mode — run many loops inside one event loop with bounded concurrency."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from ralph.attempts import run_best_of
+from ralph.config import load_config_file, normalize
+from ralph.engine import LoopConfig, LoopResult, RalphEngine
+from ralph.events import TaskEndEvent, TaskStartEvent
+from ralph.output import Output
+
+if TYPE_CHECKING:
+    from ralph.pool import AgentPool
+
+_PROMPT_SUFFIXES = (".md", ".txt")
+
+
+@dataclass
+class BatchTask:
+    name: str
+    config: LoopConfig
+    priority: int = 0
+
+
+@dataclass
+class BatchResult:
+    name: str
+    result: LoopResult
+
+
+def load_batch(source: str, base: dict[str, Any] | None = None) -> list[BatchTask]:
+    """Load tasks from a directory of prompt files or a JSON manifest.
+
+    A directory yields one task per ``.md``/``.txt`` file, with that
+    directory's ``ralph.yml`` as shared settings. A manifest is either a list
+    of task objects or ``{"defaults": {...}, "tasks": [...]}``; task objects
+    use the ``ralph.yml`` keys plus optional ``name`` and ``priority``.
+    *base* holds already-normalized settings applied beneath everything else.
+    """
+    path = Path(source)
+    if path.is_dir():
+        shared = {**(base or {}), **(load_config_file(str(path)) or {})}
+        tasks = []
+        for f in sorted(path.iterdir()):
+            if f.is_file() and f.suffix in _PROMPT_SUFFIXES:
+                cfg = {**shared, "prompt": f.read_text(encoding="utf-8")}
+                tasks.append(BatchTask(name=f.stem, config=LoopConfig(**cfg)))
+        return tasks
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, list):
+        data = {"tasks": data}
+    shared = {**(base or {}), **normalize(data.get("defaults", {}))}
+    tasks = []
+    for idx, entry in enumerate(data.get("tasks", []), start=1):
+        cfg = {**shared, **normalize(entry)}
+        if "prompt" not in cfg:
+            raise ValueError(f"{source}: task {idx} has no prompt")
+        tasks.append(
+            BatchTask(
+                name=str(entry.get("name", f"task-{idx}")),
+                config=LoopConfig(**cfg),
+                priority=int(entry.get("priority", 0)),
+            )
+        )
+    return tasks
+
+
+def _unfinished(
+    engines: list[RalphEngine], state: str, started: float, error: str,
+) -> LoopResult:
+    """Result for a task that never returned one: how far its loops got, and for how long."""
+    return LoopResult(
+        state=state,
+        iterations=max((span.iteration for e in engines for span in e.spans), default=0),
+        duration_seconds=time.monotonic() - started,
+        error=error,
+    )
+
+
+async def run_batch(
+    tasks: list[BatchTask],
+    concurrency: int = 4,
+    timeout_seconds: float | None = None,
+    pool: AgentPool | None = None,
+    out: Output | None = None,
+) -> list[BatchResult]:
+    """Run *tasks* with at most *concurrency* loops at once.
+
+    Higher ``priority`` starts first; ties keep manifest order. When the batch
+    timeout expires, running loops are cancelled and reported as ``timeout``,
+    and tasks that never started are reported as ``cancelled``. With a *pool*,
+    agents for the first wave are spawned up front and reused across tasks.
+    A task with ``attempts`` above 1 runs best-of-N, as ``ralph`` itself does.
+    Task starts and ends are reported to *out*.
+    """
+    out = out or Output()
+    ordered = sorted(enumerate(tasks), key=lambda item: (-item[1].priority, item[0]))
+    queue: asyncio.Queue[tuple[int, BatchTask]] = asyncio.Queue()
+    for item in ordered:
+        queue.put_nowait(item)
+
+    if pool is not None:
+        from ralph.pool import pool_key
+
+        wanted = Counter(
+            pool_key(t.config.command, t.config.command_args, t.config.working_dir)
+            for _, t in ordered[:concurrency]
+        )
+        await asyncio.gather(*(pool.prewarm(k, n) for k, n in wanted.items()))
+
+    results: dict[int, LoopResult] = {}
+    running: dict[int, tuple[list[RalphEngine], float]] = {}
+
+    def finish(seq: int, result: LoopResult) -> None:
+        results[seq] = result
+        out.handle(TaskEndEvent(
+            tasks[seq].name, result.state, result.iterations, result.duration_seconds, result.error,
+        ))
+
+    async def worker() -> None:
+        while True:
+            try:
+                seq, task = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            engines: list[RalphEngine] = []
+            started = time.monotonic()
+            running[seq] = (engines, started)
+            out.handle(TaskStartEvent(task.name))
+            try:
+                if task.config.attempts > 1:
+                    best = await run_best_of(
+                        task.config, pool, lambda engine, _: engines.append(engine),
+                    )
+                    result = best.result
+                else:
+                    engines.append(RalphEngine(task.config, pool=pool))
+                    result = await engines[0].run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                result = _unfinished(engines, "failed", started, str(e))
+            finish(seq, result)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.wait_for(asyncio.gather(*workers), timeout=timeout_seconds)
+    except asyncio.TimeoutError:
+        pass
+
+    for seq, task in enumerate(tasks):
+        if seq in results:
+            continue
+        if seq in running:
+            engines, started = running[seq]
+            finish(seq, _unfinished(engines, "timeout", started, "batch timeout"))
+        else:
+            finish(seq, LoopResult(
+                state="cancelled",
+                iterations=0,
+                duration_seconds=0.0,
+                error="batch timeout before start",
+            ))
+    return [BatchResult(name=task.name, result=results[seq]) for seq, task in enumerate(tasks)]
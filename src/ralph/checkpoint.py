@@ -0,0 +1,69 @@
+"""Checkpoints for resuming interrupted loops, one file per task."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from ralph.models import LoopConfig
+from ralph.state import STATE_DIR, state_dir, write_atomic
+
+# One checkpoint per task, so loops sharing a working directory (batch,
+# serve, queue workers) never overwrite or clear each other's.
+CHECKPOINT_DIR = "checkpoints"
+
+# Keep only this much of the last response for the resumption prompt.
+TAIL_CHARS = 2000
+
+
+@dataclass
+class Checkpoint:
+    config_hash: str
+    iteration: int
+    elapsed_seconds: float
+    response_tail: str = ""
+    session_id: str | None = None
+    backend: list[str] | None = None  # [command, *args] if race mode switched it
+
+
+def config_hash(config: LoopConfig) -> str:
+    """Identify the task a checkpoint belongs to.
+
+    Limits such as ``max_iterations`` and ``timeout_seconds`` are left out so
+    a resumed run may extend them.
+    """
+    key = json.dumps(
+        [config.prompt, config.promise_phrase, config.command, config.command_args],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def checkpoint_path(working_dir: str, task: str) -> Path:
+    """Where the checkpoint of the task with ``config_hash`` *task* lives."""
+    return Path(working_dir) / STATE_DIR / CHECKPOINT_DIR / f"{task[:16]}.json"
+
+
+def save_checkpoint(working_dir: str, checkpoint: Checkpoint) -> None:
+    path = state_dir(working_dir) / CHECKPOINT_DIR / f"{checkpoint.config_hash[:16]}.json"
+    path.parent.mkdir(exist_ok=True)
+    write_atomic(path, json.dumps(asdict(checkpoint), ensure_ascii=False))
+
+
+def load_checkpoint(working_dir: str, task: str) -> Checkpoint | None:
+    path = checkpoint_path(working_dir, task)
+    if not path.is_file():
+        return None
+    try:
+        checkpoint = Checkpoint(**json.loads(path.read_text(encoding="utf-8")))
+    except (ValueError, TypeError, KeyError):
+        # Truncated, corrupt or from another version: start fresh.
+        return None
+    # A shortened hash could collide; the full one decides.
+    return checkpoint if checkpoint.config_hash == task else None
+
+
+def clear_checkpoint(working_dir: str, task: str) -> None:
+    checkpoint_path(working_dir, task).unlink(missing_ok=True)
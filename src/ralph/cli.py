@@ -3,20 +3,25 @@
 from __future__ import annotations
 
 import argparse
-import asyncio
+import json
+import os
 import shlex
 import sys
 from pathlib import Path
 from typing import Any
 
 from ralph.config import load_config_file
-from ralph.engine import LoopConfig, RalphEngine
+from ralph.models import OUTPUT_MODES, PERMISSION_ACTIONS, VERIFY_ON, LoopConfig
+from ralph.prompt import PROMPT_STRATEGIES
 
 EXIT_SUCCESS = 0
 EXIT_FAILED = 1
 EXIT_CANCELLED = 2
 EXIT_TIMEOUT = 3
 EXIT_MAX_ITERATIONS = 4
+EXIT_STALLED = 5
+EXIT_RESOURCE_LIMIT = 6
+EXIT_BUDGET = 7
 
 _STATE_TO_EXIT = {
     "complete": EXIT_SUCCESS,
@@ -24,6 +29,9 @@ _STATE_TO_EXIT = {
     "cancelled": EXIT_CANCELLED,
     "timeout": EXIT_TIMEOUT,
     "max_iterations": EXIT_MAX_ITERATIONS,
+    "stalled": EXIT_STALLED,
+    "resource_limit": EXIT_RESOURCE_LIMIT,
+    "budget": EXIT_BUDGET,
 }
 
 # Auto-detected prompt files, checked in order.
@@ -68,11 +76,224 @@ def _build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Extra arguments for the ACP CLI (e.g. '--experimental-acp')",
     )
+    p.add_argument(
+        "--race",
+        action="append",
+        default=None,
+        metavar="CMD",
+        help="Also run the first iteration on this agent command line, in its "
+        "own git worktree, and keep whichever backend progresses first (repeatable)",
+    )
+    p.add_argument(
+        "--hedge-after",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="With --race, start each extra backend only if no winner after "
+        "this long (default: start all at once)",
+    )
+    p.add_argument(
+        "-n", "--attempts",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Run N independent loops in parallel git worktrees and keep the "
+        "first to finish (and pass --verify) (default: 1)",
+    )
+    p.add_argument(
+        "--verify",
+        default=None,
+        metavar="CMD",
+        help="Shell command (tests, linters) that must exit 0 before the promise "
+        "is accepted; failures are fed back to the agent",
+    )
+    p.add_argument(
+        "--verify-on",
+        choices=VERIFY_ON,
+        default=None,
+        help="When to run --verify: promise (only when the agent claims done) or "
+        "iteration (after every iteration) (default: promise)",
+    )
+    p.add_argument(
+        "--verify-overlap",
+        action="store_true",
+        help="With --verify-on iteration, verify while the next turn runs instead "
+        "of waiting for the result",
+    )
+    p.add_argument(
+        "--allow",
+        action="append",
+        default=None,
+        metavar="RULE",
+        help='Let the agent use a tool without asking again, e.g. "Read" or '
+        '"Bash(git *)" (repeatable)',
+    )
+    p.add_argument(
+        "--ask",
+        action="append",
+        default=None,
+        metavar="RULE",
+        help="Allow matching tool calls one at a time (repeatable)",
+    )
+    p.add_argument(
+        "--deny",
+        action="append",
+        default=None,
+        metavar="RULE",
+        help="Reject matching tool calls (repeatable)",
+    )
+    p.add_argument(
+        "--permission-default",
+        choices=PERMISSION_ACTIONS,
+        default=None,
+        help="Action for tool calls no rule matches (default: allow)",
+    )
     p.add_argument(
         "-d", "--working-dir",
         default=None,
         help="Working directory (default: .)",
     )
+    p.add_argument(
+        "--prompt-strategy",
+        choices=PROMPT_STRATEGIES,
+        default=None,
+        help="How much of the system prompt and task to resend each iteration: "
+        "full (every time), once (first iteration only), digest (short "
+        "reminder with a task hash) (default: full)",
+    )
+    p.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=None,
+        help="Append per-iteration timing spans to FILE as JSON lines",
+    )
+    p.add_argument(
+        "--record",
+        metavar="FILE",
+        default=None,
+        help="Record the agent session (prompts, text, tools, permissions) to "
+        "FILE as gzip-compressed JSON lines, for --replay",
+    )
+    p.add_argument(
+        "--replay",
+        metavar="FILE",
+        default=None,
+        help="Drive the loop from a --record recording instead of a live agent",
+    )
+    p.add_argument(
+        "--replay-speed",
+        type=float,
+        default=None,
+        metavar="X",
+        help="Replay pace relative to the recording: 1 = original, 0 = as fast "
+        "as possible (default: 0)",
+    )
+    p.add_argument(
+        "--output",
+        choices=OUTPUT_MODES,
+        default=None,
+        help="Console output: plain (agent text + tool markers), quiet (errors "
+        "only), jsonl (one JSON event per line) (default: plain)",
+    )
+    p.add_argument(
+        "--iteration-timeout",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Cancel and retry a turn that runs longer than this (default: off)",
+    )
+    p.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Cancel and retry a turn with no agent output or tool events for "
+        "this long (default: off)",
+    )
+    p.add_argument(
+        "--retries",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Retries for a turn that hit --iteration-timeout/--idle-timeout (default: 2)",
+    )
+    p.add_argument(
+        "--max-restarts",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Restart the agent up to N times if its process dies (default: 3)",
+    )
+    p.add_argument(
+        "--stall-limit",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Stop after N consecutive iterations that change no files (default: off)",
+    )
+    p.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Stop before an iteration would take the run over N tokens (default: off)",
+    )
+    p.add_argument(
+        "--cost-budget",
+        type=float,
+        default=None,
+        metavar="USD",
+        help="Stop before an iteration would take the run over this cost; needs "
+        "prices in ralph.yml unless the agent reports cost (default: off)",
+    )
+    p.add_argument(
+        "--max-rss-mb",
+        type=float,
+        default=None,
+        metavar="MB",
+        help="Stop the run once the agent's process tree uses more memory (default: off)",
+    )
+    p.add_argument(
+        "--max-cpu-seconds",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Stop the run once the agent's process tree has used this much CPU "
+        "time (default: off)",
+    )
+    p.add_argument(
+        "--resource-interval",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="How often to sample the agent's memory and CPU from /proc; 0 turns "
+        "sampling off (default: 1)",
+    )
+    p.add_argument(
+        "--no-change-summary",
+        action="store_true",
+        help="Don't list the files changed by the previous iteration in the prompt",
+    )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from its checkpoint in .ralph/checkpoints/",
+    )
+    p.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        help="Don't write a checkpoint after each iteration",
+    )
+    p.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Don't record this run in .ralph/history.db",
+    )
+    p.add_argument(
+        "--no-transcript",
+        action="store_true",
+        help="Don't spool the agent's output to .ralph/transcripts",
+    )
     p.add_argument(
         "--dry-run",
         action="store_true",
@@ -100,21 +321,562 @@ def _auto_detect_prompt(working_dir: str) -> str | None:
     return None
 
 
+def _check_resume(config: LoopConfig) -> None:
+    from ralph.checkpoint import config_hash, load_checkpoint
+
+    checkpoint = load_checkpoint(config.working_dir, config_hash(config))
+    if checkpoint is None:
+        print("📄 No checkpoint found, starting from iteration 1", flush=True)
+    else:
+        print(
+            f"📄 Resuming after iteration {checkpoint.iteration} "
+            f"({checkpoint.elapsed_seconds:.0f}s already spent)",
+            flush=True,
+        )
+
+
 def _run(config: LoopConfig) -> int:
-    engine = RalphEngine(config)
+    # Deferred: the engine pulls in asyncio and the ACP client stack.
+    import asyncio
+
+    best = None
     try:
-        result = asyncio.run(engine.run())
+        if config.attempts > 1:
+            from ralph.attempts import run_best_of
+
+            best = asyncio.run(run_best_of(config))
+            result = best.result
+        else:
+            from ralph.engine import RalphEngine
+
+            result = asyncio.run(RalphEngine(config).run())
     except KeyboardInterrupt:
         print("\n⚠ Loop cancelled", flush=True)
         return EXIT_CANCELLED
 
+    if config.output == "jsonl":
+        event = {
+            "event": "result",
+            "state": result.state,
+            "iterations": result.iterations,
+            "duration_seconds": round(result.duration_seconds, 3),
+            "prompt_bytes": result.prompt_bytes,
+            "restarts": result.restarts,
+            "resources": [vars(r) for r in result.resources],
+            "usage": vars(result.usage),
+            "transcript": result.transcript,
+            "error": result.error,
+        }
+        if best is not None:
+            event["attempt"] = best.winner.index if best.winner else None
+        print(json.dumps(event, ensure_ascii=False))
+        return _STATE_TO_EXIT.get(result.state, EXIT_FAILED)
+
+    if best is not None:
+        print("\n▶ Attempts:")
+        for attempt in best.attempts:
+            state = attempt.result.state if attempt.result else "cancelled"
+            if attempt.error is not None:
+                state = f"error — {attempt.error}"
+            verify = ""
+            if attempt.verify is not None:
+                verify = ", verify passed" if attempt.verify.ok else ", verify failed"
+            won = " ← applied" if attempt is best.winner else ""
+            print(f"  #{attempt.index}: {state}{verify}{won}")
+
     duration = f"{result.duration_seconds:.1f}s"
-    print(f"\n▶ Result: {result.state} ({result.iterations} iterations, {duration})")
+    sent = sum(result.prompt_bytes)
+    restarts = f", {result.restarts} agent restarts" if result.restarts else ""
+    usage = ""
+    if result.resources:
+        peak = max(r.peak_rss_mb for r in result.resources)
+        cpu = sum(r.cpu_seconds for r in result.resources)
+        usage = f", agent peak {peak:.0f} MB RSS, {cpu:.1f}s CPU"
+    tokens = result.usage.total_tokens
+    if tokens:
+        approx = "~" if result.usage.estimated else ""
+        usage += f", {approx}{tokens} tokens"
+        if result.usage.cost_usd:
+            usage += f", ${result.usage.cost_usd:.4f}"
+    print(
+        f"\n▶ Result: {result.state} ({result.iterations} iterations, {duration}, "
+        f"{sent} prompt bytes{restarts}{usage})"
+    )
+    if result.transcript:
+        print(f"  transcript: ralph log {result.transcript}")
 
     return _STATE_TO_EXIT.get(result.state, EXIT_FAILED)
 
 
+def _build_batch_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ralph batch",
+        description="Run many Ralph loops concurrently in one process",
+    )
+    p.add_argument(
+        "source",
+        help="Directory of .md/.txt task files, or a JSON manifest",
+    )
+    p.add_argument(
+        "-j", "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum loops running at once (default: 4)",
+    )
+    p.add_argument(
+        "-t", "--timeout",
+        type=int,
+        default=None,
+        help="Timeout in seconds for the whole batch (default: none)",
+    )
+    p.add_argument(
+        "--pool",
+        action="store_true",
+        help="Pre-spawn agents and reuse them across tasks with the same command",
+    )
+    p.add_argument(
+        "--output",
+        choices=OUTPUT_MODES,
+        default=None,
+        help="Console output for the batch and every task's loop, overriding "
+        "the tasks' own setting (default: plain)",
+    )
+    return p
+
+
+def _batch_main(argv: list[str]) -> int:
+    import asyncio
+
+    from ralph.batch import load_batch, run_batch
+    from ralph.events import PoolStatsEvent
+    from ralph.output import make_output
+
+    parser = _build_batch_parser()
+    args = parser.parse_args(argv)
+
+    base = load_config_file(".") or {}
+    try:
+        tasks = load_batch(args.source, base=base)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not tasks:
+        parser.error(f"no tasks found in {args.source}")
+    if args.output:
+        for task in tasks:
+            task.config.output = args.output
+    out = make_output(args.output or base.get("output", "plain"))
+
+    async def _go() -> list[int]:
+        out.start()
+        try:
+            if not args.pool:
+                results = await run_batch(tasks, args.concurrency, args.timeout, out=out)
+            else:
+                from ralph.pool import AgentPool
+
+                pool = AgentPool()
+                pool.start()
+                try:
+                    results = await run_batch(
+                        tasks, args.concurrency, args.timeout, pool=pool, out=out,
+                    )
+                finally:
+                    await pool.close()
+                    s = pool.stats
+                    out.handle(PoolStatsEvent(s.hits, s.misses, s.spawned, s.recycled))
+            codes = [_STATE_TO_EXIT.get(item.result.state, EXIT_FAILED) for item in results]
+            out.batch_results(results, codes)
+            return codes
+        finally:
+            await out.close()
+
+    try:
+        codes = asyncio.run(_go())
+    except KeyboardInterrupt:
+        print("\n⚠ Batch cancelled", flush=True)
+        return EXIT_CANCELLED
+    return EXIT_SUCCESS if all(code == EXIT_SUCCESS for code in codes) else EXIT_FAILED
+
+
+def _build_serve_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ralph serve",
+        description="Run Ralph as a daemon that accepts loops as jobs over HTTP",
+    )
+    where = p.add_mutually_exclusive_group()
+    where.add_argument(
+        "--socket",
+        metavar="PATH",
+        default=None,
+        help="Listen on this Unix socket (default: .ralph/serve.sock)",
+    )
+    where.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="Listen on this TCP port instead of a Unix socket",
+    )
+    p.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to bind with --port (default: 127.0.0.1); "
+        "anything but loopback needs --token",
+    )
+    p.add_argument(
+        "--token",
+        default=os.environ.get("RALPH_SERVE_TOKEN"),
+        help="Require 'Authorization: Bearer TOKEN' on every request "
+        "(default: $RALPH_SERVE_TOKEN)",
+    )
+    p.add_argument(
+        "-j", "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum jobs running at once (default: 4)",
+    )
+    return p
+
+
+def _serve_main(argv: list[str]) -> int:
+    import asyncio
+
+    from ralph.serve import RalphServer, is_loopback, serve
+    from ralph.state import state_dir
+
+    parser = _build_serve_parser()
+    args = parser.parse_args(argv)
+    if args.port is not None and not args.token and not is_loopback(args.host):
+        parser.error(f"--host {args.host} is reachable from other machines; set --token too")
+    try:
+        base = load_config_file(".")
+    except ValueError as e:
+        parser.error(f"ralph.yml: {e}")
+
+    socket_path = args.socket
+    if args.port is None and socket_path is None:
+        socket_path = str(state_dir(".") / "serve.sock")
+
+    async def _go() -> None:
+        server = RalphServer(args.concurrency, base, token=args.token or None)
+        await serve(server, socket_path, args.host, args.port)
+
+    try:
+        asyncio.run(_go())
+    except KeyboardInterrupt:
+        print("\n⚠ Server stopped", flush=True)
+    return EXIT_SUCCESS
+
+
+def _build_enqueue_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ralph enqueue",
+        description="Add loops to a SQLite work queue run by `ralph worker`",
+    )
+    p.add_argument(
+        "source",
+        nargs="?",
+        default=None,
+        help="Prompt text or .md/.txt file, a directory of task files, or a JSON manifest",
+    )
+    p.add_argument("-q", "--queue", required=True, metavar="DB", help="Queue database file")
+    p.add_argument("--name", default=None, help="Job name for a single prompt")
+    p.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="Priority for a single prompt; higher is claimed first (default: 0)",
+    )
+    p.add_argument("--list", action="store_true", help="List the queue's jobs and exit")
+    return p
+
+
+def _enqueue_main(argv: list[str]) -> int:
+    from ralph.batch import load_batch
+    from ralph.workqueue import WorkQueue
+
+    parser = _build_enqueue_parser()
+    args = parser.parse_args(argv)
+    queue = WorkQueue(args.queue)
+
+    if args.list:
+        for job in queue.jobs():
+            result = job["result"] or {}
+            detail = f" — {result['error']}" if result.get("error") else ""
+            worker = f" on {job['worker']}" if job["worker"] else ""
+            print(f"  {job['id']} {job['name']}: {job['status']}{worker}{detail}")
+        return EXIT_SUCCESS
+    if args.source is None:
+        parser.error("source is required (or use --list)")
+
+    try:
+        base = load_config_file(".") or {}
+        if Path(args.source).is_dir() or args.source.endswith(".json"):
+            tasks = [(t.name, t.config, t.priority) for t in load_batch(args.source, base=base)]
+        else:
+            config = LoopConfig(**{**base, "prompt": _resolve_prompt(args.source)})
+            name = args.name or (Path(args.source).stem if Path(args.source).is_file() else "task")
+            tasks = [(name, config, args.priority)]
+    except (OSError, ValueError, TypeError) as e:
+        parser.error(str(e))
+
+    for name, config, priority in tasks:
+        # Workers may run on other hosts in other directories.
+        config.working_dir = os.path.abspath(config.working_dir)
+        job_id = queue.enqueue(config, name, priority)
+        print(f"  {job_id} {name}")
+    return EXIT_SUCCESS
+
+
+def _build_worker_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ralph worker",
+        description="Claim and run loops from a SQLite work queue",
+    )
+    p.add_argument("-q", "--queue", required=True, metavar="DB", help="Queue database file")
+    p.add_argument(
+        "-j", "--concurrency",
+        type=int,
+        default=1,
+        help="Jobs this worker runs at once (default: 1)",
+    )
+    p.add_argument(
+        "--lease",
+        type=float,
+        default=60.0,
+        metavar="SECONDS",
+        help="Lease on a claimed job, renewed every third of it; a job whose "
+        "worker stops renewing is reclaimed after this long (default: 60)",
+    )
+    p.add_argument(
+        "--poll",
+        type=float,
+        default=2.0,
+        metavar="SECONDS",
+        help="How often to look for work while the queue is empty (default: 2)",
+    )
+    p.add_argument("--id", default=None, help="Worker name (default: host:pid)")
+    p.add_argument(
+        "--exit-when-empty",
+        action="store_true",
+        help="Exit once there is nothing left to claim instead of polling",
+    )
+    p.add_argument(
+        "--pool",
+        action="store_true",
+        help="Reuse agent processes across jobs with the same command",
+    )
+    return p
+
+
+def _worker_main(argv: list[str]) -> int:
+    import asyncio
+
+    from ralph.workqueue import WorkQueue, run_worker
+
+    parser = _build_worker_parser()
+    args = parser.parse_args(argv)
+    queue = WorkQueue(args.queue)
+
+    async def _go() -> None:
+        pool = None
+        if args.pool:
+            from ralph.pool import AgentPool
+
+            pool = AgentPool()
+            pool.start()
+        try:
+            await run_worker(
+                queue, args.id, args.concurrency, args.lease, args.poll,
+                args.exit_when_empty, pool,
+            )
+        finally:
+            if pool is not None:
+                await pool.close()
+
+    try:
+        asyncio.run(_go())
+    except KeyboardInterrupt:
+        print("\n⚠ Worker stopped", flush=True)
+        return EXIT_CANCELLED
+    return EXIT_SUCCESS
+
+
+def _build_stats_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ralph stats",
+        description="Percentiles over past runs recorded in .ralph/history.db",
+    )
+    p.add_argument(
+        "-d", "--working-dir",
+        default=".",
+        help="Project whose history to read (default: .)",
+    )
+    p.add_argument(
+        "--by",
+        choices=("command", "prompt"),
+        default=None,
+        help="Group by agent command or by prompt (default: both)",
+    )
+    p.add_argument(
+        "--days",
+        type=float,
+        default=None,
+        help="Only count runs from the last N days",
+    )
+    p.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    return p
+
+
+def _fmt(value: float | None, unit: str = "") -> str:
+    if value is None:
+        return "-"
+    return f"{value:.1f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+
+
+def _stats_main(argv: list[str]) -> int:
+    import time
+
+    from ralph.history import load_stats
+
+    parser = _build_stats_parser()
+    args = parser.parse_args(argv)
+    since = time.time() - args.days * 86400 if args.days is not None else None
+    groupings = [args.by] if args.by else ["command", "prompt"]
+    report = {by: [g.summary() for g in load_stats(args.working_dir, by, since)] for by in groupings}
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return EXIT_SUCCESS
+    if not any(report.values()):
+        print("No runs recorded yet.")
+        return EXIT_SUCCESS
+
+    for by, groups in report.items():
+        print(f"\n▶ By {by}:")
+        for g in groups:
+            its, dur, turn = g["iterations_to_complete"], g["duration_seconds"], g["turn_seconds"]
+            states = ", ".join(f"{n} {state}" for state, n in sorted(g["states"].items()))
+            print(f"  {g['label'] or g['key']}")
+            print(f"    runs: {g['runs']} ({states}), success {g['success_rate']:.0%}")
+            print(
+                f"    iterations to complete: p50 {_fmt(its['p50'])}, p90 {_fmt(its['p90'])}, "
+                f"p95 {_fmt(its['p95'])}, max {_fmt(its['max'])}"
+            )
+            print(
+                f"    run duration: p50 {_fmt(dur['p50'], 's')}, p95 {_fmt(dur['p95'], 's')}, "
+                f"p99 {_fmt(dur['p99'], 's')}"
+            )
+            print(f"    turn: p50 {_fmt(turn['p50'], 's')}, p95 {_fmt(turn['p95'], 's')}")
+    return EXIT_SUCCESS
+
+
+def _build_log_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="ralph log",
+        description="Show or search a run's transcript in .ralph/transcripts",
+    )
+    p.add_argument(
+        "run",
+        nargs="?",
+        default=None,
+        help="Run id, a unique prefix of one, or 'last' (default: list runs)",
+    )
+    p.add_argument(
+        "-n", "--iteration",
+        type=int,
+        default=None,
+        help="Print this iteration's transcript, or only search it",
+    )
+    p.add_argument(
+        "-s", "--search",
+        metavar="PATTERN",
+        default=None,
+        help="Print the lines matching PATTERN (a regular expression)",
+    )
+    p.add_argument("-i", "--ignore-case", action="store_true", help="Search case-insensitively")
+    p.add_argument(
+        "-d", "--working-dir",
+        default=".",
+        help="Project whose transcripts to read (default: .)",
+    )
+    return p
+
+
+def _log_main(argv: list[str]) -> int:
+    import re
+    import time
+
+    from ralph.transcript import find_run, list_runs
+
+    parser = _build_log_parser()
+    args = parser.parse_args(argv)
+
+    if args.run is None:
+        if args.iteration is not None or args.search is not None:
+            args.run = "last"
+        else:
+            runs = list_runs(args.working_dir)
+            if not runs:
+                print("No transcripts recorded yet.")
+            for t in runs:
+                entries = t.entries()
+                print(f"{t.run_id}  {len(entries)} iterations  {t.meta.get('prompt', '')}")
+            return EXIT_SUCCESS
+    try:
+        transcript = find_run(args.working_dir, args.run)
+    except LookupError as e:
+        print(f"ralph log: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+    entries = transcript.entries()
+    if args.iteration is not None:
+        entries = [e for e in entries if e.iteration == args.iteration]
+        if not entries:
+            print(f"ralph log: {transcript.run_id} has no iteration {args.iteration}", file=sys.stderr)
+            return EXIT_FAILED
+
+    if args.search is not None:
+        try:
+            pattern = re.compile(
+                args.search.encode("utf-8"), re.IGNORECASE if args.ignore_case else 0,
+            )
+        except re.error as e:
+            parser.error(f"--search: {e}")
+        found = False
+        for entry, line_no, line in transcript.search(pattern, entries):
+            found = True
+            print(f"{entry.iteration}:{line_no}: {line.decode('utf-8', 'replace')}")
+        return EXIT_SUCCESS if found else EXIT_FAILED
+
+    if args.iteration is not None:
+        sys.stdout.write(transcript.read(entries[0]).decode("utf-8", "replace"))
+        sys.stdout.flush()
+        return EXIT_SUCCESS
+
+    print(f"{transcript.run_id}  {transcript.meta.get('command', '')}")
+    for entry in entries:
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.started))
+        print(f"  iteration {entry.iteration}: {entry.length} bytes, started {started}")
+    return EXIT_SUCCESS
+
+
+# Subcommands dispatched on the first argument; anything else is a prompt.
+_SUBCOMMANDS = {
+    "batch": _batch_main,
+    "serve": _serve_main,
+    "enqueue": _enqueue_main,
+    "worker": _worker_main,
+    "stats": _stats_main,
+    "log": _log_main,
+}
+
+
 def main(argv: list[str] | None = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in _SUBCOMMANDS:
+        sys.exit(_SUBCOMMANDS[argv[0]](argv[1:]))
+
     parser = _build_parser()
     args = parser.parse_args(argv)
 
@@ -124,14 +886,50 @@ def main(argv: list[str] | None = None) -> None:
         "promise_phrase": "任務完成！🥇",
         "command": "claude-code-acp",
         "command_args": [],
+        "race": [],
+        "hedge_after_seconds": 0.0,
+        "attempts": 1,
+        "verify_command": None,
+        "verify_on": "promise",
+        "verify_overlap": False,
+        "permission_allow": [],
+        "permission_ask": [],
+        "permission_deny": [],
+        "permission_default": "allow",
         "working_dir": ".",
         "max_iterations": 10,
         "timeout_seconds": 1800,
+        "prompt_strategy": "full",
+        "trace_file": None,
+        "record_file": None,
+        "replay_file": None,
+        "replay_speed": 0.0,
+        "output": "plain",
+        "iteration_timeout": 0,
+        "idle_timeout": 0,
+        "turn_retries": 2,
+        "max_restarts": 3,
+        "stall_limit": 0,
+        "token_budget": 0,
+        "cost_budget": 0,
+        "input_cost_per_mtok": 0,
+        "output_cost_per_mtok": 0,
+        "resource_interval": 1.0,
+        "max_rss_mb": 0,
+        "max_cpu_seconds": 0,
+        "change_summary": True,
+        "checkpoint": True,
+        "history": True,
+        "transcript": True,
+        "resume": False,
         "dry_run": False,
     }
 
     # Layer 2: ralph.yml (overrides defaults)
-    file_cfg = load_config_file(args.working_dir or ".")
+    try:
+        file_cfg = load_config_file(args.working_dir or ".")
+    except ValueError as e:
+        parser.error(f"ralph.yml: {e}")
     if file_cfg:
         cfg.update({k: v for k, v in file_cfg.items() if v is not None})
 
@@ -148,8 +946,74 @@ def main(argv: list[str] | None = None) -> None:
         cfg["command"] = args.command
     if args.command_args is not None:
         cfg["command_args"] = shlex.split(args.command_args)
+    if args.race is not None:
+        cfg["race"] = [shlex.split(line) for line in args.race]
+    if args.hedge_after is not None:
+        cfg["hedge_after_seconds"] = args.hedge_after
+    if args.attempts is not None:
+        cfg["attempts"] = args.attempts
+    if args.verify is not None:
+        cfg["verify_command"] = args.verify
+    if args.verify_on is not None:
+        cfg["verify_on"] = args.verify_on
+    if args.verify_overlap:
+        cfg["verify_overlap"] = True
+    if args.allow is not None:
+        cfg["permission_allow"] = args.allow
+    if args.ask is not None:
+        cfg["permission_ask"] = args.ask
+    if args.deny is not None:
+        cfg["permission_deny"] = args.deny
+    if args.permission_default is not None:
+        cfg["permission_default"] = args.permission_default
     if args.working_dir is not None:
         cfg["working_dir"] = args.working_dir
+    if args.prompt_strategy is not None:
+        cfg["prompt_strategy"] = args.prompt_strategy
+    if args.trace is not None:
+        cfg["trace_file"] = args.trace
+    if args.record is not None:
+        cfg["record_file"] = args.record
+    if args.replay is not None:
+        cfg["replay_file"] = args.replay
+        # A replayed run is a rehearsal; leave the project's state alone.
+        cfg["checkpoint"] = False
+        cfg["history"] = False
+        cfg["transcript"] = False
+    if args.replay_speed is not None:
+        cfg["replay_speed"] = args.replay_speed
+    if args.output is not None:
+        cfg["output"] = args.output
+    if args.iteration_timeout is not None:
+        cfg["iteration_timeout"] = args.iteration_timeout
+    if args.idle_timeout is not None:
+        cfg["idle_timeout"] = args.idle_timeout
+    if args.retries is not None:
+        cfg["turn_retries"] = args.retries
+    if args.max_restarts is not None:
+        cfg["max_restarts"] = args.max_restarts
+    if args.stall_limit is not None:
+        cfg["stall_limit"] = args.stall_limit
+    if args.token_budget is not None:
+        cfg["token_budget"] = args.token_budget
+    if args.cost_budget is not None:
+        cfg["cost_budget"] = args.cost_budget
+    if args.max_rss_mb is not None:
+        cfg["max_rss_mb"] = args.max_rss_mb
+    if args.max_cpu_seconds is not None:
+        cfg["max_cpu_seconds"] = args.max_cpu_seconds
+    if args.resource_interval is not None:
+        cfg["resource_interval"] = args.resource_interval
+    if args.no_change_summary:
+        cfg["change_summary"] = False
+    if args.resume:
+        cfg["resume"] = True
+    if args.no_checkpoint:
+        cfg["checkpoint"] = False
+    if args.no_history:
+        cfg["history"] = False
+    if args.no_transcript:
+        cfg["transcript"] = False
     if args.dry_run:
         cfg["dry_run"] = True
 
@@ -162,6 +1026,34 @@ def main(argv: list[str] | None = None) -> None:
 
     config = LoopConfig(**cfg)
 
+    if config.resume:
+        _check_resume(config)
+    if config.attempts < 1:
+        parser.error("--attempts must be at least 1")
+    if config.permission_allow or config.permission_ask or config.permission_deny:
+        from ralph.policy import compile_rule
+
+        for rule in (*config.permission_allow, *config.permission_ask, *config.permission_deny):
+            try:
+                compile_rule(rule)
+            except ValueError as e:
+                parser.error(str(e))
+    if (config.max_rss_mb or config.max_cpu_seconds) and config.resource_interval <= 0:
+        parser.error("--max-rss-mb and --max-cpu-seconds need --resource-interval above 0")
+    if config.replay_speed < 0:
+        parser.error("--replay-speed must be 0 or more")
+    if (config.record_file or config.replay_file) and (config.race or config.attempts > 1):
+        flag = "--record" if config.record_file else "--replay"
+        parser.error(f"{flag} can't be combined with --race or --attempts")
+    if config.replay_file and not Path(config.replay_file).is_file():
+        parser.error(f"--replay: {config.replay_file} not found")
+    if config.race or config.attempts > 1:
+        from ralph.worktree import git_toplevel
+
+        if git_toplevel(config.working_dir) is None:
+            flag = "--race" if config.race else "--attempts"
+            parser.error(f"{flag} needs the working directory to be inside a git repository")
+
     if config.dry_run:
         print("Dry-run config:")
         for k, v in vars(config).items():
@@ -2,10 +2,14 @@
 
 from __future__ import annotations
 
+import dataclasses
 import shlex
 from pathlib import Path
 from typing import Any
 
+from ralph.models import OUTPUT_MODES, PERMISSION_ACTIONS, VERIFY_ON, LoopConfig
+from ralph.prompt import PROMPT_STRATEGIES
+
 
 def load_config_file(working_dir: str) -> dict[str, Any] | None:
     """Load ralph.yml / ralph.yaml from *working_dir*. Returns None if absent."""
@@ -29,27 +33,139 @@ def _parse(path: Path) -> dict[str, Any]:
         key, _, value = line.partition(":")
         raw[key.strip()] = value.strip()
 
+    return normalize(raw)
+
+
+_MAP = {
+    "command": "command",
+    "command_args": "command_args",
+    "race": "race",
+    "hedge_after": "hedge_after_seconds",
+    "attempts": "attempts",
+    "verify": "verify_command",
+    "verify_command": "verify_command",
+    "verify_on": "verify_on",
+    "verify_overlap": "verify_overlap",
+    "promise": "promise_phrase",
+    "max_iterations": "max_iterations",
+    "timeout": "timeout_seconds",
+    "working_dir": "working_dir",
+    "prompt": "prompt",
+    "prompt_strategy": "prompt_strategy",
+    "trace": "trace_file",
+    "output": "output",
+    "checkpoint": "checkpoint",
+    "history": "history",
+    "transcript": "transcript",
+    "stall_limit": "stall_limit",
+    "iteration_timeout": "iteration_timeout",
+    "idle_timeout": "idle_timeout",
+    "turn_retries": "turn_retries",
+    "max_restarts": "max_restarts",
+    "change_summary": "change_summary",
+    "resource_interval": "resource_interval",
+    "max_rss_mb": "max_rss_mb",
+    "max_cpu_seconds": "max_cpu_seconds",
+    "token_budget": "token_budget",
+    "cost_budget": "cost_budget",
+    "input_cost_per_mtok": "input_cost_per_mtok",
+    "output_cost_per_mtok": "output_cost_per_mtok",
+    "allow": "permission_allow",
+    "ask": "permission_ask",
+    "deny": "permission_deny",
+    "permission_default": "permission_default",
+}
+# ``ralph serve`` job bodies may also use the ``LoopConfig`` field names.
+_FIELD_MAP = {**_MAP, **{f.name: f.name for f in dataclasses.fields(LoopConfig)}}
+
+_INT_KEYS = (
+    "max_iterations",
+    "timeout_seconds",
+    "stall_limit",
+    "turn_retries",
+    "max_restarts",
+    "attempts",
+    "token_budget",
+)
+_FLOAT_KEYS = (
+    "iteration_timeout",
+    "idle_timeout",
+    "hedge_after_seconds",
+    "resource_interval",
+    "max_rss_mb",
+    "max_cpu_seconds",
+    "cost_budget",
+    "input_cost_per_mtok",
+    "output_cost_per_mtok",
+    "replay_speed",
+)
+_BOOL_KEYS = (
+    "checkpoint", "history", "transcript", "change_summary", "verify_overlap", "resume", "dry_run",
+)
+
+# Keys restricted to a fixed set of values.
+_CHOICES = {
+    "prompt_strategy": PROMPT_STRATEGIES,
+    "output": OUTPUT_MODES,
+    "verify_on": VERIFY_ON,
+    "permission_default": PERMISSION_ACTIONS,
+}
+
+_RULE_KEYS = ("permission_allow", "permission_ask", "permission_deny")
+
+
+def normalize(raw: dict[str, Any], field_names: bool = False) -> dict[str, Any]:
+    """Map config-file keys to ``LoopConfig`` fields, coercing value types.
+
+    Values may be strings (from ``ralph.yml``) or already-typed values (from
+    a JSON batch manifest). With *field_names*, the field names themselves
+    are accepted as keys too, coerced the same way; they win over the
+    config-file key for the same field.
+    """
     cfg: dict[str, Any] = {}
 
-    _map = {
-        "command": "command",
-        "command_args": "command_args",
-        "promise": "promise_phrase",
-        "max_iterations": "max_iterations",
-        "timeout": "timeout_seconds",
-        "working_dir": "working_dir",
-        "prompt": "prompt",
-    }
-
-    for yaml_key, cfg_key in _map.items():
+    for yaml_key, cfg_key in (_FIELD_MAP if field_names else _MAP).items():
         if yaml_key not in raw:
             continue
         val = raw[yaml_key]
-        if cfg_key in ("max_iterations", "timeout_seconds"):
+        if cfg_key in _INT_KEYS:
             cfg[cfg_key] = int(val)
+        elif cfg_key in _FLOAT_KEYS:
+            cfg[cfg_key] = float(val)
+        elif cfg_key in _BOOL_KEYS:
+            cfg[cfg_key] = _bool(val)
+        elif cfg_key in _CHOICES:
+            if val not in _CHOICES[cfg_key]:
+                raise ValueError(
+                    f"{yaml_key} must be one of {', '.join(_CHOICES[cfg_key])}, got {val!r}"
+                )
+            cfg[cfg_key] = val
         elif cfg_key == "command_args":
-            cfg[cfg_key] = shlex.split(val)
+            cfg[cfg_key] = shlex.split(val) if isinstance(val, str) else list(val)
+        elif cfg_key in _RULE_KEYS:
+            # "Read; Bash(git *)" in ralph.yml, or a list in a JSON manifest.
+            rules = val.split(";") if isinstance(val, str) else val
+            cfg[cfg_key] = [rule.strip() for rule in rules if rule.strip()]
+        elif cfg_key == "race":
+            # "cmd-a --acp; cmd-b" in ralph.yml, or a list in a JSON manifest.
+            lines = val.split(";") if isinstance(val, str) else val
+            cfg[cfg_key] = [
+                shlex.split(line) if isinstance(line, str) else list(line)
+                for line in lines
+                if line and (not isinstance(line, str) or line.strip())
+            ]
         else:
             cfg[cfg_key] = val
 
     return cfg
+
+
+def _bool(val: Any) -> bool:
+    if isinstance(val, bool):
+        return val
+    text = str(val).strip().lower()
+    if text in ("true", "yes", "on", "1"):
+        return True
+    if text in ("false", "no", "off", "0"):
+        return False
+    raise ValueError(f"expected true/false, got {val!r}")
@@ -1,7 +1,43 @@
 """Promise completion detection."""
 
+from __future__ import annotations
+
+
+def _tag(phrase: str) -> str:
+    return f"<promise>{phrase}</promise>"
+
 
 def detect_promise(text: str, phrase: str) -> bool:
     if not phrase:
         return False
-    return f"<promise>{phrase}</promise>" in text
+    return _tag(phrase) in text
+
+
+class PromiseMatcher:
+    """Incremental promise detector fed one streamed chunk at a time.
+
+    Only the last ``len(tag) - 1`` characters are kept between chunks, so a
+    tag split across chunk boundaries is still found without buffering the
+    whole response.
+    """
+
+    def __init__(self, phrase: str) -> None:
+        self._tag = _tag(phrase) if phrase else ""
+        self._tail = ""
+        self.matched = False
+
+    def feed(self, chunk: str) -> bool:
+        """Consume *chunk*; return True once the full tag has been seen."""
+        if self.matched or not self._tag:
+            return self.matched
+        window = self._tail + chunk
+        if self._tag in window:
+            self.matched = True
+            self._tail = ""
+        else:
+            self._tail = window[-(len(self._tag) - 1):]
+        return self.matched
+
+    def reset(self) -> None:
+        self._tail = ""
+        self.matched = False
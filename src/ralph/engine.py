@@ -3,132 +3,929 @@
 from __future__ import annotations
 
 import asyncio
-import sys
+import contextlib
+import dataclasses
+import shlex
+import sqlite3
 import time
-from dataclasses import dataclass, field
-from typing import Literal
+from typing import TYPE_CHECKING, AsyncIterator
 
 from claude_code_acp import AcpClient
 
-from ralph.detect import detect_promise
-from ralph.prompt import build_system_prompt
+from ralph.checkpoint import (
+    TAIL_CHARS,
+    Checkpoint,
+    clear_checkpoint,
+    config_hash,
+    load_checkpoint,
+    save_checkpoint,
+)
+from ralph.detect import PromiseMatcher, detect_promise
+from ralph.events import (
+    BudgetEvent,
+    ErrorEvent,
+    EventBus,
+    Subscription,
+    IterationEndEvent,
+    IterationStartEvent,
+    PromiseEvent,
+    RaceWinnerEvent,
+    ResourceLimitEvent,
+    RestartEvent,
+    StalledEvent,
+    TextEvent,
+    ToolEndEvent,
+    ToolStartEvent,
+    TurnRetryEvent,
+    VerifyEvent,
+)
+from ralph.models import IterationResources, LoopConfig, LoopResult, LoopState, TokenUsage
+from ralph.output import make_output
+from ralph.policy import PermissionPolicy
+from ralph.prompt import (
+    build_changes_note,
+    build_iteration_prompt,
+    build_restart_note,
+    build_resume_note,
+    build_system_prompt,
+    build_verify_note,
+)
+from ralph.race import run_race
+from ralph.replay import Recorder, RecordingReader, ReplayCancelled, ReplayClient
+from ralph.resources import ResourceMonitor
+from ralph.trace import IterationSpan, Tracer
+from ralph.transcript import TranscriptWriter
+from ralph.usage import UsageMeter, estimate_tokens, watch_usage
+from ralph.verify import VerifyResult, run_verify
+from ralph.workspace import WorkspaceChanges, WorkspaceIndex
+from ralph.worktree import apply_diff
 
-LoopState = Literal["complete", "failed", "cancelled", "timeout", "max_iterations"]
+if TYPE_CHECKING:
+    from ralph.pool import AgentPool
 
+# First delay before retrying a timed-out turn; doubles on each retry.
+RETRY_BACKOFF = 5.0
+# Events queued for the console sink before text chunks start merging.
+OUTPUT_QUEUE_SIZE = 4096
 
-@dataclass
-class LoopConfig:
-    prompt: str
-    promise_phrase: str = "任務完成！🥇"
-    command: str = "claude-code-acp"
-    command_args: list[str] = field(default_factory=list)
-    working_dir: str = "."
-    max_iterations: int = 10
-    timeout_seconds: int = 1800  # 30 minutes
-    dry_run: bool = False
 
+class TurnTimeout(Exception):
+    """A turn hit its per-iteration or inactivity deadline."""
 
-@dataclass
-class LoopResult:
-    state: LoopState
-    iterations: int
-    duration_seconds: float
-    error: str | None = None
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"{reason} timeout")
+        self.reason = reason
+
+
+class ResourceLimitExceeded(Exception):
+    """The agent's process tree went over ``max_rss_mb`` or ``max_cpu_seconds``."""
+
+
+class AgentExited(ConnectionError):
+    """The agent subprocess exited in the middle of a turn."""
+
+    def __init__(self, returncode: int | None) -> None:
+        super().__init__(f"agent process exited with code {returncode}")
+        self.returncode = returncode
+
+
+def _process_exited(client: object) -> bool:
+    proc = getattr(client, "_process", None)
+    return proc is not None and proc.returncode is not None
 
 
 class RalphEngine:
-    def __init__(self, config: LoopConfig) -> None:
+    def __init__(self, config: LoopConfig, pool: AgentPool | None = None) -> None:
         self.config = config
-        self.client = AcpClient(
-            command=config.command,
-            args=config.command_args or None,
-            cwd=config.working_dir,
+        self.pool = pool
+        self.out = make_output(config.output)
+        # Every loop event goes through the bus; ``out`` subscribes for each run.
+        self.bus = EventBus()
+        self._matcher = PromiseMatcher(config.promise_phrase)
+        self._policy = PermissionPolicy(
+            config.permission_allow,
+            config.permission_ask,
+            config.permission_deny,
+            config.permission_default,
+        )
+        self._active_tools: set[str] = set()
+        self._promise_idle = asyncio.Event()
+        # Set when a turn was abandoned mid-flight; the agent isn't reused.
+        self._agent_dirty = False
+        # Whether the current ACP session has seen the full system + task text.
+        self._session_primed = False
+        self._spans: list[IterationSpan] = []
+        self._span = IterationSpan(iteration=0)
+        self._tracer: Tracer | None = None
+        # Bounded tail of the current response, kept for checkpoints.
+        self._tail = ""
+        # True while session/load replays history; those events are ignored.
+        self._replaying = False
+        self._workspace: WorkspaceIndex | None = None
+        self._stalled = 0
+        # Time of the last agent event, for the inactivity deadline.
+        self._last_event = time.monotonic()
+        self._restarts = 0
+        # Verify verdicts by workspace fingerprint; an unchanged tree isn't rerun.
+        self._verify_cache: dict[int, VerifyResult] = {}
+        # Verify run overlapping the current turn: (iteration, fingerprint, task).
+        self._pending_verify: tuple[int, int, asyncio.Task[VerifyResult]] | None = None
+        self._verified: VerifyResult | None = None  # latest verdict
+        # The agent command this engine runs; race mode may switch it.
+        self._backend = [config.command, *config.command_args]
+        # Session capture (--record) and playback in place of an agent (--replay).
+        self._recorder: Recorder | None = None
+        self._transcript: TranscriptWriter | None = None
+        self._monitor: ResourceMonitor | None = None
+        self._meter = self._new_meter()
+        self._replay = RecordingReader(config.replay_file) if config.replay_file else None
+        if pool is None:
+            self.client = self._new_client()
+            self._register_events()
+
+    @property
+    def spans(self) -> list[IterationSpan]:
+        """The current (or last) run's iteration spans."""
+        return self._spans
+
+    @property
+    def tail(self) -> str:
+        """The end of the latest response, as kept for checkpoints."""
+        return self._tail
+
+    @property
+    def verified(self) -> VerifyResult | None:
+        """The latest verify verdict, or None if nothing was verified."""
+        return self._verified
+
+    def _new_meter(self) -> UsageMeter:
+        config = self.config
+        return UsageMeter(
+            config.token_budget,
+            config.cost_budget,
+            config.input_cost_per_mtok,
+            config.output_cost_per_mtok,
         )
+
+    def _new_client(self) -> AcpClient:
+        if self._replay is not None:
+            return ReplayClient(self._replay, self.config.working_dir, self.config.replay_speed)
+        command, *args = self._backend
+        return AcpClient(command=command, args=args or None, cwd=self.config.working_dir)
+
+    async def _acquire(self) -> None:
+        from ralph.pool import pool_key
+
+        assert self.pool is not None
+        command, *args = self._backend
+        self.client = await self.pool.acquire(pool_key(command, args, self.config.working_dir))
+
+    @contextlib.asynccontextmanager
+    async def _connected(self) -> AsyncIterator[None]:
+        """Connect the agent for one run, leasing it from the pool if any.
+
+        ``self.client`` may be replaced mid-run by ``_restart``; whichever
+        client is current at the end is the one disconnected or released.
+        """
+        if self.pool is None:
+            await self.client.connect()
+            try:
+                yield
+            finally:
+                with contextlib.suppress(Exception):
+                    await self.client.disconnect()
+            return
+
+        await self._acquire()
         self._register_events()
+        self._agent_dirty = False
+        reusable = False
+        try:
+            yield
+            reusable = not self._agent_dirty
+        finally:
+            await self.pool.release(self.client, reusable=reusable)
+
+    def _check_promise_idle(self) -> None:
+        if self._matcher.matched and not self._active_tools:
+            self._promise_idle.set()
 
     def _register_events(self) -> None:
         client = self.client
 
         @client.on_text
         async def on_text(text: str) -> None:
-            sys.stdout.write(text)
-            sys.stdout.flush()
+            if self._replaying:
+                return
+            self._last_event = time.monotonic()
+            self._tail = (self._tail + text)[-TAIL_CHARS:]
+            if self._recorder is not None:
+                self._recorder.write("text", text=text)
+            self.bus.publish(TextEvent(text))
+            self._span.text(text)
+            if self._matcher.feed(text):
+                self._check_promise_idle()
 
         @client.on_tool_start
         async def on_tool_start(tool_id: str, name: str, input: dict) -> None:
-            print(f"\n🛠️  {name}", flush=True)
+            if self._replaying:
+                return
+            self._last_event = time.monotonic()
+            if self._recorder is not None:
+                self._recorder.write("tool_start", id=tool_id, name=name, input=input)
+            self._active_tools.add(tool_id)
+            self._span.tool_start(tool_id, name)
+            self.bus.publish(ToolStartEvent(tool_id, name))
 
         @client.on_tool_end
         async def on_tool_end(tool_id: str, status: str, output: object) -> None:
-            icon = "✔️" if status == "completed" else "❌"
-            print(f" {icon} {status}", flush=True)
+            if self._replaying:
+                return
+            self._last_event = time.monotonic()
+            if self._recorder is not None:
+                self._recorder.write("tool_end", id=tool_id, status=status, output=output)
+            self._span.tool_end(tool_id, status)
+            if status in ("completed", "failed"):
+                self._active_tools.discard(tool_id)
+                self._check_promise_idle()
+            self.bus.publish(ToolEndEvent(tool_id, status))
 
         @client.on_permission
         async def on_permission(name: str, input: dict, options: list) -> str:
-            # Auto-allow all tool executions in the loop.
-            # Pick the first "allow" style option from what the agent offers.
-            for opt in options:
-                opt_id = opt if isinstance(opt, str) else opt.get("id", "")
-                if opt_id in ("allow", "allow_always", "proceed_once"):
-                    return opt_id
-            # Fallback: return the first option's id
-            if options:
-                return options[0] if isinstance(options[0], str) else options[0].get("id", "allow")
-            return "allow"
+            t0 = self._last_event = time.monotonic()
+            choice = None
+            try:
+                choice = self._policy.answer(name, input, options)
+                if choice is None:
+                    # Failing the request is the only refusal left; the agent
+                    # gets an error response and doesn't run the tool.
+                    raise PermissionError(f"denied {name!r}, but the agent offered no reject option")
+                return choice
+            finally:
+                self._span.permission(time.monotonic() - t0)
+                if self._recorder is not None:
+                    self._recorder.write(
+                        "permission", name=name, input=input, options=options, choice=choice,
+                    )
 
         @client.on_error
         async def on_error(exception: Exception) -> None:
-            print(f"\n⚠️  Error: {exception}", file=sys.stderr, flush=True)
+            self._span.error(exception)
+            self.bus.publish(ErrorEvent(exception))
+
+    async def _restart(self) -> bool:
+        """Replace a dead agent with a fresh one.
+
+        Returns True if the previous session was reloaded into the new agent.
+        """
+        old = self.client
+        session_id = getattr(old, "_session_id", None)
+        if self.pool is not None:
+            await self.pool.release(old, reusable=False)
+            await self._acquire()
+        else:
+            with contextlib.suppress(Exception):
+                await old.disconnect()
+            self.client = self._new_client()
+            await self.client.connect()
+        self._register_events()
+        self._restarts += 1
+        return bool(session_id) and await self._load_session(session_id)
+
+    def _agent_pid(self) -> int | None:
+        proc = getattr(self.client, "_process", None)
+        return proc.pid if proc is not None and proc.returncode is None else None
+
+    async def _inactive(self, seconds: float) -> None:
+        """Return once no agent event has arrived for *seconds*."""
+        while True:
+            left = self._last_event + seconds - time.monotonic()
+            if left <= 0:
+                return
+            await asyncio.sleep(left)
+
+    async def _cancel_turn(self, reason: str, message: str | None = None) -> None:
+        if self._recorder is not None:
+            fields = {"message": message} if message else {}
+            self._recorder.write("cancel", reason=reason, **fields)
+        try:
+            await self.client.cancel()
+        except Exception:
+            pass
+
+    async def _turn(self, prompt: str) -> bool:
+        """Run one prompt turn; return True if the promise was detected.
+
+        The turn ends early as soon as the promise tag has streamed in and no
+        tool call is still in flight, instead of waiting for the agent to
+        finish the turn. Raises ``TurnTimeout`` when ``idle_timeout`` passes
+        without any agent event.
+        """
+        self._matcher.reset()
+        self._active_tools.clear()
+        self._promise_idle.clear()
+        self._tail = ""
+        self._last_event = time.monotonic()
+        monitor = self._monitor
+        if monitor is not None and monitor.reason is not None:
+            raise ResourceLimitExceeded(monitor.reason)
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.write("prompt", text=prompt)
+        conn = getattr(self.client, "_connection", None)
+        if conn is not None:
+            watch_usage(conn)
+
+        turn = asyncio.ensure_future(self.client.prompt(prompt))
+        waiters = {turn, asyncio.ensure_future(self._promise_idle.wait())}
+        if self.config.idle_timeout > 0:
+            waiters.add(asyncio.ensure_future(self._inactive(self.config.idle_timeout)))
+        # A dead agent never answers the pending prompt; watch the process too.
+        proc = getattr(self.client, "_process", None)
+        exited = asyncio.ensure_future(proc.wait()) if proc is not None else None
+        if exited is not None:
+            waiters.add(exited)
+        if monitor is not None and (self.config.max_rss_mb or self.config.max_cpu_seconds):
+            waiters.add(asyncio.ensure_future(monitor.exceeded.wait()))
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.cancel()
+
+        if turn.done() and not turn.cancelled():
+            error = turn.exception()
+            if isinstance(error, ReplayCancelled):
+                return await self._replay_cancelled(error)
+            if recorder is not None:
+                if error is not None:
+                    dead = isinstance(error, (ConnectionError, EOFError))
+                    recorder.write("error", message=str(error), dead=dead)
+                else:
+                    recorder.write("response", text=turn.result() or "")
+            response = turn.result() or ""
+            usage = getattr(conn, "ralph_usage", None)
+            if isinstance(usage, TokenUsage):
+                self._span.usage = usage
+            if not self._tail:
+                self._tail = response[-TAIL_CHARS:]
+            # Agents that don't stream still get the whole response back.
+            return self._matcher.matched or detect_promise(
+                response, self.config.promise_phrase,
+            )
+
+        if monitor is not None and monitor.reason is not None:
+            await self._cancel_turn("resource_limit", monitor.reason)
+            raise ResourceLimitExceeded(monitor.reason)
+        if exited is not None and exited.done():
+            if recorder is not None:
+                recorder.write("error", message=str(AgentExited(proc.returncode)), dead=True)
+            raise AgentExited(proc.returncode)
+        if self._promise_idle.is_set():
+            await self._cancel_turn("promise")
+            return True
+        await self._cancel_turn("inactivity")
+        raise TurnTimeout("inactivity")
+
+    async def _replay_cancelled(self, cancel: ReplayCancelled) -> bool:
+        """End a replayed turn the way the recorded run's engine ended it."""
+        reason = cancel.reason
+        await self._cancel_turn(reason, str(cancel) if reason == "resource_limit" else None)
+        if reason == "promise":
+            return True
+        if reason == "resource_limit":
+            raise ResourceLimitExceeded(str(cancel))
+        raise TurnTimeout(reason)
+
+    def _result(self, state: LoopState, iterations: int, start: float) -> LoopResult:
+        return LoopResult(
+            state=state,
+            iterations=iterations,
+            duration_seconds=time.monotonic() - start,
+            prompt_bytes=[span.prompt_bytes for span in self._spans],
+            restarts=self._restarts,
+            resources=[
+                IterationResources(span.iteration, span.peak_rss_mb, span.cpu_seconds, span.processes)
+                for span in self._spans
+                if span.processes
+            ],
+            usage=dataclasses.replace(self._meter.total),
+            iteration_usage=[span.usage for span in self._spans if span.usage is not None],
+        )
+
+    def _account(self, span: IterationSpan) -> None:
+        """Add *span*'s turn to the usage totals, estimating it if unreported."""
+        usage = span.usage
+        if usage is None:
+            usage = TokenUsage(
+                input_tokens=estimate_tokens(span.prompt_bytes),
+                output_tokens=estimate_tokens(span.text_bytes),
+                estimated=True,
+            )
+        span.usage = self._meter.record(usage)
+
+    def _end_iteration(self, outcome: str) -> None:
+        span = self._span
+        if span.end is None:
+            monitor = self._monitor
+            if monitor is not None and monitor.max_processes:
+                span.peak_rss_mb = round(monitor.peak_rss_mb, 1)
+                span.cpu_seconds = round(monitor.iteration_cpu_seconds, 3)
+                span.processes = monitor.max_processes
+            self._account(span)
+        span.finish(outcome)
+        if self._tracer is not None:
+            self._tracer.iteration(self._span)
+
+    async def _load_session(self, session_id: str) -> bool:
+        """Reattach to *session_id* if the agent supports ``session/load``.
+
+        ``AcpClient`` has no public API for this, so go through its
+        connection and set its session id directly.
+        """
+        conn = getattr(self.client, "_connection", None)
+        if conn is None:
+            return False
+        self._replaying = True
+        try:
+            await conn.load_session(cwd=self.client.cwd, mcp_servers=[], session_id=session_id)
+        except Exception:
+            return False
+        finally:
+            self._replaying = False
+        self.client._session_id = session_id
+        return True
+
+    def _load_resume(self) -> Checkpoint | None:
+        return load_checkpoint(self.config.working_dir, config_hash(self.config))
+
+    async def _scan_workspace(self) -> WorkspaceChanges:
+        """Rescan the working tree off the event loop."""
+        assert self._workspace is not None
+        return await asyncio.to_thread(self._workspace.scan)
+
+    async def _run_verify(self, start: float) -> VerifyResult:
+        config = self.config
+        assert config.verify_command
+        remaining = config.timeout_seconds - (time.monotonic() - start)
+        return await run_verify(config.verify_command, config.working_dir, remaining)
+
+    def _cache_verify(self, key: int, result: VerifyResult) -> None:
+        # A timeout says more about the budget left than about the tree.
+        if result.returncode is not None:
+            self._verify_cache[key] = result
+
+    def _record_verify(self, iteration: int, result: VerifyResult, cached: bool) -> None:
+        verdict = "passed" if result.ok else "failed"
+        self._span.verify = f"cached_{verdict}" if cached else verdict
+        self._span.verify_seconds = 0.0 if cached else result.seconds
+        self._verified = result
+        self.bus.publish(VerifyEvent(iteration, result.ok, result.seconds, cached))
+
+    async def _verify(self, iteration: int, start: float) -> VerifyResult:
+        """Verify the tree as of the last workspace scan, reusing a cached verdict."""
+        assert self._workspace is not None
+        key = self._workspace.fingerprint
+        result = self._verify_cache.get(key)
+        if result is not None:
+            self._record_verify(iteration, result, cached=True)
+            return result
+        result = await self._run_verify(start)
+        self._cache_verify(key, result)
+        self._record_verify(iteration, result, cached=False)
+        return result
+
+    def _start_verify(self, iteration: int, start: float) -> VerifyResult | None:
+        """Start verifying the scanned tree while the next turn runs.
+
+        Returns the verdict right away if it is cached.
+        """
+        assert self._workspace is not None
+        key = self._workspace.fingerprint
+        result = self._verify_cache.get(key)
+        if result is not None:
+            self._record_verify(iteration, result, cached=True)
+            return result
+        task = asyncio.ensure_future(self._run_verify(start))
+        self._pending_verify = (iteration, key, task)
+        return None
+
+    async def _cancel_verify(self) -> None:
+        if self._pending_verify is not None:
+            task = self._pending_verify[2]
+            self._pending_verify = None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _save_checkpoint(self, iteration: int, start: float) -> None:
+        config = self.config
+        switched = self._backend != [config.command, *config.command_args]
+        checkpoint = Checkpoint(
+            config_hash=config_hash(config),
+            iteration=iteration,
+            elapsed_seconds=time.monotonic() - start,
+            response_tail=self._tail,
+            session_id=getattr(self.client, "_session_id", None),
+            backend=self._backend if switched else None,
+        )
+        await asyncio.to_thread(save_checkpoint, config.working_dir, checkpoint)
+
+    async def _record_history(
+        self, start: float, result: LoopResult | None, error: BaseException | None,
+    ) -> None:
+        from ralph.history import record_run
+
+        if result is None:
+            state: LoopState = "cancelled" if isinstance(error, asyncio.CancelledError) else "failed"
+            result = self._result(state, len(self._spans), start)
+            result.error = str(error) if error else None
+        try:
+            await asyncio.to_thread(
+                record_run, self.config, shlex.join(self._backend), result, self._spans,
+            )
+        except (OSError, sqlite3.Error) as e:
+            # History is best-effort; never let it change the outcome of a run.
+            self.bus.publish(ErrorEvent(e))
+
+    def _build_prompt(self, system_prompt: str, iteration: int, note: str | None) -> str:
+        """The prompt for *iteration*, sized against what is left of the token budget."""
+        config = self.config
+        args = (system_prompt, config.prompt, config.promise_phrase, iteration, config.max_iterations)
+        prompt = build_iteration_prompt(
+            *args, strategy=config.prompt_strategy, primed=self._session_primed, note=note,
+        )
+        if config.token_budget and self._session_primed and config.prompt_strategy == "full":
+            share = self._meter.remaining_tokens() / (config.max_iterations - iteration + 1)
+            if estimate_tokens(len(prompt.encode("utf-8"))) > share:
+                # The session has seen the task; a digest reminder costs far less.
+                prompt = build_iteration_prompt(*args, strategy="digest", primed=True, note=note)
+        return prompt
+
+    def _prompt(self, system_prompt: str, iteration: int, note: str | None) -> str:
+        prompt = self._build_prompt(system_prompt, iteration, note)
+        self._session_primed = True
+        return prompt
+
+    def _check_budget(
+        self, system_prompt: str, iteration: int, note: str | None, start: float,
+    ) -> LoopResult | None:
+        """A ``budget`` result if *iteration* is expected to go over budget."""
+        config = self.config
+        if not (config.token_budget or config.cost_budget):
+            return None
+        prompt = self._build_prompt(system_prompt, iteration, note)
+        reason = self._meter.over_budget(estimate_tokens(len(prompt.encode("utf-8"))))
+        if reason is None:
+            return None
+        self.bus.publish(BudgetEvent(reason))
+        result = self._result("budget", iteration - 1, start)
+        result.error = reason
+        return result
+
+    async def _attempt(
+        self, system_prompt: str, iteration: int, note: str | None, start: float,
+    ) -> bool | None:
+        """Run one iteration's turn, retrying hung turns and restarting dead agents.
+
+        Returns whether the promise was detected, or None once the run's
+        time budget or the retries are used up.
+        """
+        config = self.config
+        prompt = self._prompt(system_prompt, iteration, note)
+        retries = 0
+        while True:
+            self._span = IterationSpan(
+                iteration=iteration, prompt_bytes=len(prompt.encode("utf-8")),
+            )
+            self._spans.append(self._span)
+            if self._monitor is not None:
+                self._monitor.begin_iteration()
+            remaining = max(0.0, config.timeout_seconds - (time.monotonic() - start))
+            limit = remaining
+            if 0 < config.iteration_timeout < remaining:
+                limit = config.iteration_timeout
+            try:
+                promised = await asyncio.wait_for(self._turn(prompt), timeout=limit)
+                if self._monitor is not None:
+                    # Catch up on what the turn used since the last sample.
+                    await self._monitor.sample()
+                return promised
+            except ResourceLimitExceeded as e:
+                self._agent_dirty = True
+                self._span.error(e)
+                self._end_iteration("resource_limit")
+                raise
+            except (asyncio.TimeoutError, TurnTimeout) as e:
+                self._agent_dirty = True
+                if isinstance(e, TurnTimeout):
+                    reason = e.reason
+                else:
+                    reason = "iteration" if limit < remaining else "timeout"
+                    await self._cancel_turn(reason)
+                if reason == "timeout":
+                    # The run's time budget is spent (or was, in the recording).
+                    self._end_iteration("timeout")
+                    return None
+                self._span.error(f"{reason} timeout")
+                remaining = config.timeout_seconds - (time.monotonic() - start)
+                delay = RETRY_BACKOFF * 2**retries
+                if retries >= config.turn_retries or delay >= remaining:
+                    self._end_iteration("timeout")
+                    return None
+                retries += 1
+                self._end_iteration("retry")
+                self.bus.publish(TurnRetryEvent(iteration, reason, delay))
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._end_iteration("cancelled")
+                raise
+            except Exception as e:
+                self._span.error(e)
+                dead = isinstance(e, (ConnectionError, EOFError)) or _process_exited(self.client)
+                if not dead or self._restarts >= config.max_restarts:
+                    self._end_iteration("error")
+                    raise
+                self._end_iteration("restart")
+                self.bus.publish(RestartEvent(iteration, e))
+                tail = self._tail
+                self._session_primed = await self._restart()
+                restart_note = build_restart_note(iteration, tail, self._session_primed)
+                prompt = self._prompt(
+                    system_prompt, iteration, "\n\n".join(filter(None, (restart_note, note))),
+                )
+            except BaseException as e:
+                self._span.error(e)
+                self._end_iteration("error")
+                raise
+
+    def _start_output(self) -> Subscription:
+        """Subscribe ``out`` to the bus and start delivering events."""
+        self.out.start()
+        # Under backpressure, text chunks are merged where possible, not dropped.
+        output = self.bus.subscribe(self.out.handle, OUTPUT_QUEUE_SIZE, overflow="coalesce")
+        self.bus.start()
+        return output
+
+    async def _close_output(self, output: Subscription) -> None:
+        await self.bus.close()
+        self.bus.unsubscribe(output)
+        await self.out.close()
+
+    async def run_turn(self, iteration: int = 1) -> bool | None:
+        """Run just *iteration* on its own agent connection (used by race mode).
+
+        Returns whether the promise was detected, or None on timeout. The
+        iteration's span is left open in ``self._span`` for the caller.
+        """
+        start = time.monotonic()
+        self._spans = []
+        output = self._start_output()
+        try:
+            async with self._connected():
+                system_prompt = build_system_prompt(self.config.promise_phrase)
+                return await self._attempt(system_prompt, iteration, None, start)
+        finally:
+            await self._close_output(output)
+
+    async def _race(self, start: float) -> bool | None:
+        """Race iteration 1 across backends and adopt the winner.
+
+        The winner's changes are applied to ``working_dir`` and its backend
+        runs the rest of the loop, on a fresh agent.
+        """
+        config = self.config
+        remaining = config.timeout_seconds - (time.monotonic() - start)
+        race = await run_race(
+            config, [self._backend, *config.race], config.hedge_after_seconds, remaining,
+        )
+        winner = race.winner
+        self._span = winner.spans[-1]
+        for entrant in race.entrants:
+            for span in entrant.spans:
+                self._spans.append(span)
+                if span is not self._span:
+                    self._account(span)
+                    span.finish("race_lost")
+                    if self._tracer is not None:
+                        self._tracer.iteration(span)
+        self._tail = winner.tail
+        self.bus.publish(RaceWinnerEvent(shlex.join(winner.backend), len(race.entrants)))
+        if winner.worktree is not None:
+            await asyncio.to_thread(apply_diff, winner.worktree, winner.patch)
+
+        self._switch_backend(winner.backend)
+        return winner.promised
+
+    def _switch_backend(self, backend: list[str]) -> None:
+        """Run the rest of the loop on *backend* (not yet connected)."""
+        if backend == self._backend:
+            return
+        self._backend = backend
+        if self.pool is None:
+            self.client = self._new_client()
+            self._register_events()
 
     async def run(self) -> LoopResult:
+        config = self.config
+        resume = self._load_resume() if config.resume else None
+        if resume is not None and resume.backend:
+            self._switch_backend(resume.backend)
+        # A resumed run keeps counting from the time already spent.
+        start = time.monotonic() - (resume.elapsed_seconds if resume else 0.0)
+        self._spans = []
+        self._session_primed = False
+        self._meter = self._new_meter()
+        self._tracer = None
+        self._monitor = None
+        transcript: Subscription | None = None
+        output: Subscription | None = None
+        result: LoopResult | None = None
+        error: BaseException | None = None
+        try:
+            # Set up inside the try, so whatever started is closed again
+            # should a later step fail (e.g. the trace file cannot be opened).
+            self._tracer = Tracer(config.trace_file) if config.trace_file else None
+            if config.record_file:
+                self._recorder = Recorder(config.record_file, self._backend, config.working_dir)
+                await self._recorder.start()
+            if config.resource_interval > 0 and self._replay is None:
+                self._monitor = ResourceMonitor(
+                    self._agent_pid,
+                    config.resource_interval,
+                    config.max_rss_mb,
+                    config.max_cpu_seconds,
+                )
+                self._monitor.start()
+            if config.transcript:
+                self._transcript = TranscriptWriter.create(config.working_dir, {
+                    "command": shlex.join(self._backend),
+                    "prompt": config.prompt.strip().partition("\n")[0][:200],
+                })
+                # Everything persisted must arrive: text merges under load, nothing drops.
+                transcript = self.bus.subscribe(
+                    self._transcript.handle, OUTPUT_QUEUE_SIZE, overflow="lossless",
+                )
+                self._transcript.start()
+            output = self._start_output()
+            if self._tracer is not None:
+                await self._tracer.start()
+            result = await self._loop(start, resume)
+            if self._transcript is not None:
+                result.transcript = self._transcript.run_id
+            if config.checkpoint:
+                clear_checkpoint(config.working_dir, config_hash(config))
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self._cancel_verify()
+            if self._monitor is not None:
+                await self._monitor.close()
+            if config.history:
+                await self._record_history(start, result, error)
+            if self._tracer is not None:
+                self._tracer.run(start, {
+                    "ralph.state": result.state if result else "failed",
+                    "ralph.iterations": result.iterations if result else len(self._spans),
+                    "ralph.command": config.command,
+                })
+                await self._tracer.close()
+            if self._recorder is not None:
+                await self._recorder.close()
+                self._recorder = None
+            if self._replay is not None:
+                self._replay.close()
+            if output is not None:
+                await self._close_output(output)
+            if transcript is not None:
+                self.bus.unsubscribe(transcript)
+            if self._transcript is not None:
+                await self._transcript.close()
+                self._transcript = None
+
+    async def _loop(self, start: float, resume: Checkpoint | None) -> LoopResult:
         config = self.config
         system_prompt = build_system_prompt(config.promise_phrase)
-        start = time.monotonic()
+        first = resume.iteration + 1 if resume else 1
+        note = None
+
+        if config.stall_limit > 0 or config.change_summary or config.verify_command:
+            self._workspace = WorkspaceIndex(config.working_dir)
+            self._stalled = 0
+            await self._scan_workspace()
+
+        if config.race and first == 1:
+            # Race the first iteration before connecting: the winner decides
+            # which backend runs the rest of the loop.
+            result = self._check_budget(system_prompt, 1, None, start)
+            if result is not None:
+                return result
+            self.bus.publish(IterationStartEvent(1, config.max_iterations))
+            result, note = await self._finish_iteration(1, await self._race(start), start)
+            if result is not None:
+                return result
+            first = 2
 
-        async with self.client:
-            for i in range(1, config.max_iterations + 1):
+        async with self._connected():
+            if resume is not None:
+                if resume.session_id:
+                    self._session_primed = await self._load_session(resume.session_id)
+                if not self._session_primed:
+                    note = build_resume_note(resume.iteration, resume.response_tail)
+
+            for i in range(first, config.max_iterations + 1):
                 elapsed = time.monotonic() - start
                 if elapsed >= config.timeout_seconds:
-                    return LoopResult(
-                        state="timeout",
-                        iterations=i - 1,
-                        duration_seconds=elapsed,
-                    )
+                    return self._result("timeout", i - 1, start)
+                result = self._check_budget(system_prompt, i, note, start)
+                if result is not None:
+                    return result
 
-                print(f"\n━━━ Iteration {i}/{config.max_iterations} ━━━", flush=True)
+                self.bus.publish(IterationStartEvent(i, config.max_iterations))
+                try:
+                    promised = await self._attempt(system_prompt, i, note, start)
+                except ResourceLimitExceeded as e:
+                    self.bus.publish(ResourceLimitEvent(str(e)))
+                    result = self._result("resource_limit", i, start)
+                    result.error = str(e)
+                    return result
+                result, note = await self._finish_iteration(i, promised, start)
+                if result is not None:
+                    return result
 
-                prompt = (
-                    f"{system_prompt}\n\n---\n\n"
-                    f"[Iteration {i}/{config.max_iterations}]\n\n{config.prompt}"
-                )
+        return self._result("max_iterations", config.max_iterations, start)
 
-                try:
-                    response = await asyncio.wait_for(
-                        self.client.prompt(prompt),
-                        timeout=max(0, config.timeout_seconds - elapsed),
-                    )
-                except asyncio.TimeoutError:
-                    return LoopResult(
-                        state="timeout",
-                        iterations=i,
-                        duration_seconds=time.monotonic() - start,
-                    )
+    async def _finish_iteration(
+        self, iteration: int, promised: bool | None, start: float,
+    ) -> tuple[LoopResult | None, str | None]:
+        """Close out an iteration's turn.
 
-                if detect_promise(response, config.promise_phrase):
-                    print(
-                        f"\n🎉 Promise detected: \"{config.promise_phrase}\"",
-                        flush=True,
-                    )
-                    return LoopResult(
-                        state="complete",
-                        iterations=i,
-                        duration_seconds=time.monotonic() - start,
-                    )
+        Returns the loop result if the loop should stop, and the note (change
+        summary, failed verification) for the next iteration's prompt.
+        """
+        config = self.config
+        if promised is None:
+            return self._result("timeout", iteration, start), None
+        if promised and not config.verify_command:
+            self._end_iteration("complete")
+            self.bus.publish(PromiseEvent(config.promise_phrase))
+            return self._result("complete", iteration, start), None
 
-                print(f"\n✓ Iteration {i} complete", flush=True)
+        overlapped = None
+        if self._pending_verify is not None:
+            overlapped_iteration, key, task = self._pending_verify
+            overlapped = (overlapped_iteration, key, await task)
+            self._pending_verify = None
 
-        return LoopResult(
-            state="max_iterations",
-            iterations=config.max_iterations,
-            duration_seconds=time.monotonic() - start,
-        )
+        notes: list[str] = []
+        changes = None
+        if self._workspace is not None:
+            changes = await self._scan_workspace()
+            self._span.files_changed = len(changes)
+            if changes and config.change_summary:
+                notes.append(build_changes_note(changes))
+
+        if overlapped is not None:
+            overlapped_iteration, key, result = overlapped
+            # The tree may have changed while the command ran; only a tree that
+            # stayed put through the turn can trust the verdict.
+            if not changes:
+                self._cache_verify(key, result)
+            self._record_verify(overlapped_iteration, result, cached=False)
+
+        outcome = "continue"
+        verified = None
+        if promised:
+            verified = await self._verify(iteration, start)
+            if verified.ok:
+                self._end_iteration("complete")
+                self.bus.publish(PromiseEvent(config.promise_phrase))
+                return self._result("complete", iteration, start), None
+            outcome = "verify_failed"
+        elif config.verify_command and config.verify_on == "iteration":
+            if config.verify_overlap:
+                verified = self._start_verify(iteration, start)
+            else:
+                verified = await self._verify(iteration, start)
+
+        command = config.verify_command or ""
+        if verified is not None and not verified.ok:
+            notes.append(build_verify_note(command, verified, iteration))
+        elif verified is None and overlapped is not None and not overlapped[2].ok:
+            # Nothing newer to report yet: pass on the verdict on the older tree.
+            notes.append(build_verify_note(command, overlapped[2], overlapped[0]))
+
+        if self._workspace is not None:
+            self._stalled = 0 if changes else self._stalled + 1
+            if config.stall_limit and self._stalled >= config.stall_limit:
+                self._end_iteration("stalled")
+                self.bus.publish(StalledEvent(self._stalled))
+                return self._result("stalled", iteration, start), None
+
+        self._end_iteration(outcome)
+        self.bus.publish(IterationEndEvent(iteration, self._span.prompt_bytes))
+        if config.checkpoint:
+            await self._save_checkpoint(iteration, start)
+        return None, "\n\n".join(notes) or None
@@ -0,0 +1,267 @@
+"""Typed loop events and a fan-out bus that never blocks the publisher.
+
+The engine publishes every agent and loop event once; each subscriber (the
+console sink, a ``ralph serve`` job stream, a log file, a metrics exporter)
+gets its own bounded queue drained by its own task. ``publish`` only appends
+to those queues, so a slow subscriber can never stall the ACP reader. When a
+queue is full its overflow policy applies: ``drop_oldest`` discards the oldest
+queued event; ``coalesce`` first tries to merge a text chunk into the text
+event at the back of the queue and otherwise drops the oldest too;
+``lossless`` merges text the same way but never drops, letting the queue grow
+past *maxsize* instead (for subscribers that persist every event).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, ClassVar, Literal, Union
+
+Overflow = Literal["drop_oldest", "coalesce", "lossless"]
+OVERFLOW_POLICIES: tuple[str, ...] = ("drop_oldest", "coalesce", "lossless")
+
+DEFAULT_QUEUE_SIZE = 1024
+
+
+@dataclass(slots=True)
+class Event:
+    """Base of all loop events; treat instances as read-only.
+
+    Plain slotted dataclasses, not frozen ones: they are built for every
+    streamed chunk and frozen construction costs twice as much.
+    """
+
+    # Name of the matching ``Output`` method.
+    kind: ClassVar[str] = ""
+
+    def values(self) -> list[Any]:
+        # Events are one level deep, so ``__slots__`` lists every field in order.
+        return [getattr(self, name) for name in self.__slots__]
+
+
+@dataclass(slots=True)
+class TextEvent(Event):
+    kind: ClassVar[str] = "text"
+    chunk: str
+
+
+@dataclass(slots=True)
+class ToolStartEvent(Event):
+    kind: ClassVar[str] = "tool_start"
+    tool_id: str
+    name: str
+
+
+@dataclass(slots=True)
+class ToolEndEvent(Event):
+    kind: ClassVar[str] = "tool_end"
+    tool_id: str
+    status: str
+
+
+@dataclass(slots=True)
+class ErrorEvent(Event):
+    kind: ClassVar[str] = "error"
+    exception: BaseException
+
+
+@dataclass(slots=True)
+class IterationStartEvent(Event):
+    kind: ClassVar[str] = "iteration_start"
+    iteration: int
+    max_iterations: int
+
+
+@dataclass(slots=True)
+class IterationEndEvent(Event):
+    kind: ClassVar[str] = "iteration_end"
+    iteration: int
+    prompt_bytes: int
+
+
+@dataclass(slots=True)
+class PromiseEvent(Event):
+    kind: ClassVar[str] = "promise"
+    phrase: str
+
+
+@dataclass(slots=True)
+class StalledEvent(Event):
+    kind: ClassVar[str] = "stalled"
+    iterations: int
+
+
+@dataclass(slots=True)
+class ResourceLimitEvent(Event):
+    kind: ClassVar[str] = "resource_limit"
+    reason: str
+
+
+@dataclass(slots=True)
+class BudgetEvent(Event):
+    kind: ClassVar[str] = "budget"
+    reason: str
+
+
+@dataclass(slots=True)
+class TurnRetryEvent(Event):
+    kind: ClassVar[str] = "turn_retry"
+    iteration: int
+    reason: str
+    delay: float
+
+
+@dataclass(slots=True)
+class RestartEvent(Event):
+    kind: ClassVar[str] = "restart"
+    iteration: int
+    error: BaseException
+
+
+@dataclass(slots=True)
+class RaceWinnerEvent(Event):
+    kind: ClassVar[str] = "race_winner"
+    backend: str
+    entrants: int
+
+
+@dataclass(slots=True)
+class VerifyEvent(Event):
+    kind: ClassVar[str] = "verify"
+    iteration: int
+    ok: bool
+    seconds: float
+    cached: bool
+
+
+@dataclass(slots=True)
+class TaskStartEvent(Event):
+    kind: ClassVar[str] = "task_start"
+    name: str
+
+
+@dataclass(slots=True)
+class TaskEndEvent(Event):
+    kind: ClassVar[str] = "task_end"
+    name: str
+    state: str
+    iterations: int
+    duration_seconds: float
+    error: str | None
+
+
+@dataclass(slots=True)
+class PoolStatsEvent(Event):
+    kind: ClassVar[str] = "pool_stats"
+    hits: int
+    misses: int
+    spawned: int
+    recycled: int
+
+
+Handler = Callable[[Event], Union[None, Awaitable[None]]]
+
+
+class Subscription:
+    """One subscriber's bounded queue and the task that drains it."""
+
+    def __init__(self, handler: Handler, maxsize: int, overflow: Overflow) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self.handler = handler
+        self._is_async = inspect.iscoroutinefunction(handler)
+        self.maxsize = max(1, maxsize)
+        self.overflow = overflow
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0  # handler exceptions, swallowed so delivery goes on
+        self._queue: deque[Event] = deque()
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task[None] | None = None
+
+    def offer(self, event: Event) -> None:
+        queue = self._queue
+        if len(queue) >= self.maxsize:
+            if (
+                self.overflow != "drop_oldest"
+                and isinstance(event, TextEvent)
+                and isinstance(queue[-1], TextEvent)
+            ):
+                queue[-1] = TextEvent(queue[-1].chunk + event.chunk)
+                self.coalesced += 1
+                return
+            if self.overflow != "lossless":
+                queue.popleft()
+                self.dropped += 1
+        queue.append(event)
+        self._ready.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        """Deliver what is queued, then stop."""
+        self._closing = True
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            while self._queue:
+                event = self._queue.popleft()
+                try:
+                    if self._is_async:
+                        await self.handler(event)  # type: ignore[misc]
+                    else:
+                        self.handler(event)
+                except Exception:
+                    self.errors += 1
+            if self._closing:
+                return
+            self._ready.clear()
+            await self._ready.wait()
+
+
+class EventBus:
+    """Fans each published event out to every subscriber's queue."""
+
+    def __init__(self) -> None:
+        self._subscriptions: list[Subscription] = []
+        self._running = False
+
+    def subscribe(
+        self,
+        handler: Handler,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: Overflow = "drop_oldest",
+    ) -> Subscription:
+        """Deliver events to *handler* (sync or async) from its own task."""
+        subscription = Subscription(handler, maxsize, overflow)
+        self._subscriptions.append(subscription)
+        if self._running:
+            subscription.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.remove(subscription)
+
+    def publish(self, event: Event) -> None:
+        for subscription in self._subscriptions:
+            subscription.offer(event)
+
+    def start(self) -> None:
+        self._running = True
+        for subscription in self._subscriptions:
+            subscription.start()
+
+    async def close(self) -> None:
+        """Drain every subscriber's queue and stop their tasks."""
+        self._running = False
+        await asyncio.gather(*(s.close() for s in self._subscriptions))
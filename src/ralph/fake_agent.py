@@ -0,0 +1,241 @@
+"""Scripted stand-in ACP agent for offline tests and benchmarks.
+
+Speaks just enough of the Agent Client Protocol (newline-delimited JSON-RPC
+over stdio) for ``AcpClient`` to drive it, with no model behind it::
+
+    ralph "anything" -c python --command-args="-m ralph.fake_agent --promise-on 3"
+
+Every prompt turn streams ``--chunks`` text chunks of ``--chunk-size`` bytes
+(at ``--rate`` chunks per second, 0 = unthrottled), runs ``--tools`` tool calls
+(asking for permission first with ``--permission``; a tool granted
+``allow_always`` isn't asked about again, a rejected one fails), and from the
+iteration given by ``--promise-on`` (read from the ``[Iteration N/M]`` header)
+ends with the ``<promise>`` tag. ``--write FILE`` appends a line to FILE
+(relative to the agent's working directory) every turn, and ``--crash-on N``
+kills the process halfway through the Nth turn it serves. ``--usage IN OUT``
+reports that many input / output tokens in each prompt response's ``_meta``.
+Uses only the standard library so it starts fast and never touches the network.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any
+
+
+_ITERATION = re.compile(r"\[Iteration (\d+)/\d+\]")
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m ralph.fake_agent")
+    p.add_argument("--chunks", type=int, default=5, help="Text chunks per turn")
+    p.add_argument("--chunk-size", type=int, default=64, help="Bytes per text chunk")
+    p.add_argument("--rate", type=float, default=0.0, help="Chunks per second (0 = unthrottled)")
+    p.add_argument("--tools", type=int, default=0, help="Tool calls per turn")
+    p.add_argument("--tool-seconds", type=float, default=0.0, help="Duration of each tool call")
+    p.add_argument("--permission", action="store_true", help="Request permission before each tool")
+    p.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before responding")
+    p.add_argument("--promise-on", type=int, default=0, help="Iteration that emits the promise (0 = never)")
+    p.add_argument("--promise", default="任務完成！🥇", help="Promise phrase")
+    p.add_argument("--load-session", action="store_true", help="Advertise and accept session/load")
+    p.add_argument("--crash-on", type=int, default=0, help="Exit abruptly during this turn (0 = never)")
+    p.add_argument("--write", default=None, help="File to append a line to on every turn")
+    p.add_argument(
+        "--usage", type=int, nargs=2, default=None, metavar=("IN", "OUT"),
+        help="Token usage to report with every prompt response",
+    )
+    return p
+
+
+class FakeAgent:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future[Any]] = {}
+        self._turns = 0
+        self._cancelled: set[str] = set()
+        self._sessions = itertools.count(1)
+        self._chunk_seq = itertools.count()
+        self._always_allowed: set[str] = set()
+
+    # --- wire ---
+
+    def _send(self, message: dict[str, Any]) -> None:
+        sys.stdout.buffer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        sys.stdout.buffer.flush()
+
+    def _reply(self, msg_id: Any, result: Any) -> None:
+        self._send({"jsonrpc": "2.0", "id": msg_id, "result": result})
+
+    def _notify(self, method: str, params: dict[str, Any]) -> None:
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    async def _request(self, method: str, params: dict[str, Any]) -> Any:
+        msg_id = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = fut
+        self._send({"jsonrpc": "2.0", "id": msg_id, "method": method, "params": params})
+        return await fut
+
+    def _update(self, session_id: str, update: dict[str, Any]) -> None:
+        self._notify("session/update", {"sessionId": session_id, "update": update})
+
+    # --- protocol ---
+
+    async def handle(self, message: dict[str, Any]) -> None:
+        if "method" not in message:
+            fut = self._pending.pop(message.get("id"), None)
+            if fut is not None and not fut.done():
+                fut.set_result(message.get("result"))
+            return
+
+        method = message["method"]
+        params = message.get("params") or {}
+        msg_id = message.get("id")
+
+        if method == "initialize":
+            self._reply(msg_id, {
+                "protocolVersion": params.get("protocolVersion", 1),
+                "agentCapabilities": {"loadSession": self.args.load_session},
+                "agentInfo": {"name": "ralph-fake-agent", "version": "0"},
+            })
+        elif method == "session/new":
+            self._reply(msg_id, {"sessionId": f"fake-{next(self._sessions)}"})
+        elif method == "session/load" and self.args.load_session:
+            self._update(params.get("sessionId", ""), {
+                "sessionUpdate": "agent_message_chunk",
+                "content": {"type": "text", "text": "(replayed history)"},
+            })
+            self._reply(msg_id, {})
+        elif method == "session/prompt":
+            text = "".join(b.get("text", "") for b in params.get("prompt", []))
+            stop = await self._turn(params["sessionId"], text)
+            response: dict[str, Any] = {"stopReason": stop}
+            if self.args.usage:
+                tokens_in, tokens_out = self.args.usage
+                response["_meta"] = {"usage": {"inputTokens": tokens_in, "outputTokens": tokens_out}}
+            self._reply(msg_id, response)
+        elif method == "session/cancel":
+            self._cancelled.add(params.get("sessionId", ""))
+        elif msg_id is not None:
+            self._send({
+                "jsonrpc": "2.0",
+                "id": msg_id,
+                "error": {"code": -32601, "message": f"Method not found: {method}"},
+            })
+
+    async def _turn(self, session_id: str, prompt: str) -> str:
+        args = self.args
+        self._turns += 1
+        # Prefer the loop's own iteration number so resumed runs line up.
+        match = _ITERATION.search(prompt)
+        iteration = int(match.group(1)) if match else self._turns
+        self._cancelled.discard(session_id)
+        interval = 1.0 / args.rate if args.rate > 0 else 0.0
+        if args.delay:
+            await asyncio.sleep(args.delay)
+        if args.write:
+            with open(args.write, "a", encoding="utf-8") as f:
+                f.write(f"iteration {iteration}\n")
+
+        for t in range(args.tools):
+            tool_id = f"tool-{self._turns}-{t}"
+            title = f"Fake tool {t}"
+            self._update(session_id, {
+                "sessionUpdate": "tool_call",
+                "toolCallId": tool_id,
+                "title": title,
+                "status": "pending",
+                "rawInput": {"n": t},
+            })
+            status = "completed"
+            if args.permission and title not in self._always_allowed:
+                response = await self._request("session/request_permission", {
+                    "sessionId": session_id,
+                    "toolCall": {"toolCallId": tool_id, "title": title, "rawInput": {"n": t}},
+                    "options": [
+                        {"optionId": "allow", "name": "Allow", "kind": "allow_once"},
+                        {"optionId": "allow_always", "name": "Always allow", "kind": "allow_always"},
+                        {"optionId": "reject", "name": "Reject", "kind": "reject_once"},
+                    ],
+                })
+                choice = ((response or {}).get("outcome") or {}).get("optionId")
+                if choice == "allow_always":
+                    self._always_allowed.add(title)
+                elif choice == "reject":
+                    status = "failed"
+            if args.tool_seconds:
+                await asyncio.sleep(args.tool_seconds)
+            self._update(session_id, {
+                "sessionUpdate": "tool_call_update",
+                "toolCallId": tool_id,
+                "status": status,
+                "rawOutput": {"ok": status == "completed"},
+            })
+
+        for n in range(args.chunks):
+            if session_id in self._cancelled:
+                return "cancelled"
+            if self._turns == args.crash_on and n == args.chunks // 2:
+                os._exit(70)
+            # AcpClient drops chunks it has already seen, so keep each unique.
+            head = f"{next(self._chunk_seq):08d} "
+            text = head + "x" * max(0, args.chunk_size - len(head) - 1) + "\n"
+            self._update(session_id, {
+                "sessionUpdate": "agent_message_chunk",
+                "content": {"type": "text", "text": text},
+            })
+            if interval:
+                await asyncio.sleep(interval)
+            else:
+                await asyncio.sleep(0)
+
+        if args.promise_on and iteration >= args.promise_on:
+            self._update(session_id, {
+                "sessionUpdate": "agent_message_chunk",
+                "content": {"type": "text", "text": f"<promise>{args.promise}</promise>"},
+            })
+        return "end_turn"
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    agent = FakeAgent(args)
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue[bytes] = asyncio.Queue()
+
+    def read_stdin() -> None:
+        for raw in sys.stdin.buffer:
+            loop.call_soon_threadsafe(lines.put_nowait, raw)
+        loop.call_soon_threadsafe(lines.put_nowait, b"")
+
+    threading.Thread(target=read_stdin, daemon=True).start()
+
+    tasks: set[asyncio.Task[None]] = set()
+    while True:
+        raw = await lines.get()
+        if not raw:
+            break
+        if not raw.strip():
+            continue
+        task = asyncio.ensure_future(agent.handle(json.loads(raw)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _build_parser().parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Run history: every loop and its iterations in ``.ralph/history.db``.
+
+``ralph stats`` reads it back as percentiles per agent command and per
+prompt, for tuning ``max_iterations`` and ``timeout_seconds`` from data.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+from ralph.prompt import task_digest
+from ralph.state import STATE_DIR, state_dir
+
+if TYPE_CHECKING:
+    from ralph.models import LoopConfig, LoopResult
+    from ralph.trace import IterationSpan
+
+HISTORY_FILE = "history.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    command TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    prompt_title TEXT NOT NULL,
+    state TEXT NOT NULL,
+    iterations INTEGER NOT NULL,
+    duration_seconds REAL NOT NULL,
+    prompt_bytes INTEGER NOT NULL,
+    restarts INTEGER NOT NULL,
+    max_iterations INTEGER NOT NULL,
+    timeout_seconds INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS iterations (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    iteration INTEGER NOT NULL,
+    turn_seconds REAL NOT NULL,
+    ttft_seconds REAL,
+    prompt_bytes INTEGER NOT NULL,
+    text_bytes INTEGER NOT NULL,
+    tools TEXT NOT NULL,
+    files_changed INTEGER,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS iterations_by_run ON iterations (run_id);
+"""
+
+
+def history_path(working_dir: str) -> Path:
+    return state_dir(working_dir) / HISTORY_FILE
+
+
+@contextlib.contextmanager
+def _connect(path: Path) -> Iterator[sqlite3.Connection]:
+    db = sqlite3.connect(str(path), timeout=10.0)
+    try:
+        db.executescript(_SCHEMA)
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def _title(prompt: str) -> str:
+    first = next((line.strip() for line in prompt.splitlines() if line.strip()), "")
+    return first[:60]
+
+
+def record_run(
+    config: LoopConfig, command: str, result: LoopResult, spans: list[IterationSpan],
+) -> None:
+    """Append one finished run and its iteration spans to the history."""
+    with _connect(history_path(config.working_dir)) as db:
+        cur = db.execute(
+            "INSERT INTO runs (started_at, command, prompt_hash, prompt_title, state,"
+            " iterations, duration_seconds, prompt_bytes, restarts, max_iterations,"
+            " timeout_seconds, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                time.time() - result.duration_seconds,
+                command,
+                task_digest(config.prompt),
+                _title(config.prompt),
+                result.state,
+                result.iterations,
+                result.duration_seconds,
+                sum(result.prompt_bytes),
+                result.restarts,
+                config.max_iterations,
+                config.timeout_seconds,
+                result.error,
+            ),
+        )
+        db.executemany(
+            "INSERT INTO iterations (run_id, iteration, turn_seconds, ttft_seconds,"
+            " prompt_bytes, text_bytes, tools, files_changed, outcome)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    cur.lastrowid,
+                    span.iteration,
+                    span.turn_seconds,
+                    span.ttft_seconds,
+                    span.prompt_bytes,
+                    span.text_bytes,
+                    json.dumps(span.tool_counts()),
+                    span.files_changed,
+                    span.outcome,
+                )
+                for span in spans
+            ],
+        )
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """Nearest-rank percentile of *values* (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class GroupStats:
+    key: str
+    label: str
+    runs: int = 0
+    states: dict[str, int] = field(default_factory=dict)
+    iterations_to_complete: list[int] = field(default_factory=list)
+    durations: list[float] = field(default_factory=list)
+    turn_seconds: list[float] = field(default_factory=list)
+    tools: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def success_rate(self) -> float:
+        return self.states.get("complete", 0) / self.runs if self.runs else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        its, durs, turns = self.iterations_to_complete, self.durations, self.turn_seconds
+        return {
+            "key": self.key,
+            "label": self.label,
+            "runs": self.runs,
+            "success_rate": round(self.success_rate, 3),
+            "states": self.states,
+            "iterations_to_complete": {
+                "p50": percentile(its, 50), "p90": percentile(its, 90),
+                "p95": percentile(its, 95), "max": max(its, default=None),
+            },
+            "duration_seconds": {
+                "p50": percentile(durs, 50), "p95": percentile(durs, 95),
+                "p99": percentile(durs, 99),
+            },
+            "turn_seconds": {"p50": percentile(turns, 50), "p95": percentile(turns, 95)},
+            "tools": self.tools,
+        }
+
+
+def load_stats(working_dir: str, by: str = "command", since: float | None = None) -> list[GroupStats]:
+    """Aggregate the history per ``command`` or per ``prompt``, busiest first.
+
+    *since* is a Unix time; older runs are skipped.
+    """
+    path = Path(working_dir) / STATE_DIR / HISTORY_FILE
+    if not path.exists():
+        return []
+    key_sql = "r.command" if by == "command" else "r.prompt_hash"
+    groups: dict[str, GroupStats] = {}
+    with _connect(path) as db:
+        # One read transaction, so both queries see the same runs.
+        db.execute("BEGIN")
+        runs = db.execute(
+            f"SELECT r.id, {key_sql}, r.prompt_title, r.state, r.iterations, r.duration_seconds"
+            " FROM runs r WHERE r.started_at >= ? ORDER BY r.id",
+            (since or 0.0,),
+        ).fetchall()
+        for _, key, title, state, iterations, duration in runs:
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = GroupStats(key, key if by == "command" else title)
+            group.runs += 1
+            group.states[state] = group.states.get(state, 0) + 1
+            group.durations.append(duration)
+            if state == "complete":
+                group.iterations_to_complete.append(iterations)
+        turns = db.execute(
+            f"SELECT {key_sql}, i.turn_seconds, i.tools FROM iterations i"
+            " JOIN runs r ON r.id = i.run_id WHERE r.started_at >= ?",
+            (since or 0.0,),
+        )
+        for key, seconds, tools in turns:
+            group = groups.get(key)
+            if group is None:
+                continue
+            group.turn_seconds.append(seconds)
+            for name, count in json.loads(tools).items():
+                group.tools[name] = group.tools.get(name, 0) + count
+    return sorted(groups.values(), key=lambda g: -g.runs)
@@ -0,0 +1,110 @@
+"""Loop configuration and result types.
+
+Kept free of heavy imports (no asyncio, no ACP client) so the CLI can build
+and validate a ``LoopConfig`` for ``--help`` / ``--dry-run`` without paying
+for the agent stack.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Literal
+
+from ralph.prompt import PromptStrategy
+
+LoopState = Literal[
+    "complete", "failed", "cancelled", "timeout", "max_iterations", "stalled", "resource_limit",
+    "budget",
+]
+
+OutputMode = Literal["plain", "quiet", "jsonl"]
+OUTPUT_MODES: tuple[str, ...] = ("plain", "quiet", "jsonl")
+
+VerifyOn = Literal["promise", "iteration"]
+VERIFY_ON: tuple[str, ...] = ("promise", "iteration")
+
+PermissionAction = Literal["allow", "ask", "deny"]
+PERMISSION_ACTIONS: tuple[str, ...] = ("allow", "ask", "deny")
+
+
+@dataclass
+class LoopConfig:
+    prompt: str
+    promise_phrase: str = "任務完成！🥇"
+    command: str = "claude-code-acp"
+    command_args: list[str] = field(default_factory=list)
+    # Extra backends ([command, *args]) raced against ``command`` on iteration 1.
+    race: list[list[str]] = field(default_factory=list)
+    hedge_after_seconds: float = 0  # start each extra racer only after this delay
+    attempts: int = 1  # independent loops run in parallel worktrees (best-of-N)
+    verify_command: str | None = None  # shell command that must pass before the promise counts
+    verify_on: VerifyOn = "promise"  # also verify after every iteration with "iteration"
+    verify_overlap: bool = False  # with verify_on=iteration, verify during the next turn
+    # Permission rules, "Tool" or "Tool(argument glob)"; see ralph.policy.
+    permission_allow: list[str] = field(default_factory=list)
+    permission_ask: list[str] = field(default_factory=list)
+    permission_deny: list[str] = field(default_factory=list)
+    permission_default: PermissionAction = "allow"
+    working_dir: str = "."
+    max_iterations: int = 10
+    timeout_seconds: int = 1800  # 30 minutes
+    iteration_timeout: float = 0  # seconds per turn attempt; 0 = off
+    idle_timeout: float = 0  # seconds without any agent event; 0 = off
+    turn_retries: int = 2  # retries of a timed-out turn before giving up
+    max_restarts: int = 3  # fresh agents started after the agent process dies
+    prompt_strategy: PromptStrategy = "full"
+    trace_file: str | None = None
+    record_file: str | None = None  # capture the agent session (gzip JSONL) for replay
+    replay_file: str | None = None  # drive the loop from a recording instead of an agent
+    replay_speed: float = 0.0  # 1.0 = recorded pace; 0 = as fast as possible
+    output: OutputMode = "plain"
+    stall_limit: int = 0  # stop after N iterations without file changes; 0 = off
+    resource_interval: float = 1.0  # seconds between agent /proc samples; 0 = off
+    max_rss_mb: float = 0  # stop once the agent's process tree uses more; 0 = off
+    max_cpu_seconds: float = 0  # CPU time the agent's tree may use in the run; 0 = off
+    token_budget: int = 0  # stop before an iteration would go over this many tokens; 0 = off
+    cost_budget: float = 0  # same, in USD; 0 = off
+    input_cost_per_mtok: float = 0  # USD per million input tokens, when the agent doesn't say
+    output_cost_per_mtok: float = 0  # USD per million output tokens
+    change_summary: bool = True  # tell the agent which files changed last iteration
+    history: bool = True  # record the run in .ralph/history.db for `ralph stats`
+    transcript: bool = True  # spool text and tool events to .ralph/transcripts for `ralph log`
+    checkpoint: bool = True
+    resume: bool = False
+    dry_run: bool = False
+
+
+@dataclass
+class TokenUsage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float | None = None  # reported by the agent, or priced by ralph.usage
+    estimated: bool = False  # counted from bytes, not reported by the agent
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+@dataclass
+class IterationResources:
+    """The agent process tree's usage during one iteration, as sampled."""
+
+    iteration: int
+    peak_rss_mb: float
+    cpu_seconds: float
+    processes: int  # most processes seen at once
+
+
+@dataclass
+class LoopResult:
+    state: LoopState
+    iterations: int
+    duration_seconds: float
+    error: str | None = None
+    prompt_bytes: list[int] = field(default_factory=list)
+    restarts: int = 0
+    resources: list[IterationResources] = field(default_factory=list)
+    usage: TokenUsage = field(default_factory=TokenUsage)  # whole run
+    iteration_usage: list[TokenUsage] = field(default_factory=list)  # one per turn attempt
+    transcript: str | None = None  # run id under .ralph/transcripts
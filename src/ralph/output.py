@@ -0,0 +1,324 @@
+"""Buffered, non-blocking output for the loop's console events."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ralph.batch import BatchResult
+    from ralph.events import Event
+
+
+class BufferedStream:
+    """Coalesces writes and flushes them from a background task.
+
+    ``write`` never blocks: text is appended to a pending buffer and a writer
+    task flushes it once *max_bytes* have accumulated or *interval* seconds
+    after the first pending write, doing the actual I/O in a thread. When the
+    consumer is slower than the producer, writes simply coalesce into bigger
+    flushes. Until ``start`` is called, writes are held until ``close``.
+
+    At most *max_pending* characters are held: past that, whole writes are
+    dropped (so JSONL lines stay intact) and counted in ``dropped``.
+    """
+
+    def __init__(
+        self,
+        stream: IO[str],
+        max_bytes: int = 8192,
+        interval: float = 0.05,
+        max_pending: int = 1 << 20,
+    ) -> None:
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.max_pending = max_pending
+        self.dropped = 0  # characters discarded at the high-water mark
+        self._chunks: list[str] = []
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task[None] | None = None
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        if self._size + len(text) > self.max_pending:
+            self.dropped += len(text)
+            return
+        self._chunks.append(text)
+        self._size += len(text)
+        self._ready.set()
+        if self._size >= self.max_bytes:
+            self._full.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        self._closing = True
+        self._ready.set()
+        self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        elif self._chunks:
+            self._emit(self._take())
+
+    def _take(self) -> str:
+        data = "".join(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        self._ready.clear()
+        self._full.clear()
+        return data
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            if self._chunks:
+                await asyncio.to_thread(self._emit, self._take())
+            if self._closing and not self._chunks:
+                return
+
+    def _emit(self, data: str) -> None:
+        self.stream.write(data)
+        self.stream.flush()
+
+
+class Output:
+    """Console sink for loop events; the base class prints nothing."""
+
+    def __init__(self, out: IO[str] | None = None, err: IO[str] | None = None) -> None:
+        self._out = BufferedStream(out or sys.stdout)
+        self._err = BufferedStream(err or sys.stderr)
+
+    def start(self) -> None:
+        self._out.start()
+        self._err.start()
+
+    async def close(self) -> None:
+        await self._out.close()
+        await self._err.close()
+
+    def handle(self, event: Event) -> None:
+        """Event bus subscriber: render *event* with the matching method."""
+        getattr(self, event.kind)(*event.values())
+
+    def text(self, chunk: str) -> None:
+        pass
+
+    def tool_start(self, tool_id: str, name: str) -> None:
+        pass
+
+    def tool_end(self, tool_id: str, status: str) -> None:
+        pass
+
+    def error(self, exception: BaseException) -> None:
+        self._err.write(f"\n⚠️  Error: {exception}\n")
+
+    def iteration_start(self, iteration: int, max_iterations: int) -> None:
+        pass
+
+    def iteration_end(self, iteration: int, prompt_bytes: int) -> None:
+        pass
+
+    def promise(self, phrase: str) -> None:
+        pass
+
+    def stalled(self, iterations: int) -> None:
+        pass
+
+    def resource_limit(self, reason: str) -> None:
+        # Shown even in quiet mode: it is why the run stopped.
+        self._err.write(f"\n⛔ {reason}, stopping\n")
+
+    def budget(self, reason: str) -> None:
+        self._err.write(f"\n💸 {reason}, stopping\n")
+
+    def turn_retry(self, iteration: int, reason: str, delay: float) -> None:
+        pass
+
+    def restart(self, iteration: int, error: BaseException) -> None:
+        pass
+
+    def race_winner(self, backend: str, entrants: int) -> None:
+        pass
+
+    def verify(self, iteration: int, ok: bool, seconds: float, cached: bool) -> None:
+        pass
+
+    def task_start(self, name: str) -> None:
+        pass
+
+    def task_end(
+        self, name: str, state: str, iterations: int, duration_seconds: float, error: str | None,
+    ) -> None:
+        pass
+
+    def pool_stats(self, hits: int, misses: int, spawned: int, recycled: int) -> None:
+        pass
+
+    def batch_results(self, results: list[BatchResult], exit_codes: list[int]) -> None:
+        """The end-of-batch summary; shown in quiet mode too, like a loop's result."""
+        lines = ["\n▶ Batch results:\n"]
+        for item, code in zip(results, exit_codes):
+            r = item.result
+            detail = f" — {r.error}" if r.error else ""
+            lines.append(
+                f"  {item.name}: {r.state} (exit {code}, {r.iterations} iterations, "
+                f"{r.duration_seconds:.1f}s){detail}\n"
+            )
+        self._out.write("".join(lines))
+
+
+class QuietOutput(Output):
+    """Errors only."""
+
+
+class PlainOutput(Output):
+    """Human-readable stream: agent text, tool markers and iteration banners."""
+
+    def text(self, chunk: str) -> None:
+        self._out.write(chunk)
+
+    def tool_start(self, tool_id: str, name: str) -> None:
+        self._out.write(f"\n🛠️  {name}\n")
+
+    def tool_end(self, tool_id: str, status: str) -> None:
+        icon = "✔️" if status == "completed" else "❌"
+        self._out.write(f" {icon} {status}\n")
+
+    def iteration_start(self, iteration: int, max_iterations: int) -> None:
+        self._out.write(f"\n━━━ Iteration {iteration}/{max_iterations} ━━━\n")
+
+    def iteration_end(self, iteration: int, prompt_bytes: int) -> None:
+        self._out.write(f"\n✓ Iteration {iteration} complete ({prompt_bytes} prompt bytes)\n")
+
+    def promise(self, phrase: str) -> None:
+        self._out.write(f"\n🎉 Promise detected: \"{phrase}\"\n")
+
+    def stalled(self, iterations: int) -> None:
+        self._out.write(f"\n⏸  No file changes in {iterations} iterations, stopping\n")
+
+    def turn_retry(self, iteration: int, reason: str, delay: float) -> None:
+        self._out.write(f"\n↻ Iteration {iteration}: {reason} timeout, retrying in {delay:g}s\n")
+
+    def restart(self, iteration: int, error: BaseException) -> None:
+        self._out.write(f"\n♻️  Iteration {iteration}: agent died ({error}), restarting\n")
+
+    def race_winner(self, backend: str, entrants: int) -> None:
+        self._out.write(f"\n🏁 {backend} won the race ({entrants} backends started)\n")
+
+    def verify(self, iteration: int, ok: bool, seconds: float, cached: bool) -> None:
+        verdict = "passed" if ok else "failed"
+        timing = "cached" if cached else f"{seconds:.1f}s"
+        self._out.write(f"\n🧪 Verify {verdict} after iteration {iteration} ({timing})\n")
+
+    def task_start(self, name: str) -> None:
+        self._out.write(f"\n▶ [{name}] started\n")
+
+    def task_end(
+        self, name: str, state: str, iterations: int, duration_seconds: float, error: str | None,
+    ) -> None:
+        self._out.write(f"\n▶ [{name}] {state}\n")
+
+    def pool_stats(self, hits: int, misses: int, spawned: int, recycled: int) -> None:
+        self._out.write(
+            f"\n▶ Agent pool: {hits} hits, {misses} misses, "
+            f"{spawned} spawned, {recycled} recycled\n"
+        )
+
+
+class JsonlOutput(Output):
+    """One JSON object per event on stdout, for machine consumers."""
+
+    def _event(self, event: str, **fields: Any) -> None:
+        self._out.write(json.dumps({"event": event, **fields}, ensure_ascii=False) + "\n")
+
+    def text(self, chunk: str) -> None:
+        self._event("text", text=chunk)
+
+    def tool_start(self, tool_id: str, name: str) -> None:
+        self._event("tool_start", id=tool_id, name=name)
+
+    def tool_end(self, tool_id: str, status: str) -> None:
+        self._event("tool_end", id=tool_id, status=status)
+
+    def error(self, exception: BaseException) -> None:
+        self._event("error", message=str(exception))
+
+    def iteration_start(self, iteration: int, max_iterations: int) -> None:
+        self._event("iteration_start", iteration=iteration, max_iterations=max_iterations)
+
+    def iteration_end(self, iteration: int, prompt_bytes: int) -> None:
+        self._event("iteration_end", iteration=iteration, prompt_bytes=prompt_bytes)
+
+    def promise(self, phrase: str) -> None:
+        self._event("promise", phrase=phrase)
+
+    def stalled(self, iterations: int) -> None:
+        self._event("stalled", iterations=iterations)
+
+    def resource_limit(self, reason: str) -> None:
+        self._event("resource_limit", reason=reason)
+
+    def budget(self, reason: str) -> None:
+        self._event("budget", reason=reason)
+
+    def turn_retry(self, iteration: int, reason: str, delay: float) -> None:
+        self._event("retry", iteration=iteration, reason=reason, delay=delay)
+
+    def restart(self, iteration: int, error: BaseException) -> None:
+        self._event("restart", iteration=iteration, error=str(error))
+
+    def race_winner(self, backend: str, entrants: int) -> None:
+        self._event("race_winner", backend=backend, entrants=entrants)
+
+    def verify(self, iteration: int, ok: bool, seconds: float, cached: bool) -> None:
+        self._event("verify", iteration=iteration, ok=ok, seconds=round(seconds, 3), cached=cached)
+
+    def task_start(self, name: str) -> None:
+        self._event("task_start", name=name)
+
+    def task_end(
+        self, name: str, state: str, iterations: int, duration_seconds: float, error: str | None,
+    ) -> None:
+        self._event(
+            "task_end", name=name, state=state, iterations=iterations,
+            duration_seconds=round(duration_seconds, 3), error=error,
+        )
+
+    def pool_stats(self, hits: int, misses: int, spawned: int, recycled: int) -> None:
+        self._event("pool", hits=hits, misses=misses, spawned=spawned, recycled=recycled)
+
+    def batch_results(self, results: list[BatchResult], exit_codes: list[int]) -> None:
+        for item, code in zip(results, exit_codes):
+            r = item.result
+            self._event(
+                "result", name=item.name, state=r.state, exit_code=code,
+                iterations=r.iterations, duration_seconds=round(r.duration_seconds, 3),
+                error=r.error,
+            )
+
+
+_OUTPUTS: dict[str, type[Output]] = {
+    "plain": PlainOutput,
+    "quiet": QuietOutput,
+    "jsonl": JsonlOutput,
+}
+
+
+def make_output(mode: str) -> Output:
+    return _OUTPUTS[mode]()
@@ -0,0 +1,207 @@
+"""Permission policy: allow / ask / deny rules for the agent's tool calls.
+
+A rule is a tool-name glob with an optional argument glob in parentheses,
+``Bash(git *)``, matched against the tool's name and its main argument
+(``command``, ``file_path``, ``path``, ``url`` or ``pattern`` in its input).
+Agents only send a human-readable title (``Run: git status``, ``Read
+/src/app.py``), so ``tool_name`` maps it back to the tool's name first.
+Rules are compiled to regexes once; decisions are memoized per tool and
+argument. ``deny`` beats ``ask`` beats ``allow``; anything unmatched gets
+the default action.
+
+The action picks one of the options the agent offers:
+
+- ``allow`` prefers ``allow_always`` so the agent stops asking for that tool,
+  unless an ``ask`` or ``deny`` rule covers other calls of the same tool
+- ``ask`` allows this one call only; the agent asks again next time
+- ``deny`` rejects the call; if the agent offers no reject option there is
+  no id to answer with, and ``choose`` returns None
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from ralph.models import PERMISSION_ACTIONS, PermissionAction
+
+# Input keys holding the argument a rule's parentheses match, by preference.
+ARGUMENT_KEYS = ("command", "file_path", "path", "url", "pattern")
+
+# Option ids agents use, most preferred first (Claude Code and Gemini CLI).
+_OPTION_IDS: dict[str, tuple[str, ...]] = {
+    "allow": ("allow_always", "proceed_always", "allow", "allow_once", "proceed_once"),
+    "ask": ("allow", "allow_once", "proceed_once"),
+    "deny": ("reject", "reject_once", "deny", "cancel", "reject_always"),
+}
+
+# Title prefixes claude-code-acp gives its built-in tools.
+_TITLE_PREFIXES = (
+    ("Run: ", "Bash"),
+    ("Read ", "Read"),
+    ("Write ", "Write"),
+    ("Edit ", "Edit"),
+    ("Find files: ", "Glob"),
+    ("Search: ", "Grep"),
+)
+
+# Option ids and names that reject, for agents whose ids we don't know.
+_REJECT_WORDS = ("reject", "deny", "cancel")
+
+# Memoized decisions kept before the cache starts over.
+MAX_MEMO = 4096
+
+_RULE = re.compile(r"^\s*([^()]+?)\s*(?:\((.*)\))?\s*$")
+_BARE_NAME = re.compile(r"^[\w.:-]+$")
+
+
+@dataclass(frozen=True)
+class Rule:
+    text: str
+    tool: re.Pattern[str]
+    argument: re.Pattern[str] | None = None
+
+    def matches(self, name: str, argument: str) -> bool:
+        if not self.tool.match(name):
+            return False
+        return self.argument is None or bool(self.argument.match(argument))
+
+
+def compile_rule(text: str) -> Rule:
+    """Compile ``Tool`` or ``Tool(argument glob)`` into a ``Rule``."""
+    match = _RULE.match(text)
+    if match is None:
+        raise ValueError(f"bad permission rule {text!r}")
+    tool, argument = match.groups()
+    return Rule(
+        text=text.strip(),
+        tool=re.compile(fnmatch.translate(tool)),
+        argument=re.compile(fnmatch.translate(argument), re.DOTALL) if argument is not None else None,
+    )
+
+
+def tool_argument(input: dict[str, Any]) -> str:
+    for key in ARGUMENT_KEYS:
+        value = input.get(key)
+        if isinstance(value, str):
+            return value
+    return ""
+
+
+def tool_name(title: str, input: dict[str, Any]) -> str:
+    """The tool name behind a permission request's *title*.
+
+    Known title prefixes map to their tool; a title that is a single word is
+    the tool's name already. Anything else (agents that describe the call
+    in prose) is told apart by the shape of its input.
+    """
+    for prefix, name in _TITLE_PREFIXES:
+        if title.startswith(prefix):
+            return name
+    if _BARE_NAME.match(title):
+        return title
+    if "command" in input:
+        return "Bash"
+    if "file_path" in input or "path" in input:
+        if "old_string" in input or "edits" in input:
+            return "Edit"
+        if "content" in input:
+            return "Write"
+        if "pattern" not in input:
+            return "Read"
+    if "url" in input:
+        return "WebFetch"
+    if "query" in input:
+        return "WebSearch"
+    return title
+
+
+def _option_id(option: Any) -> str:
+    return option if isinstance(option, str) else option.get("id", "")
+
+
+def _rejects(option: Any) -> bool:
+    if isinstance(option, dict) and option.get("kind"):
+        return str(option["kind"]).startswith("reject")
+    words = _option_id(option).lower()
+    if isinstance(option, dict):
+        words += " " + str(option.get("name", "")).lower()
+    return any(word in words for word in _REJECT_WORDS)
+
+
+class PermissionPolicy:
+    """Decides and answers the agent's permission requests."""
+
+    def __init__(
+        self,
+        allow: list[str] | None = None,
+        ask: list[str] | None = None,
+        deny: list[str] | None = None,
+        default: PermissionAction = "allow",
+    ) -> None:
+        if default not in PERMISSION_ACTIONS:
+            raise ValueError(f"permission default must be one of {', '.join(PERMISSION_ACTIONS)}")
+        self.default = default
+        # Most restrictive first: the first matching action wins.
+        self._rules: list[tuple[PermissionAction, list[Rule]]] = [
+            ("deny", [compile_rule(r) for r in deny or ()]),
+            ("ask", [compile_rule(r) for r in ask or ()]),
+            ("allow", [compile_rule(r) for r in allow or ()]),
+        ]
+        self._decisions: dict[tuple[str, str], PermissionAction] = {}
+        self._choices: dict[tuple[str, tuple[str, ...]], str | None] = {}
+
+    def decide(self, title: str, input: dict[str, Any]) -> PermissionAction:
+        """The action for a call titled *title* (or named; see ``tool_name``) with *input*."""
+        name = tool_name(title, input)
+        key = (name, tool_argument(input))
+        action = self._decisions.get(key)
+        if action is None:
+            action = self.default
+            for candidate, rules in self._rules:
+                if any(rule.matches(*key) for rule in rules):
+                    action = candidate
+                    break
+            if action == "allow" and self._restricted(name):
+                # allow_always would also let through calls a rule stops.
+                action = "ask"
+            if len(self._decisions) >= MAX_MEMO:
+                self._decisions.clear()
+            self._decisions[key] = action
+        return action
+
+    def _restricted(self, name: str) -> bool:
+        return any(
+            rule.tool.match(name)
+            for action, rules in self._rules
+            if action != "allow"
+            for rule in rules
+        )
+
+    def choose(self, action: PermissionAction, options: list) -> str | None:
+        """The id of the offered option that carries out *action*.
+
+        None when denying and the agent offered nothing that rejects.
+        """
+        ids = tuple(_option_id(opt) for opt in options)
+        key = (action, ids)
+        if key in self._choices:
+            return self._choices[key]
+        offered = set(ids)
+        choice = next((i for i in _OPTION_IDS[action] if i in offered), None)
+        if choice is None:
+            # Ids we don't know: the first offer that rejects when denying,
+            # otherwise the agent's first offer.
+            if action == "deny":
+                choice = next((_option_id(opt) for opt in options if _rejects(opt)), None)
+            else:
+                choice = ids[0] if ids else "allow"
+        if len(self._choices) >= MAX_MEMO:
+            self._choices.clear()
+        self._choices[key] = choice
+        return choice
+
+    def answer(self, title: str, input: dict[str, Any], options: list) -> str | None:
+        return self.choose(self.decide(title, input), options)
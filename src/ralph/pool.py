@@ -0,0 +1,178 @@
+"""Warm pool of pre-spawned ACP agent processes."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from claude_code_acp import AcpClient
+from claude_code_acp.acp_client import AcpClientEvents
+
+PoolKey = tuple[str, tuple[str, ...], str]
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    spawned: int = 0
+    recycled: int = 0
+    unhealthy: int = 0
+
+
+@dataclass
+class _Entry:
+    client: AcpClient
+    uses: int = 0
+    idle_since: float = 0.0
+
+
+def pool_key(command: str, command_args: list[str], cwd: str) -> PoolKey:
+    return (command, tuple(command_args), cwd)
+
+
+def _healthy(client: AcpClient) -> bool:
+    """True if the agent subprocess is still running and connected."""
+    proc = getattr(client, "_process", None)
+    return (
+        proc is not None
+        and proc.returncode is None
+        and getattr(client, "_connection", None) is not None
+    )
+
+
+class AgentPool:
+    """Hands out connected ``AcpClient``s keyed by ``(command, args, cwd)``.
+
+    A client is recycled (its process stopped) after *max_uses* hand-outs, after
+    sitting idle for *idle_seconds*, or as soon as it fails a health check.
+    At most *max_idle* clients are kept warm per key. Idle clients are checked
+    on every ``acquire`` and, once ``start`` is called, every *reap_interval*
+    seconds, so a long-lived pool lets them go even when nothing is acquired.
+    """
+
+    def __init__(
+        self,
+        max_uses: int = 20,
+        idle_seconds: float = 300.0,
+        max_idle: int = 4,
+        reap_interval: float = 30.0,
+    ) -> None:
+        self.max_uses = max_uses
+        self.idle_seconds = idle_seconds
+        self.max_idle = max_idle
+        self.reap_interval = reap_interval
+        self._reaper: asyncio.Task[None] | None = None
+        self.stats = PoolStats()
+        self._idle: dict[PoolKey, list[_Entry]] = defaultdict(list)
+        self._leased: dict[int, tuple[PoolKey, _Entry]] = {}
+
+    async def _spawn(self, key: PoolKey) -> _Entry:
+        command, args, cwd = key
+        client = AcpClient(command=command, args=list(args) or None, cwd=cwd)
+        await client.connect()
+        self.stats.spawned += 1
+        return _Entry(client=client)
+
+    async def _recycle(self, entry: _Entry) -> None:
+        self.stats.recycled += 1
+        try:
+            await entry.client.disconnect()
+        except Exception:
+            pass
+
+    async def _evict_stale(self) -> None:
+        now = time.monotonic()
+        stale: list[_Entry] = []
+        # Take them all out first: acquire and the reaper may both be here.
+        for entries in self._idle.values():
+            stale.extend(e for e in entries if now - e.idle_since >= self.idle_seconds)
+            entries[:] = [e for e in entries if now - e.idle_since < self.idle_seconds]
+        for entry in stale:
+            await self._recycle(entry)
+
+    def start(self) -> None:
+        """Start recycling stale idle clients in the background."""
+        if self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._reap())
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            await self._evict_stale()
+
+    async def prewarm(self, key: PoolKey, count: int) -> None:
+        """Spawn agents for *key* until *count* are idle (capped at max_idle)."""
+        missing = min(count, self.max_idle) - len(self._idle[key])
+        if missing <= 0:
+            return
+        entries = await asyncio.gather(*(self._spawn(key) for _ in range(missing)))
+        now = time.monotonic()
+        for entry in entries:
+            entry.idle_since = now
+            self._idle[key].append(entry)
+
+    async def acquire(self, key: PoolKey) -> AcpClient:
+        """Return a connected client with a fresh session for *key*."""
+        await self._evict_stale()
+        idle = self._idle[key]
+        while idle:
+            entry = idle.pop()
+            if not _healthy(entry.client):
+                self.stats.unhealthy += 1
+                await self._recycle(entry)
+                continue
+            try:
+                await entry.client.new_session()
+            except Exception:
+                self.stats.unhealthy += 1
+                await self._recycle(entry)
+                continue
+            self.stats.hits += 1
+            break
+        else:
+            self.stats.misses += 1
+            entry = await self._spawn(key)
+
+        entry.uses += 1
+        self._leased[id(entry.client)] = (key, entry)
+        return entry.client
+
+    async def release(self, client: AcpClient, reusable: bool = True) -> None:
+        """Return *client* to the pool, or stop it if it can't be reused.
+
+        A client the pool didn't lease (released twice, say, after a failed
+        restart left the engine holding the dead one) is just stopped.
+        """
+        leased = self._leased.pop(id(client), None)
+        client.events = AcpClientEvents()
+        if leased is None:
+            self.stats.recycled += 1
+            with contextlib.suppress(Exception):
+                await client.disconnect()
+            return
+        key, entry = leased
+        if (
+            not reusable
+            or entry.uses >= self.max_uses
+            or len(self._idle[key]) >= self.max_idle
+            or not _healthy(client)
+        ):
+            await self._recycle(entry)
+            return
+        entry.idle_since = time.monotonic()
+        self._idle[key].append(entry)
+
+    async def close(self) -> None:
+        """Stop the reaper and every idle agent. Leased clients are stopped on release."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        for entries in self._idle.values():
+            while entries:
+                await self._recycle(entries.pop())
+        self.max_idle = 0
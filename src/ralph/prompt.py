@@ -1,5 +1,22 @@
 """System prompt template for the Ralph Wiggum Loop."""
 
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    from ralph.verify import VerifyResult
+    from ralph.workspace import WorkspaceChanges
+
+PromptStrategy = Literal["full", "once", "digest"]
+PROMPT_STRATEGIES: tuple[str, ...] = ("full", "once", "digest")
+
+# Upper bound on the changed-files summary added to an iteration prompt.
+CHANGES_MAX_CHARS = 1500
+# Upper bound on the failing verify output fed back to the agent.
+VERIFY_MAX_CHARS = 2000
+
 _TEMPLATE = """\
 # Ralph Loop System Instructions
 
@@ -44,3 +61,110 @@ or waiting on the user, explain the blocker and keep the loop going.\
 def build_system_prompt(promise_phrase: str, template: str | None = None) -> str:
     source = template if template is not None else _TEMPLATE
     return source.replace("{{PROMISE}}", promise_phrase)
+
+
+_CONTINUE = """\
+Continue the same task under the same Ralph Loop rules from the current repo \
+state. When it is fully done, end with "<promise>{promise}</promise>"."""
+
+_DIGEST = """\
+Reminder: the task is unchanged (sha256:{digest}) and the Ralph Loop rules \
+still apply. Continue from the current repo state. When it is fully done, end \
+with "<promise>{promise}</promise>"."""
+
+
+def task_digest(task: str) -> str:
+    """Short content hash identifying the task text."""
+    return hashlib.sha256(task.encode("utf-8")).hexdigest()[:16]
+
+
+def build_resume_note(iteration: int, tail: str) -> str:
+    """Context for the first iteration after resuming an interrupted run."""
+    note = (
+        f"[Resumed] The previous Ralph process stopped after iteration {iteration}. "
+        "Check the repo state before continuing."
+    )
+    if tail:
+        note += f"\nEnd of your last response:\n\n```\n{tail}\n```"
+    return note
+
+
+def build_restart_note(iteration: int, tail: str, reloaded: bool) -> str:
+    """Context for retrying an iteration after the agent process died."""
+    if reloaded:
+        return (
+            f"[Restarted] The agent process exited during iteration {iteration}; "
+            "your session was restored. Check the repo state before continuing."
+        )
+    note = (
+        f"[Restarted] The agent process exited during iteration {iteration} and "
+        "its session could not be restored. Check the repo state before continuing."
+    )
+    if tail:
+        note += f"\nEnd of your interrupted response:\n\n```\n{tail}\n```"
+    return note
+
+
+def build_changes_note(changes: WorkspaceChanges, max_chars: int = CHANGES_MAX_CHARS) -> str:
+    """Summarize files changed since the last iteration, capped at *max_chars*."""
+    head = "Files changed since the last iteration (A added, M modified, D deleted; line delta):"
+    rows = [
+        (kind, path)
+        for kind, paths in (("A", changes.added), ("M", changes.modified), ("D", changes.deleted))
+        for path in paths
+    ]
+    lines = [head]
+    size = len(head)
+    for n, (kind, path) in enumerate(rows):
+        delta = changes.line_deltas.get(path)
+        line = f"  {kind} {path}" + ("" if delta is None else f" ({delta:+d})")
+        if size + len(line) + 1 > max_chars:
+            lines.append(f"  ... and {len(rows) - n} more")
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def build_verify_note(
+    command: str, result: VerifyResult, iteration: int, max_chars: int = VERIFY_MAX_CHARS,
+) -> str:
+    """Tell the agent the verify command failed on its work from *iteration*."""
+    status = "timed out" if result.returncode is None else f"exited with code {result.returncode}"
+    note = (
+        f"[Verify] `{command}` {status} on the working tree after iteration {iteration}. "
+        "Fix the failures before claiming the task is done."
+    )
+    tail = result.output.strip()[-max_chars:]
+    if tail:
+        note += f"\nEnd of its output:\n\n```\n{tail}\n```"
+    return note
+
+
+def build_iteration_prompt(
+    system_prompt: str,
+    task: str,
+    promise_phrase: str,
+    iteration: int,
+    max_iterations: int,
+    strategy: PromptStrategy = "full",
+    primed: bool = False,
+    note: str | None = None,
+) -> str:
+    """Build the message sent for one iteration.
+
+    ``full`` always sends the system prompt and task. ``once`` and ``digest``
+    send them only while the session is not yet *primed*, then a short
+    continuation (``digest`` also carries a hash of the task). An optional
+    *note* is placed right after the iteration header.
+    """
+    header = f"[Iteration {iteration}/{max_iterations}]"
+    if note:
+        header = f"{header}\n\n{note}"
+    if strategy == "full" or not primed:
+        return f"{system_prompt}\n\n---\n\n{header}\n\n{task}"
+    if strategy == "digest":
+        body = _DIGEST.format(digest=task_digest(task), promise=promise_phrase)
+    else:
+        body = _CONTINUE.format(promise=promise_phrase)
+    return f"{header}\n\n{body}"
@@ -0,0 +1,140 @@
+"""Race mode: run the first iteration on several agent backends at once.
+
+Each backend works in its own git worktree copy of ``working_dir``. The first
+one to make progress (reach the promise or change files) wins; the others are
+cancelled. With a hedge delay, extra backends are only started while the
+earlier ones are still running after that many seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from ralph.trace import IterationSpan
+from ralph.worktree import Worktree, create_worktree, remove_worktree, run_prefix, worktree_diff
+
+if TYPE_CHECKING:
+    from ralph.models import LoopConfig
+
+
+@dataclass
+class Entrant:
+    backend: list[str]  # [command, *args]
+    worktree: Worktree | None = None
+    promised: bool | None = None  # None: timed out, failed or cancelled
+    patch: bytes = b""
+    tail: str = ""
+    spans: list[IterationSpan] = field(default_factory=list)
+    error: BaseException | None = None
+
+    @property
+    def progressed(self) -> bool:
+        return bool(self.promised) or bool(self.patch)
+
+
+@dataclass
+class RaceResult:
+    winner: Entrant
+    entrants: list[Entrant]  # every backend that was started
+
+
+def _entrant_config(config: LoopConfig, backend: list[str], working_dir: str, budget: float) -> LoopConfig:
+    command, *args = backend
+    return dataclasses.replace(
+        config,
+        command=command,
+        command_args=args,
+        race=[],
+        working_dir=working_dir,
+        timeout_seconds=max(1, int(budget)),
+        output="quiet",
+        trace_file=None,
+        record_file=None,
+        stall_limit=0,
+        change_summary=False,
+        checkpoint=False,
+        history=False,
+        transcript=False,
+        resume=False,
+    )
+
+
+async def _run_entrant(config: LoopConfig, entrant: Entrant, name: str, budget: float) -> None:
+    from ralph.engine import RalphEngine
+
+    entrant.worktree = await asyncio.to_thread(create_worktree, config.working_dir, name)
+    engine = RalphEngine(_entrant_config(config, entrant.backend, entrant.worktree.working_dir, budget))
+    try:
+        entrant.promised = await engine.run_turn(1)
+    finally:
+        entrant.spans = engine.spans
+        entrant.tail = engine.tail
+    entrant.patch = await asyncio.to_thread(worktree_diff, entrant.worktree)
+
+
+async def run_race(
+    config: LoopConfig, backends: list[list[str]], hedge_after: float, budget: float,
+) -> RaceResult:
+    """Race iteration 1 across *backends* within *budget* seconds.
+
+    If nobody makes progress, the first backend to finish its turn wins.
+    Raises the first error if every backend failed. Worktrees are always
+    removed; the winner's changes are returned as ``winner.patch``.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    waiting = [Entrant(list(b)) for b in backends]
+    started: list[Entrant] = []
+    tasks: dict[asyncio.Task[None], Entrant] = {}
+    finished: list[Entrant] = []
+    winner: Entrant | None = None
+    prefix = run_prefix()
+
+    def launch() -> None:
+        entrant = waiting.pop(0)
+        name = f"{prefix}-race-{len(started)}"
+        started.append(entrant)
+        task = asyncio.ensure_future(_run_entrant(config, entrant, name, deadline - loop.time()))
+        tasks[task] = entrant
+
+    launch()
+    while waiting and hedge_after <= 0:
+        launch()
+
+    try:
+        while winner is None:
+            pending = {t for t in tasks if not t.done()}
+            if not pending:
+                break
+            hedge = hedge_after if waiting else None
+            done, _ = await asyncio.wait(
+                pending, timeout=hedge, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                launch()
+                continue
+            for task in done:
+                entrant = tasks[task]
+                if not task.cancelled() and task.exception() is not None:
+                    entrant.error = task.exception()
+                finished.append(entrant)
+                if winner is None and entrant.error is None and entrant.progressed:
+                    winner = entrant
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for entrant in started:
+            if entrant.worktree is not None:
+                await asyncio.to_thread(remove_worktree, entrant.worktree)
+
+    if winner is None:
+        ok = [e for e in finished if e.error is None and e.spans]
+        if not ok:
+            error = next((e.error for e in finished if e.error is not None), None)
+            raise error or RuntimeError("no race backend finished")
+        winner = ok[0]
+    return RaceResult(winner, started)
@@ -0,0 +1,213 @@
+"""Record an agent session to disk and replay it without a live agent.
+
+A recording is gzip-compressed JSON lines, streamed out as the run goes so
+long sessions never pile up in memory. The first line is a header; every
+other line is one entry with ``t`` (seconds since recording started) and
+``type``:
+
+- ``prompt`` {text} — a turn starts
+- ``text`` {text}, ``tool_start`` {id, name, input}, ``tool_end`` {id, status, output}
+- ``permission`` {name, input, options, choice}
+- a turn's end: ``response`` {text}, ``error`` {message, dead} or
+  ``cancel`` {reason, message?}, where *reason* is why the engine cut the
+  turn short: ``promise``, ``inactivity``, ``iteration``, ``timeout`` or
+  ``resource_limit``
+
+``ReplayClient`` stands in for ``AcpClient``: each ``prompt()`` feeds the
+next recorded turn's events to the engine's handlers, paced by the recorded
+timestamps (``speed`` 1.0) or as fast as possible (``speed`` 0). A cancelled
+turn raises ``ReplayCancelled`` when its ``cancel`` entry is reached, so the
+engine ends it the same way whatever its own timeouts are set to.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import gzip
+import json
+import time
+from typing import IO, Any, Iterator
+
+from claude_code_acp import AcpClient
+
+RECORDING_VERSION = 1
+
+
+class ReplayError(RuntimeError):
+    """The recording is unreadable or ran out before the replayed run did."""
+
+
+class ReplayCancelled(Exception):
+    """A replayed turn reached the ``cancel`` entry the engine recorded."""
+
+    def __init__(self, reason: str, message: str | None = None) -> None:
+        super().__init__(message or f"turn cancelled ({reason})")
+        self.reason = reason
+
+
+class Recorder:
+    """Streams session entries to a gzip-compressed JSONL file.
+
+    ``write`` only queues the entry; a background task compresses and writes
+    batches of them from a thread, so the ACP callbacks never wait on disk.
+    """
+
+    def __init__(self, path: str, command: list[str], cwd: str) -> None:
+        self.path = path
+        self._t0 = time.monotonic()
+        self._queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+        self._queue.put_nowait({
+            "ralph_recording": RECORDING_VERSION,
+            "command": command,
+            "cwd": cwd,
+            "created": time.time(),
+        })
+        self._file: IO[str] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        self._file = await asyncio.to_thread(
+            gzip.open, self.path, "wt", encoding="utf-8", compresslevel=6,
+        )
+        self._task = asyncio.ensure_future(self._writer())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+    def write(self, type: str, **fields: Any) -> None:
+        self._queue.put_nowait({"t": round(time.monotonic() - self._t0, 6), "type": type, **fields})
+
+    async def _writer(self) -> None:
+        done = False
+        while not done:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if None in batch:
+                done = True
+            # Tool inputs and outputs are whatever the agent sent; keep the rest.
+            lines = "".join(
+                json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in batch if e is not None
+            )
+            if lines:
+                await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: str) -> None:
+        assert self._file is not None
+        self._file.write(lines)
+
+
+class RecordingReader:
+    """Reads a recording's entries lazily, one line at a time."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.header: dict[str, Any] = {}
+        self._file: Any = None
+        self._entries: Iterator[str] | None = None
+
+    def _open(self) -> Iterator[str]:
+        try:
+            self._file = gzip.open(self.path, "rt", encoding="utf-8")
+            header = json.loads(next(self._file, "null"))
+        except (OSError, ValueError) as e:
+            raise ReplayError(f"{self.path}: not a ralph recording ({e})") from e
+        if not isinstance(header, dict) or header.get("ralph_recording") != RECORDING_VERSION:
+            raise ReplayError(f"{self.path}: not a ralph recording")
+        self.header = header
+        return self._file
+
+    def next(self) -> dict[str, Any] | None:
+        """The next entry, or None at the end of the recording."""
+        if self._entries is None:
+            self._entries = self._open()
+        line = next(self._entries, None)
+        return json.loads(line) if line else None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = self._entries = None
+
+
+class ReplayClient(AcpClient):
+    """An ``AcpClient`` that plays recorded turns back instead of running an agent.
+
+    Clients made for a restarted agent share the reader, so the recording
+    carries on where the dead agent's turns stopped.
+    """
+
+    def __init__(self, reader: RecordingReader, cwd: str = ".", speed: float = 0.0) -> None:
+        super().__init__(command="replay", cwd=cwd)
+        self.reader = reader
+        self.speed = speed
+
+    async def connect(self) -> None:
+        self._session_id = "replay"
+
+    async def disconnect(self) -> None:
+        self._session_id = None
+
+    async def new_session(self) -> str:
+        self._session_id = "replay"
+        return self._session_id
+
+    async def cancel(self) -> None:
+        pass
+
+    async def _pace(self, origin: float, start: float, entry: dict[str, Any]) -> None:
+        if self.speed > 0:
+            delay = start + (entry["t"] - origin) / self.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def prompt(self, text: str) -> str:
+        reader = self.reader
+        # Skip stragglers the agent sent after a turn was cut short.
+        entry = reader.next()
+        while entry is not None and entry["type"] != "prompt":
+            entry = reader.next()
+        if entry is None:
+            raise ReplayError(f"{reader.path}: recording has no more turns")
+        origin, start = entry["t"], time.monotonic()
+        events = self.events
+        while True:
+            entry = reader.next()
+            if entry is None or entry["type"] == "prompt":
+                raise ReplayError(f"{reader.path}: recording ends mid-turn")
+            await self._pace(origin, start, entry)
+            kind = entry["type"]
+            if kind == "text":
+                if events.on_text:
+                    await events.on_text(entry["text"])
+            elif kind == "tool_start":
+                if events.on_tool_start:
+                    await events.on_tool_start(entry["id"], entry["name"], entry["input"])
+            elif kind == "tool_end":
+                if events.on_tool_end:
+                    await events.on_tool_end(entry["id"], entry["status"], entry["output"])
+            elif kind == "permission":
+                if events.on_permission:
+                    # A refusal without a reject option fails the request, as it did live.
+                    with contextlib.suppress(PermissionError):
+                        await events.on_permission(entry["name"], entry["input"], entry["options"])
+            elif kind == "response":
+                return entry["text"]
+            elif kind == "error":
+                error: Exception = (
+                    ConnectionError(entry["message"]) if entry["dead"] else RuntimeError(entry["message"])
+                )
+                if events.on_error:
+                    await events.on_error(error)
+                raise error
+            elif kind == "cancel":
+                # End the turn the way the engine did, not whenever its timeouts fire.
+                raise ReplayCancelled(entry["reason"], entry.get("message"))
@@ -0,0 +1,187 @@
+"""Resource sampling for the agent's process tree, read from ``/proc``.
+
+A background task samples the agent and all its descendants every
+``interval`` seconds. It tracks per-iteration peak RSS, CPU time and
+process count, and trips ``exceeded`` once ``max_rss_mb`` or
+``max_cpu_seconds`` is crossed. CPU time counts what the tree used while
+being watched, including children that have already exited and been
+reaped. On systems without ``/proc`` the monitor does nothing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+PROC = "/proc"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+@dataclass
+class ResourceSample:
+    rss_bytes: int
+    cpu_seconds: float
+    processes: int
+
+
+def _stat(pid: int) -> list[str] | None:
+    """Fields of /proc/<pid>/stat after the command name (state is [0])."""
+    try:
+        with open(f"{PROC}/{pid}/stat", "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    # The command name is in parentheses and may itself contain ") ".
+    return raw[raw.rindex(b")") + 2:].decode("ascii", "replace").split()
+
+
+def _children(pid: int) -> list[int] | None:
+    """Direct children via /proc/<pid>/task/*/children; None if unsupported."""
+    try:
+        tasks = os.listdir(f"{PROC}/{pid}/task")
+    except OSError:
+        return []
+    found: list[int] = []
+    for tid in tasks:
+        try:
+            with open(f"{PROC}/{pid}/task/{tid}/children", "rb") as f:
+                found.extend(int(c) for c in f.read().split())
+        except FileNotFoundError:
+            return None
+        except OSError:
+            continue
+    return found
+
+
+def _scan_parents() -> dict[int, list[int]]:
+    tree: dict[int, list[int]] = {}
+    for entry in os.scandir(PROC):
+        if entry.name.isdigit():
+            fields = _stat(int(entry.name))
+            if fields is not None:
+                tree.setdefault(int(fields[1]), []).append(int(entry.name))
+    return tree
+
+
+def process_tree(pid: int) -> list[int]:
+    """*pid* and all its descendants."""
+    tree: dict[int, list[int]] | None = None
+    pids, todo = [pid], [pid]
+    while todo:
+        current = todo.pop()
+        children = _children(current) if tree is None else tree.get(current, [])
+        if children is None:
+            # No children files (older kernels): one scan of every process.
+            tree = _scan_parents()
+            children = tree.get(current, [])
+        pids.extend(children)
+        todo.extend(children)
+    return pids
+
+
+def sample_tree(pid: int) -> ResourceSample | None:
+    """Total RSS, CPU time and process count of *pid*'s tree (None if gone)."""
+    rss = ticks = processes = 0
+    for member in process_tree(pid):
+        fields = _stat(member)
+        if fields is None:
+            continue  # exited since the tree was read
+        # utime, stime, cutime, cstime: fields 14-17 of stat; rss: field 24.
+        ticks += sum(int(v) for v in fields[11:15])
+        rss += int(fields[21]) * _PAGE_SIZE
+        processes += 1
+    if not processes:
+        return None
+    return ResourceSample(rss, ticks / _CLOCK_TICKS, processes)
+
+
+class ResourceMonitor:
+    """Samples the agent's process tree in the background and enforces limits.
+
+    *pid* returns the agent's current pid (it changes when the agent is
+    restarted), or None while there is no agent process.
+    """
+
+    def __init__(
+        self,
+        pid: Callable[[], int | None],
+        interval: float = 1.0,
+        max_rss_mb: float = 0,
+        max_cpu_seconds: float = 0,
+    ) -> None:
+        self._pid = pid
+        self.interval = interval
+        self.max_rss_mb = max_rss_mb
+        self.max_cpu_seconds = max_cpu_seconds
+        self.exceeded = asyncio.Event()
+        self.reason: str | None = None
+        self.cpu_seconds = 0.0  # used by the agent's trees over the whole run
+        self.peak_rss_mb = 0.0  # in the current iteration
+        self.iteration_cpu_seconds = 0.0
+        self.max_processes = 0
+        self._watched: int | None = None
+        self._last_cpu = 0.0
+        self._last: ResourceSample | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def begin_iteration(self) -> None:
+        # The tree as last seen is where the new iteration starts from.
+        last = self._last
+        self.peak_rss_mb = last.rss_bytes / (1024 * 1024) if last else 0.0
+        self.max_processes = last.processes if last else 0
+        self.iteration_cpu_seconds = 0.0
+
+    def observe(self, pid: int, sample: ResourceSample) -> None:
+        if pid != self._watched:
+            # A new agent (start or restart): count CPU from here on.
+            self._watched = pid
+        else:
+            # Reaped children move into cutime, so the total never goes down
+            # by much; a child exiting unreaped can make it dip a little.
+            used = max(0.0, sample.cpu_seconds - self._last_cpu)
+            self.cpu_seconds += used
+            self.iteration_cpu_seconds += used
+        self._last_cpu = sample.cpu_seconds
+        self._last = sample
+        rss_mb = sample.rss_bytes / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        self.max_processes = max(self.max_processes, sample.processes)
+
+        if self.reason is not None:
+            return
+        if self.max_rss_mb and rss_mb > self.max_rss_mb:
+            self.reason = f"agent RSS {rss_mb:.0f} MB over max_rss_mb {self.max_rss_mb:g}"
+        elif self.max_cpu_seconds and self.cpu_seconds > self.max_cpu_seconds:
+            self.reason = (
+                f"agent CPU time {self.cpu_seconds:.1f}s over max_cpu_seconds "
+                f"{self.max_cpu_seconds:g}"
+            )
+        if self.reason is not None:
+            self.exceeded.set()
+
+    async def sample(self) -> None:
+        pid = self._pid()
+        if pid is None:
+            return
+        sample = await asyncio.to_thread(sample_tree, pid)
+        if sample is not None:
+            self.observe(pid, sample)
+
+    async def _run(self) -> None:
+        while True:
+            await self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and os.path.isdir(PROC):
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
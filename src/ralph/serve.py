@@ -0,0 +1,406 @@
+"""``ralph serve`` — a long-running daemon that runs loops submitted as jobs.
+
+One process, one event loop and one warm ``AgentPool`` serve every job, so a
+CI system firing many tasks doesn't pay for a fresh interpreter and agent
+each time. The API is plain HTTP/1.1 with JSON bodies, on a Unix socket or a
+localhost TCP port::
+
+    POST /jobs                submit a job (ralph.yml keys or LoopConfig fields)
+    GET  /jobs                list jobs
+    GET  /jobs/<id>           job status
+    GET  /jobs/<id>/events    the job's events as JSON lines, until it finishes
+    POST /jobs/<id>/cancel    cancel a queued or running job
+
+A job's status is ``queued``, ``running``, or the final ``LoopState``. The
+newest ``MAX_FINISHED_JOBS`` finished jobs are kept; older ones are forgotten.
+
+Anyone who can reach the API can run prompts and shell ``verify_command``s,
+so TCP listeners bind to loopback only unless the server has a token, which
+every request must then send as ``Authorization: Bearer <token>``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, AsyncIterator
+
+from ralph.config import normalize
+from ralph.engine import LoopConfig, LoopResult, RalphEngine
+from ralph.output import JsonlOutput
+from ralph.pool import AgentPool
+
+# Events kept per job for clients that attach late; older ones are dropped.
+MAX_JOB_EVENTS = 10_000
+MAX_BODY_BYTES = 1 << 20
+# Finished jobs kept for status queries before the oldest are forgotten.
+MAX_FINISHED_JOBS = 1000
+
+
+def job_config(body: dict[str, Any], base: dict[str, Any] | None = None) -> LoopConfig:
+    """Build a job's ``LoopConfig`` from ralph.yml keys and/or field names.
+
+    *base* holds already-normalized settings (the server's ``ralph.yml``).
+    """
+    cfg = {**(base or {}), **normalize(body, field_names=True)}
+    if not cfg.get("prompt"):
+        raise ValueError("job has no prompt")
+    return LoopConfig(**cfg)
+
+
+@dataclass
+class Job:
+    id: str
+    name: str
+    config: LoopConfig
+    priority: int = 0
+    status: str = "queued"  # queued, running, or the final LoopState
+    result: LoopResult | None = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    task: asyncio.Task[LoopResult] | None = None
+    events: deque[dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MAX_JOB_EVENTS))
+    dropped: int = 0  # events that fell off the front of ``events``
+    _wakeup: asyncio.Event = field(default_factory=asyncio.Event, init=False, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def publish(self, event: dict[str, Any]) -> None:
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def start(self) -> None:
+        self.status = "running"
+        self.started_at = time.time()
+        self.publish({"event": "status", "status": self.status})
+
+    def finish(self, result: LoopResult) -> None:
+        self.status = result.state
+        self.result = result
+        self.finished_at = time.time()
+        self.publish({
+            "event": "result",
+            "state": result.state,
+            "iterations": result.iterations,
+            "duration_seconds": round(result.duration_seconds, 3),
+            "prompt_bytes": result.prompt_bytes,
+            "restarts": result.restarts,
+            "error": result.error,
+        })
+
+    async def follow(self) -> AsyncIterator[dict[str, Any]]:
+        """Yield every kept event, then new ones until the job finishes."""
+        seen = self.dropped
+        while True:
+            # Skip whatever was dropped while the reader was behind.
+            seen = max(seen, self.dropped)
+            while seen - self.dropped < len(self.events):
+                yield self.events[seen - self.dropped]
+                seen += 1
+            if self.done:
+                return
+            await self._wakeup.wait()
+
+    def summary(self) -> dict[str, Any]:
+        result = self.result
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "priority": self.priority,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "iterations": result.iterations if result else None,
+            "duration_seconds": round(result.duration_seconds, 3) if result else None,
+            "error": result.error if result else None,
+        }
+
+
+class JobOutput(JsonlOutput):
+    """Event bus subscriber that appends a loop's jsonl events to its job.
+
+    With *attempt*, events of one best-of attempt are tagged with its index.
+    """
+
+    def __init__(self, job: Job, attempt: int | None = None) -> None:
+        super().__init__()
+        self._job = job
+        self._extra = {"attempt": attempt} if attempt is not None else {}
+
+    def _event(self, event: str, **fields: Any) -> None:
+        self._job.publish({"event": event, **fields, **self._extra})
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class RalphServer:
+    """Queues jobs and runs at most *concurrency* of them at once."""
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        base: dict[str, Any] | None = None,
+        pool: AgentPool | None = None,
+        token: str | None = None,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.base = base or {}
+        self.pool = pool if pool is not None else AgentPool()
+        self.token = token
+        self.jobs: dict[str, Job] = {}
+        self._finished: deque[str] = deque()
+        self._queue: asyncio.PriorityQueue[tuple[int, int, Job]] = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._workers: list[asyncio.Task[None]] = []
+
+    def submit(self, body: dict[str, Any]) -> Job:
+        config = job_config(body, self.base)
+        job_id = uuid.uuid4().hex[:12]
+        job = Job(
+            id=job_id,
+            name=str(body.get("name", job_id)),
+            config=config,
+            priority=int(body.get("priority", 0)),
+        )
+        self.jobs[job.id] = job
+        job.publish({"event": "status", "status": job.status})
+        # Higher priority first; ties in submission order.
+        self._queue.put_nowait((-job.priority, next(self._seq), job))
+        return job
+
+    def _finish(self, job: Job, result: LoopResult) -> None:
+        job.finish(result)
+        self._finished.append(job.id)
+        while len(self._finished) > MAX_FINISHED_JOBS:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    def cancel(self, job: Job) -> None:
+        if job.status == "queued":
+            self._finish(job, LoopResult(
+                state="cancelled", iterations=0, duration_seconds=0.0,
+                error="cancelled before start",
+            ))
+        elif job.task is not None:
+            job.task.cancel()
+
+    async def _execute(self, job: Job) -> LoopResult:
+        config = job.config
+        try:
+            if config.attempts > 1:
+                from ralph.attempts import run_best_of
+
+                def stream(engine: RalphEngine, attempt: Any) -> None:
+                    engine.bus.subscribe(
+                        JobOutput(job, attempt.index).handle, MAX_JOB_EVENTS, overflow="coalesce",
+                    )
+
+                return (await run_best_of(config, self.pool, stream)).result
+            # Errors still reach the server's stderr; everything goes to the job.
+            engine = RalphEngine(dataclasses.replace(config, output="quiet"), pool=self.pool)
+            engine.bus.subscribe(JobOutput(job).handle, MAX_JOB_EVENTS, overflow="coalesce")
+            return await engine.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return LoopResult(state="failed", iterations=0, duration_seconds=0.0, error=str(e))
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != "queued":
+                continue  # cancelled while waiting
+            job.start()
+            print(f"▶ [{job.name}] started ({job.id})", flush=True)
+            start = time.monotonic()
+            job.task = asyncio.ensure_future(self._execute(job))
+            try:
+                await asyncio.wait({job.task})
+            finally:
+                if not job.task.done():
+                    job.task.cancel()
+                    await asyncio.gather(job.task, return_exceptions=True)
+                if job.task.cancelled():
+                    result = LoopResult(
+                        state="cancelled", iterations=0,
+                        duration_seconds=time.monotonic() - start, error="cancelled",
+                    )
+                else:
+                    result = job.task.result()
+                self._finish(job, result)
+                print(f"▶ [{job.name}] {result.state}", flush=True)
+
+    def start(self) -> None:
+        self.pool.start()
+        if not self._workers:
+            self._workers = [
+                asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)
+            ]
+
+    async def close(self) -> None:
+        """Cancel running jobs and stop the workers and warm agents."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.pool.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one request per connection."""
+        try:
+            try:
+                method, path, headers, body = await _read_request(reader)
+                self._authorize(headers)
+                await self._route(method, path, body, writer)
+            except HttpError as e:
+                await _respond(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    def _authorize(self, headers: dict[str, str]) -> None:
+        if self.token is None:
+            return
+        sent = headers.get("authorization", "")
+        if not hmac.compare_digest(sent.encode(), f"Bearer {self.token}".encode()):
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "missing or wrong bearer token")
+
+    def _job(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"no job {job_id}")
+        return job
+
+    async def _route(
+        self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter,
+    ) -> None:
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if parts == ["jobs"] and method == "GET":
+            await _respond(writer, HTTPStatus.OK, {
+                "jobs": [job.summary() for job in self.jobs.values()],
+            })
+        elif parts == ["jobs"] and method == "POST":
+            try:
+                data = json.loads(body or b"{}")
+                if not isinstance(data, dict):
+                    raise ValueError("job must be a JSON object")
+                job = self.submit(data)
+            except (ValueError, TypeError) as e:
+                raise HttpError(HTTPStatus.BAD_REQUEST, str(e)) from None
+            await _respond(writer, HTTPStatus.CREATED, job.summary())
+        elif len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            await _respond(writer, HTTPStatus.OK, self._job(parts[1]).summary())
+        elif len(parts) == 3 and parts[::2] == ["jobs", "events"] and method == "GET":
+            job = self._job(parts[1])
+            writer.write(_head(HTTPStatus.OK, "application/x-ndjson"))
+            async for event in job.follow():
+                writer.write(json.dumps(event, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+        elif len(parts) == 3 and parts[::2] == ["jobs", "cancel"] and method == "POST":
+            job = self._job(parts[1])
+            self.cancel(job)
+            await _respond(writer, HTTPStatus.ACCEPTED, job.summary())
+        else:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"no route for {method} {path}")
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> tuple[str, str, dict[str, str], bytes]:
+    line = (await reader.readline()).decode("latin-1").split()
+    if len(line) != 3:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "malformed request line")
+    method, path, _ = line
+    headers: dict[str, str] = {}
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raw = headers.get("content-length", "0")
+    if not raw.isdigit():  # also refuses negative lengths
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"bad Content-Length {raw!r}")
+    length = int(raw)
+    if length > MAX_BODY_BYTES:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def _head(status: HTTPStatus, content_type: str, length: int | None = None) -> bytes:
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: Any) -> None:
+    data = json.dumps(payload, ensure_ascii=False).encode() + b"\n"
+    writer.write(_head(status, "application/json", len(data)) + data)
+    await writer.drain()
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # another hostname: it may resolve to anything
+
+
+async def serve(
+    server: RalphServer,
+    socket_path: str | None = None,
+    host: str = "127.0.0.1",
+    port: int | None = None,
+    ready: asyncio.Event | None = None,
+) -> None:
+    """Listen on *socket_path* (or *host*:*port*) until cancelled."""
+    if port is None:
+        assert socket_path is not None
+        listener = await asyncio.start_unix_server(server.handle, path=socket_path)
+        where = socket_path
+    else:
+        if server.token is None and not is_loopback(host):
+            raise ValueError(f"refusing to serve on non-loopback {host} without a token")
+        listener = await asyncio.start_server(server.handle, host, port)
+        where = f"http://{host}:{port}"
+    server.start()
+    print(f"▶ ralph serve listening on {where} ({server.concurrency} concurrent jobs)", flush=True)
+    if ready is not None:
+        ready.set()
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+        if socket_path is not None and port is None:
+            with contextlib.suppress(OSError):
+                os.unlink(socket_path)
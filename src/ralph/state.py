@@ -0,0 +1,28 @@
+"""Per-workspace state directory (``<working_dir>/.ralph``)."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+STATE_DIR = ".ralph"
+
+
+def state_dir(working_dir: str) -> Path:
+    """Return ``<working_dir>/.ralph``, creating it (git-ignored) if needed."""
+    path = Path(working_dir) / STATE_DIR
+    if not path.is_dir():
+        path.mkdir(parents=True, exist_ok=True)
+        # Keep loop state out of the agent's diffs and commits.
+        (path / ".gitignore").write_text("*\n", encoding="utf-8")
+    return path
+
+
+def write_atomic(path: Path, data: str) -> None:
+    """Write *data* to *path* so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
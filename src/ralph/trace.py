@@ -0,0 +1,236 @@
+"""Per-iteration spans and a non-blocking JSONL trace writer.
+
+Records loosely follow the OpenTelemetry span shape (trace/span ids, unix-nano
+start/end times, flat ``attributes``) so they can be loaded by OTel tooling or
+plain ``jq``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ralph.models import TokenUsage
+
+# Statuses after which an ACP tool call is finished.
+_TOOL_DONE = ("completed", "failed")
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+@dataclass
+class ToolSpan:
+    tool_id: str
+    name: str
+    start: float
+    end: float | None = None
+    status: str = ""
+
+
+@dataclass
+class IterationSpan:
+    """Timings and counters for one iteration, fed from the ACP callbacks."""
+
+    iteration: int
+    start: float = field(default_factory=time.monotonic)
+    prompt_bytes: int = 0
+    first_text: float | None = None
+    end: float | None = None
+    text_bytes: int = 0
+    tools: dict[str, ToolSpan] = field(default_factory=dict)
+    permissions: int = 0
+    permission_seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+    files_changed: int | None = None
+    verify: str | None = None  # "passed", "failed" or "cached_passed" / "cached_failed"
+    verify_seconds: float = 0.0
+    # Agent process tree usage, when sampled (see ralph.resources).
+    peak_rss_mb: float | None = None
+    cpu_seconds: float | None = None
+    processes: int | None = None
+    usage: TokenUsage | None = None
+    outcome: str = ""
+
+    def text(self, chunk: str) -> None:
+        if self.first_text is None:
+            self.first_text = time.monotonic()
+        self.text_bytes += len(chunk.encode("utf-8"))
+
+    def tool_start(self, tool_id: str, name: str) -> None:
+        self.tools[tool_id] = ToolSpan(tool_id, name, time.monotonic())
+
+    def tool_end(self, tool_id: str, status: str) -> None:
+        span = self.tools.get(tool_id)
+        if span is None or span.end is not None or status not in _TOOL_DONE:
+            return
+        span.end = time.monotonic()
+        span.status = status
+
+    def permission(self, seconds: float) -> None:
+        self.permissions += 1
+        self.permission_seconds += seconds
+
+    def error(self, exc: BaseException | str) -> None:
+        self.errors.append(str(exc))
+
+    def finish(self, outcome: str) -> None:
+        if self.end is None:
+            self.end = time.monotonic()
+            self.outcome = outcome
+
+    @property
+    def ttft_seconds(self) -> float | None:
+        """Time from sending the prompt to the first streamed text chunk."""
+        return None if self.first_text is None else self.first_text - self.start
+
+    @property
+    def turn_seconds(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+    def tool_counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for span in self.tools.values():
+            counts[span.name] = counts.get(span.name, 0) + 1
+        return counts
+
+
+class Tracer:
+    """Writes spans as JSON lines from a background task.
+
+    ``emit`` only enqueues, so tracing never blocks the event loop; the writer
+    task drains the queue in batches and does the file I/O in a thread.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.trace_id = _new_id(16)
+        self.run_span_id = _new_id(8)
+        self._queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+        self._file: IO[str] | None = None
+        self._task: asyncio.Task[None] | None = None
+        # Anchor for converting monotonic timestamps to unix time.
+        self._wall0 = time.time()
+        self._mono0 = time.monotonic()
+
+    async def start(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._task = asyncio.ensure_future(self._writer())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _unix_nano(self, mono: float) -> int:
+        return int((self._wall0 + (mono - self._mono0)) * 1e9)
+
+    def _span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        attributes: dict[str, Any],
+        span_id: str | None = None,
+        parent: str | None = None,
+    ) -> dict[str, Any]:
+        return {
+            "name": name,
+            "trace_id": self.trace_id,
+            "span_id": span_id or _new_id(8),
+            "parent_span_id": parent,
+            "start_time_unix_nano": self._unix_nano(start),
+            "end_time_unix_nano": self._unix_nano(end),
+            "attributes": attributes,
+        }
+
+    def emit(self, record: dict[str, Any]) -> None:
+        self._queue.put_nowait(record)
+
+    def iteration(self, span: IterationSpan) -> None:
+        """Emit one iteration span plus a child span per tool call."""
+        end = span.end if span.end is not None else time.monotonic()
+        span_id = _new_id(8)
+        ttft = span.ttft_seconds
+        self.emit(self._span(
+            "ralph.iteration",
+            span.start,
+            end,
+            {
+                "ralph.iteration": span.iteration,
+                "ralph.outcome": span.outcome,
+                "ralph.prompt_bytes": span.prompt_bytes,
+                "ralph.text_bytes": span.text_bytes,
+                "ralph.ttft_ms": None if ttft is None else round(ttft * 1000, 1),
+                "ralph.turn_ms": round((end - span.start) * 1000, 1),
+                "ralph.tool_calls": len(span.tools),
+                "ralph.tool_counts": span.tool_counts(),
+                "ralph.permissions": span.permissions,
+                "ralph.permission_ms": round(span.permission_seconds * 1000, 1),
+                "ralph.errors": span.errors,
+                "ralph.files_changed": span.files_changed,
+                "ralph.verify": span.verify,
+                "ralph.verify_ms": round(span.verify_seconds * 1000, 1),
+                "ralph.peak_rss_mb": span.peak_rss_mb,
+                "ralph.cpu_ms": None if span.cpu_seconds is None else round(span.cpu_seconds * 1000, 1),
+                "ralph.processes": span.processes,
+                "ralph.input_tokens": span.usage.input_tokens if span.usage else None,
+                "ralph.output_tokens": span.usage.output_tokens if span.usage else None,
+                "ralph.cost_usd": span.usage.cost_usd if span.usage else None,
+                "ralph.usage_estimated": span.usage.estimated if span.usage else None,
+            },
+            span_id=span_id,
+            parent=self.run_span_id,
+        ))
+        for tool in span.tools.values():
+            self.emit(self._span(
+                "ralph.tool",
+                tool.start,
+                tool.end if tool.end is not None else end,
+                {
+                    "ralph.tool.id": tool.tool_id,
+                    "ralph.tool.name": tool.name,
+                    "ralph.tool.status": tool.status or "unfinished",
+                },
+                parent=span_id,
+            ))
+
+    def run(self, start: float, attributes: dict[str, Any]) -> None:
+        """Emit the root span covering the whole loop."""
+        self.emit(self._span(
+            "ralph.run",
+            start,
+            time.monotonic(),
+            attributes,
+            span_id=self.run_span_id,
+        ))
+
+    async def _writer(self) -> None:
+        done = False
+        while not done:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if None in batch:
+                done = True
+            lines = "".join(
+                json.dumps(r, ensure_ascii=False) + "\n" for r in batch if r is not None
+            )
+            if lines:
+                await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: str) -> None:
+        assert self._file is not None
+        self._file.write(lines)
+        self._file.flush()
@@ -0,0 +1,271 @@
+"""On-disk transcripts: every iteration's text and tool events, indexed.
+
+Each run gets ``.ralph/transcripts/<run id>/`` holding append-only segment
+files (``000001.log``, ...; a new one starts once a segment passes
+``SEGMENT_BYTES``, always at an iteration boundary) and ``index.jsonl``,
+one line per iteration with its segment, byte offset and length. The writer
+is a lossless event bus subscriber: ``handle`` only queues the event, and a
+background task writes batches of them from a thread, so neither the ACP
+callbacks nor the event loop wait on disk. ``Transcript`` reads one
+iteration, or searches it, through ``mmap`` without loading the rest.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import mmap
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+from ralph.events import Event
+from ralph.state import STATE_DIR, state_dir
+
+TRANSCRIPTS_DIR = "transcripts"
+INDEX_FILE = "index.jsonl"
+META_FILE = "meta.json"
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+def new_run_id() -> str:
+    """Sortable by start time, unique across concurrent runs."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(2).hex()}"
+
+
+@dataclass
+class IterationEntry:
+    iteration: int
+    segment: str
+    offset: int
+    length: int
+    started: float
+
+
+class TranscriptWriter:
+    """Appends loop events to segment files and indexes each iteration.
+
+    Until ``start`` is called, events are held until ``close``.
+    """
+
+    def __init__(self, directory: Path, segment_bytes: int = SEGMENT_BYTES) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+        self._index = open(directory / INDEX_FILE, "a", encoding="utf-8")
+        self._pending: list[Event] = []
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task[None] | None = None
+        self._segments = 0
+        self._segment: IO[bytes] | None = None
+        self._size = 0
+        # The iteration being written: (iteration, offset, started).
+        self._current: tuple[int, int, float] | None = None
+        self._line_open = False  # last byte written wasn't a newline
+
+    @classmethod
+    def create(cls, working_dir: str, meta: dict[str, Any]) -> TranscriptWriter:
+        run_id = new_run_id()
+        directory = state_dir(working_dir) / TRANSCRIPTS_DIR / run_id
+        writer = cls(directory)
+        meta = {"run": run_id, "started": time.time(), **meta}
+        (directory / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return writer
+
+    @property
+    def run_id(self) -> str:
+        return self.directory.name
+
+    def _open_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        self._segments += 1
+        self._segment = open(self.directory / f"{self._segments:06d}.log", "ab")
+        self._size = 0
+
+    def _write(self, text: str) -> None:
+        if not text:
+            return
+        if self._segment is None:
+            self._begin(0)  # events before the first iteration banner
+        data = text.encode("utf-8")
+        assert self._segment is not None
+        self._segment.write(data)
+        self._size += len(data)
+        self._line_open = not text.endswith("\n")
+
+    def _line(self, text: str) -> None:
+        self._write(("\n" if self._line_open else "") + text + "\n")
+
+    def _begin(self, iteration: int) -> None:
+        self._finish()
+        if self._segment is None or self._size >= self.segment_bytes:
+            self._open_segment()
+        self._current = (iteration, self._size, time.time())
+        self._line_open = False
+
+    def _finish(self) -> None:
+        if self._current is None:
+            return
+        iteration, offset, started = self._current
+        self._current = None
+        assert self._segment is not None
+        self._segment.flush()
+        entry = IterationEntry(
+            iteration, f"{self._segments:06d}.log", offset, self._size - offset, started,
+        )
+        self._index.write(json.dumps(vars(entry)) + "\n")
+        self._index.flush()
+
+    def handle(self, event: Event) -> None:
+        """Event bus subscriber; never blocks."""
+        self._pending.append(event)
+        self._ready.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            batch, self._pending = self._pending, []
+            if batch:
+                await asyncio.to_thread(self._write_batch, batch)
+            if self._closing and not self._pending:
+                return
+
+    def _write_batch(self, batch: list[Event]) -> None:
+        for event in batch:
+            self._write_event(event)
+
+    def _write_event(self, event: Event) -> None:
+        kind = event.kind
+        if kind == "text":
+            self._write(event.chunk)  # type: ignore[attr-defined]
+        elif kind == "iteration_start":
+            self._begin(event.iteration)  # type: ignore[attr-defined]
+            self._line(f"=== iteration {event.iteration}/{event.max_iterations} ===")  # type: ignore[attr-defined]
+        elif kind == "tool_start":
+            self._line(f"[tool] {event.name} ({event.tool_id})")  # type: ignore[attr-defined]
+        elif kind == "tool_end":
+            self._line(f"[tool {event.status}] {event.tool_id}")  # type: ignore[attr-defined]
+        else:
+            fields = ", ".join(f"{name}={value}" for name, value in zip(event.__slots__, event.values()))
+            self._line(f"[{kind}] {fields}")
+
+    def _close_files(self, batch: list[Event]) -> None:
+        self._write_batch(batch)
+        self._finish()
+        if self._segment is not None:
+            self._segment.close()
+        self._index.close()
+
+    async def close(self) -> None:
+        """Write what is queued, index the last iteration and close the files."""
+        self._closing = True
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        batch, self._pending = self._pending, []
+        await asyncio.to_thread(self._close_files, batch)
+
+
+class Transcript:
+    """Read access to one run's transcript."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.run_id = directory.name
+        try:
+            self.meta: dict[str, Any] = json.loads((directory / META_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.meta = {}
+
+    def entries(self) -> list[IterationEntry]:
+        path = self.directory / INDEX_FILE
+        if not path.exists():
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [IterationEntry(**json.loads(line)) for line in f if line.strip()]
+
+    def _map(self, segment: str) -> mmap.mmap | None:
+        with open(self.directory / segment, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            # The mapping stays valid after the file is closed.
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, entry: IterationEntry) -> bytes:
+        """The bytes of one iteration, read through a memory map."""
+        mapped = self._map(entry.segment)
+        if mapped is None:
+            return b""
+        with mapped:
+            return mapped[entry.offset:entry.offset + entry.length]
+
+    def search(
+        self, pattern: re.Pattern[bytes], entries: list[IterationEntry] | None = None,
+    ) -> Iterator[tuple[IterationEntry, int, bytes]]:
+        """Yield (entry, line number, line) for each line matching *pattern*.
+
+        Each segment is mapped once and only the matching lines are copied out.
+        """
+        mapped: dict[str, mmap.mmap | None] = {}
+        try:
+            for entry in self.entries() if entries is None else entries:
+                if entry.segment not in mapped:
+                    mapped[entry.segment] = self._map(entry.segment)
+                mm = mapped[entry.segment]
+                if mm is None:
+                    continue
+                end = entry.offset + entry.length
+                line_no, counted = 1, entry.offset
+                pos = entry.offset
+                while pos < end:
+                    match = pattern.search(mm, pos, end)
+                    if match is None:
+                        break
+                    start = mm.rfind(b"\n", entry.offset, match.start()) + 1 or entry.offset
+                    stop = mm.find(b"\n", match.end(), end)
+                    stop = end if stop < 0 else stop
+                    line_no += mm[counted:start].count(b"\n")
+                    counted = start
+                    yield entry, line_no, mm[start:stop]
+                    pos = stop + 1
+        finally:
+            for mm in mapped.values():
+                if mm is not None:
+                    mm.close()
+
+
+def transcripts_dir(working_dir: str) -> Path:
+    return Path(working_dir) / STATE_DIR / TRANSCRIPTS_DIR
+
+
+def list_runs(working_dir: str) -> list[Transcript]:
+    """Every recorded run, oldest first."""
+    base = transcripts_dir(working_dir)
+    if not base.is_dir():
+        return []
+    return [Transcript(p) for p in sorted(base.iterdir()) if p.is_dir()]
+
+
+def find_run(working_dir: str, run: str = "last") -> Transcript:
+    """The run with id (or unique id prefix) *run*; ``last`` is the newest."""
+    runs = list_runs(working_dir)
+    if not runs:
+        raise LookupError(f"no transcripts in {transcripts_dir(working_dir)}")
+    if run == "last":
+        return runs[-1]
+    matches = [t for t in runs if t.run_id.startswith(run)]
+    if len(matches) != 1:
+        problem = "no run matches" if not matches else "more than one run matches"
+        raise LookupError(f"{problem} {run!r}")
+    return matches[0]
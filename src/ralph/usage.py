@@ -0,0 +1,134 @@
+"""Token and cost accounting, and the budget check between iterations.
+
+ACP has no usage message; agents that report usage put it in the prompt
+response's ``_meta`` (``{"usage": {"inputTokens": .., "outputTokens": ..,
+"costUsd": ..}}``, snake_case keys work too). ``AcpClient.prompt`` drops the
+response, so ``watch_usage`` wraps the client's connection to keep it.
+Turns without a report are estimated from the bytes sent and streamed.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any
+
+from ralph.models import TokenUsage
+
+# Rough bytes per token for English text and code; estimates only.
+BYTES_PER_TOKEN = 4
+
+
+def estimate_tokens(nbytes: int) -> int:
+    return math.ceil(nbytes / BYTES_PER_TOKEN)
+
+
+def usage_from_meta(meta: Any) -> TokenUsage | None:
+    """The usage an agent reported in a response's ``_meta``, if any."""
+    usage = meta.get("usage") if isinstance(meta, dict) else None
+    if not isinstance(usage, dict):
+        return None
+
+    def pick(*keys: str) -> Any:
+        return next((usage[k] for k in keys if isinstance(usage.get(k), (int, float))), None)
+
+    input_tokens = pick("inputTokens", "input_tokens")
+    output_tokens = pick("outputTokens", "output_tokens")
+    if input_tokens is None and output_tokens is None:
+        return None
+    cost = pick("costUsd", "cost_usd")
+    return TokenUsage(
+        input_tokens=int(input_tokens or 0),
+        output_tokens=int(output_tokens or 0),
+        cost_usd=float(cost) if cost is not None else None,
+    )
+
+
+def watch_usage(connection: Any) -> None:
+    """Make *connection* keep the usage of its last prompt in ``ralph_usage``."""
+    if getattr(connection, "ralph_usage_watched", False):
+        return
+    prompt = connection.prompt
+
+    async def prompt_keeping_usage(*args: Any, **kwargs: Any) -> Any:
+        connection.ralph_usage = None
+        response = await prompt(*args, **kwargs)
+        connection.ralph_usage = usage_from_meta(getattr(response, "field_meta", None))
+        return response
+
+    connection.prompt = prompt_keeping_usage
+    connection.ralph_usage = None
+    connection.ralph_usage_watched = True
+
+
+class UsageMeter:
+    """Totals usage per iteration and decides whether the next one fits the budget.
+
+    Costs come from the agent when it reports them, otherwise from the
+    configured prices per million input / output tokens.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 0,
+        cost_budget: float = 0,
+        input_cost_per_mtok: float = 0,
+        output_cost_per_mtok: float = 0,
+    ) -> None:
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.input_cost_per_mtok = input_cost_per_mtok
+        self.output_cost_per_mtok = output_cost_per_mtok
+        self.total = TokenUsage()
+        self.iterations = 0
+
+    def price(self, usage: TokenUsage) -> float:
+        if usage.cost_usd is not None:
+            return usage.cost_usd
+        return (
+            usage.input_tokens * self.input_cost_per_mtok
+            + usage.output_tokens * self.output_cost_per_mtok
+        ) / 1_000_000
+
+    def record(self, usage: TokenUsage) -> TokenUsage:
+        """Add one turn's usage (its cost filled in) to the total."""
+        usage.cost_usd = self.price(usage)
+        total = self.total
+        total.input_tokens += usage.input_tokens
+        total.output_tokens += usage.output_tokens
+        total.cost_usd = (total.cost_usd or 0.0) + usage.cost_usd
+        total.estimated = total.estimated or usage.estimated
+        self.iterations += 1
+        return usage
+
+    def remaining_tokens(self) -> float:
+        return self.token_budget - self.total.total_tokens if self.token_budget else math.inf
+
+    def projected(self, prompt_tokens: int) -> tuple[int, float]:
+        """Tokens and cost the next iteration is expected to use.
+
+        After the first turn that is the average turn so far, and never less
+        than the next prompt itself.
+        """
+        if not self.iterations:
+            usage = TokenUsage(input_tokens=prompt_tokens)
+            return prompt_tokens, self.price(usage)
+        total = self.total
+        tokens = max(prompt_tokens, math.ceil(total.total_tokens / self.iterations))
+        return tokens, (total.cost_usd or 0.0) / self.iterations
+
+    def over_budget(self, prompt_tokens: int) -> str | None:
+        """Why the next iteration would go over budget, or None if it fits."""
+        tokens, cost = self.projected(prompt_tokens)
+        used = self.total
+        if self.token_budget and used.total_tokens + tokens > self.token_budget:
+            return (
+                f"token budget {self.token_budget} would be exceeded "
+                f"({used.total_tokens} used, next iteration ~{tokens})"
+            )
+        spent = used.cost_usd or 0.0
+        if self.cost_budget and spent + cost > self.cost_budget:
+            return (
+                f"cost budget ${self.cost_budget:g} would be exceeded "
+                f"(${spent:.4f} spent, next iteration ~${cost:.4f})"
+            )
+        return None
@@ -0,0 +1,55 @@
+"""Run the user's verify command (tests, linters) against a working tree."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import time
+from dataclasses import dataclass
+
+# Keep only the end of the verify output; that's where test runners summarize.
+VERIFY_TAIL_CHARS = 4000
+
+
+@dataclass
+class VerifyResult:
+    ok: bool
+    returncode: int | None  # None if the command timed out
+    output: str  # tail of combined stdout/stderr
+    seconds: float
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    await proc.wait()
+
+
+async def run_verify(command: str, cwd: str, timeout: float) -> VerifyResult:
+    """Run *command* through the shell in *cwd*; pass means exit code 0."""
+    t0 = time.monotonic()
+    proc = await asyncio.create_subprocess_shell(
+        command,
+        cwd=cwd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        # Own process group, so a timeout also stops whatever the shell started.
+        start_new_session=True,
+    )
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), timeout=max(0.0, timeout))
+    except asyncio.TimeoutError:
+        await _kill(proc)
+        return VerifyResult(
+            False, None, f"verify command timed out after {timeout:g}s",
+            time.monotonic() - t0,
+        )
+    except asyncio.CancelledError:
+        await _kill(proc)
+        raise
+    text = out.decode("utf-8", "replace")[-VERIFY_TAIL_CHARS:]
+    return VerifyResult(proc.returncode == 0, proc.returncode, text, time.monotonic() - t0)
@@ -0,0 +1,275 @@
+"""SQLite work queue shared by ``ralph enqueue`` and ``ralph worker``.
+
+Workers on any host that can see the database file claim jobs under a lease
+and keep it alive with heartbeats while the loop runs. A job whose lease runs
+out (its worker crashed or lost the filesystem) goes back to the queue for
+the next claim, up to ``MAX_CLAIMS`` times. No broker: every state change is
+one short ``BEGIN IMMEDIATE`` transaction on the file. The default rollback
+journal is used rather than WAL, which doesn't work over network filesystems.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import json
+import os
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterator
+
+from ralph.attempts import run_best_of
+from ralph.engine import LoopConfig, LoopResult, RalphEngine
+
+if TYPE_CHECKING:
+    from ralph.pool import AgentPool
+
+DEFAULT_LEASE_SECONDS = 60.0
+# Claims before a job whose workers keep disappearing is marked failed.
+MAX_CLAIMS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    claims INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, priority DESC, id);
+"""
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    name: str
+    config: LoopConfig
+    claims: int  # including this one
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _result_json(result: LoopResult) -> str:
+    return json.dumps(dataclasses.asdict(result), ensure_ascii=False)
+
+
+class WorkQueue:
+    """Jobs table in the SQLite file at *path*, created on first use."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A connection per call: workers call in from threads, and short-lived
+        # connections never hold the file lock between calls.
+        db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def enqueue(self, config: LoopConfig, name: str, priority: int = 0) -> int:
+        """Add a job; returns its id."""
+        data = json.dumps(dataclasses.asdict(config), ensure_ascii=False)
+        with self._transaction() as db:
+            cur = db.execute(
+                "INSERT INTO jobs (name, priority, config, enqueued_at) VALUES (?, ?, ?, ?)",
+                (name, priority, data, time.time()),
+            )
+            return int(cur.lastrowid or 0)
+
+    def claim(
+        self, worker: str, lease: float = DEFAULT_LEASE_SECONDS, max_claims: int = MAX_CLAIMS,
+    ) -> QueuedJob | None:
+        """Lease the next job (highest priority first), or None if there is none."""
+        now = time.time()
+        abandoned = LoopResult(
+            state="failed", iterations=0, duration_seconds=0.0,
+            error=f"lease expired {max_claims} times; worker lost",
+        )
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', worker = NULL, lease_until = NULL,"
+                " finished_at = ?, result = ?"
+                " WHERE status = 'running' AND lease_until < ? AND claims >= ?",
+                (now, _result_json(abandoned), now, max_claims),
+            )
+            row = db.execute(
+                "SELECT id, name, config, claims FROM jobs"
+                " WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY priority DESC, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?,"
+                " claims = claims + 1, started_at = ? WHERE id = ?",
+                (worker, now + lease, now, row[0]),
+            )
+        job_id, name, config, claims = row
+        return QueuedJob(job_id, name, LoopConfig(**json.loads(config)), claims + 1)
+
+    def _update_own(self, job_id: int, worker: str, sql: str, params: tuple[Any, ...]) -> bool:
+        # Only the worker still holding the lease may touch a running job.
+        with self._transaction() as db:
+            cur = db.execute(
+                f"UPDATE jobs SET {sql} WHERE id = ? AND worker = ? AND status = 'running'",
+                (*params, job_id, worker),
+            )
+            return cur.rowcount == 1
+
+    def heartbeat(self, job_id: int, worker: str, lease: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend the lease; False if *worker* no longer holds the job."""
+        return self._update_own(job_id, worker, "lease_until = ?", (time.time() + lease,))
+
+    def complete(self, job_id: int, worker: str, result: LoopResult) -> bool:
+        """Record *result*; False if the lease was lost and the result dropped."""
+        return self._update_own(
+            job_id, worker,
+            "status = ?, result = ?, finished_at = ?, lease_until = NULL",
+            (result.state, _result_json(result), time.time()),
+        )
+
+    def release(self, job_id: int, worker: str) -> bool:
+        """Put a claimed job back in the queue (worker shutting down)."""
+        return self._update_own(
+            job_id, worker, "status = 'queued', worker = NULL, lease_until = NULL", (),
+        )
+
+    def jobs(self) -> list[dict[str, Any]]:
+        """Every job, oldest first, with its result if finished."""
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT id, name, priority, status, claims, worker, enqueued_at,"
+                " started_at, finished_at, result FROM jobs ORDER BY id"
+            ).fetchall()
+        out = []
+        for row in rows:
+            job = dict(row)
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+            out.append(job)
+        return out
+
+
+async def _run_loop(config: LoopConfig, pool: AgentPool | None) -> LoopResult:
+    if config.attempts > 1:
+        return (await run_best_of(config, pool)).result
+    return await RalphEngine(config, pool=pool).run()
+
+
+async def _run_claimed(
+    queue: WorkQueue, job: QueuedJob, worker: str, lease: float, pool: AgentPool | None,
+) -> None:
+    print(f"\n▶ [{job.name}] started (job {job.id}, claim {job.claims})", flush=True)
+    config = job.config
+    if job.claims > 1 and config.checkpoint:
+        # A reclaimed job picks up from its lost worker's checkpoint, if any.
+        config = dataclasses.replace(config, resume=True)
+    run = asyncio.ensure_future(_run_loop(config, pool))
+    lost = False
+
+    async def heartbeat() -> None:
+        nonlocal lost
+        expires = time.monotonic() + lease
+        delay = lease / 3
+        while True:
+            await asyncio.sleep(delay)
+            sent = time.monotonic()
+            left = expires - sent
+            try:
+                if left <= 0:
+                    raise asyncio.TimeoutError
+                # Give up before the lease runs out, not whenever the lock frees.
+                held = await asyncio.wait_for(
+                    asyncio.to_thread(queue.heartbeat, job.id, worker, lease), left,
+                )
+            except asyncio.TimeoutError:
+                held = False
+            except (sqlite3.Error, OSError) as e:
+                print(f"\n⚠ [{job.name}] heartbeat failed, retrying: {e}", flush=True)
+                delay = min(lease / 10, left / 2)
+                continue
+            if not held:
+                # Lost, or about to be: stop before another worker runs it too.
+                lost = True
+                run.cancel()
+                return
+            expires = sent + lease
+            delay = lease / 3
+
+    beat = asyncio.ensure_future(heartbeat())
+    try:
+        result = await run
+    except asyncio.CancelledError:
+        if not lost:
+            # Shutting down: hand the job straight back instead of waiting out the lease.
+            await asyncio.to_thread(queue.release, job.id, worker)
+            raise
+        print(f"\n▶ [{job.name}] lease lost; dropped", flush=True)
+        return
+    except Exception as e:
+        result = LoopResult(state="failed", iterations=0, duration_seconds=0.0, error=str(e))
+    finally:
+        beat.cancel()
+    if await asyncio.to_thread(queue.complete, job.id, worker, result):
+        print(f"\n▶ [{job.name}] {result.state}", flush=True)
+    else:
+        print(f"\n▶ [{job.name}] {result.state}, but the lease was lost; dropped", flush=True)
+
+
+async def run_worker(
+    queue: WorkQueue,
+    worker: str | None = None,
+    concurrency: int = 1,
+    lease: float = DEFAULT_LEASE_SECONDS,
+    poll: float = 2.0,
+    exit_when_empty: bool = False,
+    pool: AgentPool | None = None,
+) -> None:
+    """Claim and run jobs from *queue*, *concurrency* at a time.
+
+    Polls every *poll* seconds while the queue is empty, or returns once it
+    is empty with *exit_when_empty*.
+    """
+    worker = worker or default_worker_id()
+
+    async def slot() -> None:
+        while True:
+            job = await asyncio.to_thread(queue.claim, worker, lease)
+            if job is None:
+                if exit_when_empty:
+                    return
+                await asyncio.sleep(poll)
+                continue
+            await _run_claimed(queue, job, worker, lease, pool)
+
+    await asyncio.gather(*(slot() for _ in range(max(1, concurrency))))
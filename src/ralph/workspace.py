@@ -0,0 +1,198 @@
+"""Incremental working-tree index for no-progress detection and change summaries.
+
+Each scan lists the workspace (``git ls-files`` when it is a git checkout, so
+``.gitignore`` is honored exactly; otherwise a directory walk with basic
+``.gitignore`` matching), stats every file and only reads files whose
+mtime/size changed since the previous scan. The fingerprint is an XOR of
+per-file tokens, so it is updated in O(changed files). Line counts are
+recorded as files are read, so changes carry line deltas once both sides are
+known.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import os
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Never part of the fingerprint: VCS internals and ralph's own state.
+_ALWAYS_SKIP = {".git", ".ralph"}
+
+
+@dataclass
+class FileEntry:
+    mtime_ns: int
+    size: int
+    digest: str | None = None  # None until the file has been read once
+    lines: int | None = None  # None until read, or for binary files
+    token: int = 0
+
+
+@dataclass
+class WorkspaceChanges:
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    # Signed line-count change per path, where both sides are known.
+    line_deltas: dict[str, int] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.modified) + len(self.deleted)
+
+
+def _token(path: str, *parts: object) -> int:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(path.encode("utf-8", "surrogateescape"))
+    for part in parts:
+        h.update(b"\0" + str(part).encode())
+    return int.from_bytes(h.digest(), "big")
+
+
+def _read_file(path: Path) -> tuple[str | None, int | None]:
+    """Content digest and line count (None for binary files) in one pass."""
+    h = hashlib.blake2b(digest_size=16)
+    lines: int | None = 0
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+                if lines is not None:
+                    lines = None if b"\0" in block else lines + block.count(b"\n")
+    except OSError:
+        return None, None
+    return h.hexdigest(), lines
+
+
+def _git_files(root: Path) -> list[str] | None:
+    """Tracked + untracked, non-ignored files, or None if not a git checkout."""
+    try:
+        proc = subprocess.run(
+            ["git", "-C", str(root), "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    names = proc.stdout.decode("utf-8", "surrogateescape").split("\0")
+    return [n for n in names if n and n.split("/", 1)[0] not in _ALWAYS_SKIP]
+
+
+def _read_ignore(path: Path) -> list[str]:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+    return [ln.strip() for ln in lines if ln.strip() and not ln.startswith(("#", "!"))]
+
+
+def _ignored(rel: str, name: str, is_dir: bool, patterns: list[tuple[str, str]]) -> bool:
+    for base, pat in patterns:
+        dir_only = pat.endswith("/")
+        pat = pat.rstrip("/")
+        if dir_only and not is_dir:
+            continue
+        if "/" in pat:
+            # Anchored to the directory holding the .gitignore.
+            target = rel[len(base):] if base and rel.startswith(base) else rel
+            if fnmatch.fnmatch(target, pat.lstrip("/")):
+                return True
+        elif fnmatch.fnmatch(name, pat):
+            return True
+    return False
+
+
+def _walk_files(root: Path) -> list[str]:
+    """Directory walk honoring (a practical subset of) nested ``.gitignore`` rules."""
+    out: list[str] = []
+    stack: list[tuple[Path, str, list[tuple[str, str]]]] = [(root, "", [])]
+    while stack:
+        directory, prefix, inherited = stack.pop()
+        patterns = inherited + [(prefix, p) for p in _read_ignore(directory / ".gitignore")]
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            rel = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in _ALWAYS_SKIP or _ignored(rel, entry.name, True, patterns):
+                    continue
+                stack.append((Path(entry.path), rel + "/", patterns))
+            elif entry.is_file(follow_symlinks=False):
+                if not _ignored(rel, entry.name, False, patterns):
+                    out.append(rel)
+    return out
+
+
+class WorkspaceIndex:
+    """mtime/size index of a working tree with an incremental fingerprint."""
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self.entries: dict[str, FileEntry] = {}
+        self.fingerprint = 0
+        self._scanned = False
+
+    def _list(self) -> list[str]:
+        files = _git_files(self.root)
+        return files if files is not None else _walk_files(self.root)
+
+    def scan(self) -> WorkspaceChanges:
+        """Refresh the index and return what changed since the last scan.
+
+        The first scan only records a baseline (no files are read) and
+        reports no changes. Files whose stat changed are read and hashed;
+        once a file has a content hash, rewriting it with identical content
+        is not counted as a change.
+        """
+        changes = WorkspaceChanges()
+        seen: set[str] = set()
+        for rel in self._list():
+            try:
+                st = os.stat(self.root / rel)
+            except OSError:
+                continue
+            seen.add(rel)
+            old = self.entries.get(rel)
+            if old is not None and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+                continue
+
+            entry = FileEntry(st.st_mtime_ns, st.st_size)
+            if old is None:
+                if self._scanned:
+                    entry.digest, entry.lines = _read_file(self.root / rel)
+                    changes.added.append(rel)
+                    if entry.lines is not None:
+                        changes.line_deltas[rel] = entry.lines
+            else:
+                entry.digest, entry.lines = _read_file(self.root / rel)
+                if old.digest is None or entry.digest != old.digest:
+                    changes.modified.append(rel)
+                    if old.lines is not None and entry.lines is not None:
+                        changes.line_deltas[rel] = entry.lines - old.lines
+                self.fingerprint ^= old.token
+            entry.token = (
+                _token(rel, entry.digest) if entry.digest else _token(rel, entry.mtime_ns, entry.size)
+            )
+            self.fingerprint ^= entry.token
+            self.entries[rel] = entry
+
+        for rel in [r for r in self.entries if r not in seen]:
+            old = self.entries.pop(rel)
+            self.fingerprint ^= old.token
+            changes.deleted.append(rel)
+            if old.lines is not None:
+                changes.line_deltas[rel] = -old.lines
+
+        self._scanned = True
+        for names in (changes.added, changes.modified, changes.deleted):
+            names.sort()
+        return changes
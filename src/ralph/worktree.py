@@ -0,0 +1,128 @@
+"""Disposable git worktrees for running agents on isolated copies of a repo.
+
+A worktree starts from ``HEAD`` plus the checkout's uncommitted changes and
+untracked (non-ignored) files, committed as a private base commit, so the
+diff an agent produces can be applied back onto the original checkout as-is.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from ralph.state import STATE_DIR, state_dir
+
+# Identity for the throwaway base commit; never leaves the worktree.
+_GIT_IDENTITY = ["-c", "user.name=ralph", "-c", "user.email=ralph@localhost"]
+# git serializes worktree bookkeeping behind a lock file and fails rather than
+# waits, so worktrees are added and removed one at a time in this process.
+_bookkeeping = threading.Lock()
+
+
+class WorktreeError(RuntimeError):
+    """A git command needed for a worktree failed."""
+
+
+@dataclass
+class Worktree:
+    top: Path  # top level of the original checkout
+    path: Path  # top level of the worktree
+    working_dir: str  # the original working_dir, mapped into the worktree
+
+
+def _git(cwd: Path, *args: str, input: bytes | None = None) -> bytes:
+    proc = subprocess.run(
+        ["git", "-C", str(cwd), *args], input=input, capture_output=True, check=False,
+    )
+    if proc.returncode != 0:
+        detail = proc.stderr.decode("utf-8", "replace").strip()
+        raise WorktreeError(f"git {args[0]} failed: {detail}")
+    return proc.stdout
+
+
+def git_toplevel(working_dir: str) -> Path | None:
+    """Top level of the git checkout containing *working_dir*, if any."""
+    try:
+        return Path(_git(Path(working_dir), "rev-parse", "--show-toplevel").decode().strip())
+    except (OSError, WorktreeError):
+        return None
+
+
+def run_prefix() -> str:
+    """A short id for one race or best-of run's worktree names.
+
+    Runs in the same checkout (under ``ralph batch`` or ``ralph serve``)
+    would otherwise pick the same names.
+    """
+    return uuid.uuid4().hex[:8]
+
+
+def create_worktree(working_dir: str, name: str) -> Worktree:
+    """Create ``.ralph/worktrees/<name>`` mirroring *working_dir*'s checkout.
+
+    Safe to call from several threads at once.
+    """
+    with _bookkeeping:
+        return _create_worktree(working_dir, name)
+
+
+def _create_worktree(working_dir: str, name: str) -> Worktree:
+    cwd = Path(working_dir).resolve()
+    top = git_toplevel(str(cwd))
+    if top is None:
+        raise WorktreeError(f"{working_dir} is not inside a git repository")
+    path = state_dir(str(top)) / "worktrees" / name
+    if path.exists():
+        # Never reuse it: it may be another run's, still in use.
+        raise WorktreeError(f"worktree {path} already exists")
+    _git(top, "worktree", "add", "--detach", str(path), "HEAD")
+
+    dirty = _git(top, "diff", "--binary", "HEAD")
+    if dirty:
+        _git(path, "apply", "--binary", input=dirty)
+    untracked = _git(top, "ls-files", "-z", "--others", "--exclude-standard")
+    for rel in untracked.decode("utf-8", "surrogateescape").split("\0"):
+        if not rel or rel.split("/", 1)[0] == STATE_DIR:
+            continue
+        dest = path / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(top / rel, dest, follow_symlinks=False)
+    _git(path, "add", "-A")
+    _git(path, *_GIT_IDENTITY, "commit", "-q", "--no-verify", "--allow-empty", "-m", "ralph base")
+
+    return Worktree(top, path, str(path / os.path.relpath(cwd, top)))
+
+
+def worktree_diff(worktree: Worktree) -> bytes:
+    """Binary patch of everything changed in *worktree* since it was created."""
+    _git(worktree.path, "add", "-A")
+    return _git(worktree.path, "diff", "--binary", "--cached", "HEAD")
+
+
+def apply_diff(worktree: Worktree, patch: bytes) -> None:
+    """Apply a patch from ``worktree_diff`` to the original checkout."""
+    if patch:
+        _git(worktree.top, "apply", "--binary", input=patch)
+
+
+def remove_worktree(worktree: Worktree) -> None:
+    """Delete *worktree*; errors are ignored so cleanup never masks a result."""
+    with _bookkeeping:
+        _remove_worktree(worktree)
+
+
+def _remove_worktree(worktree: Worktree) -> None:
+    subprocess.run(
+        ["git", "-C", str(worktree.top), "worktree", "remove", "--force", str(worktree.path)],
+        capture_output=True,
+        check=False,
+    )
+    shutil.rmtree(worktree.path, ignore_errors=True)
+    subprocess.run(
+        ["git", "-C", str(worktree.top), "worktree", "prune"], capture_output=True, check=False,
+    )
@@ -0,0 +1,93 @@
+"""Best-of-N attempts end-to-end against the bundled fake ACP agent."""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from ralph.attempts import _attempt_config, run_best_of
+from ralph.engine import LoopConfig
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run([*git, "init", "-q"], check=True)
+    (tmp_path / "README").write_text("hi\n")
+    subprocess.run([*git, "add", "-A"], check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "init"], check=True)
+    return tmp_path
+
+
+def _config(repo: Path, *agent_args: str, **overrides) -> LoopConfig:
+    defaults = dict(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", *agent_args],
+        working_dir=str(repo),
+        max_iterations=3,
+        timeout_seconds=60,
+        output="quiet",
+        attempts=3,
+    )
+    defaults.update(overrides)
+    return LoopConfig(**defaults)
+
+
+def test_first_finished_attempt_is_applied(repo: Path):
+    config = _config(repo, "--write", "out.txt", "--promise-on", "2")
+
+    best = asyncio.run(run_best_of(config))
+    assert best.result.state == "complete"
+    assert best.result.iterations == 2
+    assert best.winner is not None
+    assert (repo / "out.txt").read_text() == "iteration 1\niteration 2\n"
+    assert not list((repo / ".ralph" / "worktrees").iterdir())
+
+
+def test_concurrent_runs_in_one_checkout(repo: Path):
+    config = _config(repo, "--promise-on", "2", "--delay", "0.2", attempts=2)
+
+    async def both():
+        return await asyncio.gather(run_best_of(config), run_best_of(config))
+
+    results = asyncio.run(both())
+    assert [best.result.state for best in results] == ["complete", "complete"]
+    assert not list((repo / ".ralph" / "worktrees").iterdir())
+
+
+def test_verify_picks_the_passing_attempt(repo: Path):
+    # Only the second attempt's worktree passes the check.
+    config = _config(
+        repo, "--write", "out.txt", "--promise-on", "1",
+        verify_command="pwd | grep -q attempt-2",
+    )
+
+    best = asyncio.run(run_best_of(config))
+    assert best.result.state == "complete"
+    assert best.winner is not None and best.winner.index == 2
+    assert (repo / "out.txt").exists()
+
+
+def test_nothing_applied_when_verify_always_fails(repo: Path):
+    config = _config(
+        repo, "--write", "out.txt", "--promise-on", "1", attempts=2, verify_command="false",
+    )
+
+    best = asyncio.run(run_best_of(config))
+    # Rejected claims keep each loop going until it runs out of iterations.
+    assert best.winner is None
+    assert best.result.state == "max_iterations"
+    assert [a.verify.ok for a in best.attempts if a.verify] == [False, False]
+    assert not (repo / "out.txt").exists()
+
+
+def test_attempt_loops_never_race(repo: Path):
+    config = _config(repo, attempts=3, race=[["other-agent"]])
+    attempt = _attempt_config(config, str(repo))
+    assert (attempt.attempts, attempt.race) == (1, [])
@@ -0,0 +1,173 @@
+"""Tests for batch loading and the bounded scheduler."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from ralph.batch import BatchTask, load_batch, run_batch
+from ralph.engine import LoopConfig, LoopResult
+from ralph.output import JsonlOutput, QuietOutput
+from ralph.trace import IterationSpan
+
+
+def test_load_directory(tmp_path: Path):
+    (tmp_path / "b.md").write_text("task b")
+    (tmp_path / "a.txt").write_text("task a")
+    (tmp_path / "notes.json").write_text("{}")
+    (tmp_path / "ralph.yml").write_text("max_iterations: 7\n")
+    tasks = load_batch(str(tmp_path))
+    assert [t.name for t in tasks] == ["a", "b"]
+    assert tasks[0].config.prompt == "task a"
+    assert tasks[0].config.max_iterations == 7
+
+
+def test_load_manifest(tmp_path: Path):
+    manifest = tmp_path / "batch.json"
+    manifest.write_text(json.dumps({
+        "defaults": {"command": "gemini", "command_args": "--experimental-acp"},
+        "tasks": [
+            {"name": "fix", "prompt": "fix tests", "priority": 5, "timeout": 60},
+            {"prompt": "write docs"},
+        ],
+    }))
+    tasks = load_batch(str(manifest))
+    assert [t.name for t in tasks] == ["fix", "task-2"]
+    assert tasks[0].priority == 5
+    assert tasks[0].config.timeout_seconds == 60
+    assert tasks[1].config.command == "gemini"
+    assert tasks[1].config.command_args == ["--experimental-acp"]
+
+
+def test_manifest_task_without_prompt(tmp_path: Path):
+    manifest = tmp_path / "batch.json"
+    manifest.write_text(json.dumps([{"name": "x"}]))
+    with pytest.raises(ValueError):
+        load_batch(str(manifest))
+
+
+def _task(name: str, priority: int = 0) -> BatchTask:
+    return BatchTask(name=name, config=LoopConfig(prompt=name), priority=priority)
+
+
+def test_run_batch_respects_concurrency_and_priority():
+    running = 0
+    peak = 0
+    order: list[str] = []
+
+    class FakeEngine:
+        def __init__(self, config: LoopConfig, pool=None) -> None:
+            self.config = config
+
+        async def run(self) -> LoopResult:
+            nonlocal running, peak
+            order.append(self.config.prompt)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return LoopResult(state="complete", iterations=1, duration_seconds=0.01)
+
+    tasks = [_task("low"), _task("high", priority=9), _task("mid", priority=3)]
+    with patch("ralph.batch.RalphEngine", FakeEngine):
+        results = asyncio.run(run_batch(tasks, concurrency=1))
+
+    assert order == ["high", "mid", "low"]
+    assert peak == 1
+    assert [r.name for r in results] == ["low", "high", "mid"]
+    assert all(r.result.state == "complete" for r in results)
+
+
+def test_run_batch_timeout_and_failures():
+    class FakeEngine:
+        def __init__(self, config: LoopConfig, pool=None) -> None:
+            self.config = config
+            self.spans: list[IterationSpan] = []
+
+        async def run(self) -> LoopResult:
+            self.spans.append(IterationSpan(iteration=1))
+            if self.config.prompt == "boom":
+                await asyncio.sleep(0.02)
+                raise RuntimeError("agent missing")
+            self.spans.append(IterationSpan(iteration=2))
+            await asyncio.sleep(30)
+            return LoopResult(state="complete", iterations=1, duration_seconds=30)
+
+    tasks = [_task("boom"), _task("slow"), _task("queued")]
+    with patch("ralph.batch.RalphEngine", FakeEngine):
+        results = asyncio.run(run_batch(tasks, concurrency=2, timeout_seconds=0.1))
+
+    states = {r.name: r.result.state for r in results}
+    assert states["boom"] == "failed"
+    assert states["slow"] == "timeout"
+    # "queued" takes the slot "boom" released, so it was running too.
+    assert states["queued"] == "timeout"
+    # How far each loop got, not zeros.
+    boom, slow, queued = (r.result for r in results)
+    assert boom.iterations == 1 and boom.duration_seconds >= 0.02
+    assert slow.iterations == 2 and slow.duration_seconds >= 0.1
+    assert queued.iterations == 2 and 0 < queued.duration_seconds < slow.duration_seconds
+
+
+def test_run_batch_reports_to_the_output_sink():
+    class FakeEngine:
+        def __init__(self, config: LoopConfig, pool=None) -> None:
+            self.config = config
+            self.spans: list[IterationSpan] = []
+
+        async def run(self) -> LoopResult:
+            return LoopResult(state="complete", iterations=1, duration_seconds=0.5)
+
+    async def run(out) -> None:
+        out.start()
+        results = await run_batch([_task("a")], out=out)
+        out.batch_results(results, [0])
+        await out.close()
+
+    stream = io.StringIO()
+    with patch("ralph.batch.RalphEngine", FakeEngine):
+        asyncio.run(run(JsonlOutput(out=stream)))
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e["event"] for e in events] == ["task_start", "task_end", "result"]
+    assert events[2] == {
+        "event": "result", "name": "a", "state": "complete", "exit_code": 0,
+        "iterations": 1, "duration_seconds": 0.5, "error": None,
+    }
+
+    stream = io.StringIO()
+    with patch("ralph.batch.RalphEngine", FakeEngine):
+        asyncio.run(run(QuietOutput(out=stream)))
+    # Quiet mode keeps the summary only.
+    assert stream.getvalue() == "\n▶ Batch results:\n  a: complete (exit 0, 1 iterations, 0.5s)\n"
+
+
+def test_run_batch_runs_best_of_for_attempts():
+    calls: list[int] = []
+
+    class FakeEngine:
+        def __init__(self, config: LoopConfig, pool=None) -> None:
+            self.config = config
+            self.spans = [IterationSpan(iteration=1)]
+
+        async def run(self) -> LoopResult:
+            return LoopResult(state="complete", iterations=1, duration_seconds=0.0)
+
+    async def fake_best_of(config: LoopConfig, pool=None, on_engine=None):
+        calls.append(config.attempts)
+        for index in range(config.attempts):
+            on_engine(FakeEngine(config), index)
+        await asyncio.sleep(30)
+
+    tasks = [_task("single"), BatchTask("multi", LoopConfig(prompt="multi", attempts=3))]
+    with patch("ralph.batch.RalphEngine", FakeEngine), patch("ralph.batch.run_best_of", fake_best_of):
+        results = asyncio.run(run_batch(tasks, timeout_seconds=0.1))
+
+    assert calls == [3]
+    single, multi = (r.result for r in results)
+    assert single.state == "complete"
+    assert (multi.state, multi.iterations) == ("timeout", 1)
@@ -0,0 +1,67 @@
+"""Tests for checkpoint persistence."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from ralph.checkpoint import (
+    Checkpoint,
+    checkpoint_path,
+    clear_checkpoint,
+    config_hash,
+    load_checkpoint,
+    save_checkpoint,
+)
+from ralph.models import LoopConfig
+
+
+def test_roundtrip(tmp_path: Path):
+    cp = Checkpoint(config_hash="abc", iteration=3, elapsed_seconds=12.5,
+                    response_tail="tail ✓", session_id="s1")
+    save_checkpoint(str(tmp_path), cp)
+    assert load_checkpoint(str(tmp_path), "abc") == cp
+    # Only the checkpoint itself remains, no temporary file.
+    path = checkpoint_path(str(tmp_path), "abc")
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
+
+
+def test_state_dir_is_git_ignored(tmp_path: Path):
+    save_checkpoint(str(tmp_path), Checkpoint("abc", 1, 0.0))
+    assert (tmp_path / ".ralph" / ".gitignore").read_text() == "*\n"
+
+
+def test_missing_and_clear(tmp_path: Path):
+    assert load_checkpoint(str(tmp_path), "abc") is None
+    assert not (tmp_path / ".ralph").exists()
+    save_checkpoint(str(tmp_path), Checkpoint("abc", 1, 0.0))
+    clear_checkpoint(str(tmp_path), "abc")
+    assert load_checkpoint(str(tmp_path), "abc") is None
+    clear_checkpoint(str(tmp_path), "abc")
+
+
+def test_config_hash_ignores_limits():
+    base = LoopConfig(prompt="task")
+    assert config_hash(base) == config_hash(LoopConfig(prompt="task", max_iterations=99))
+    assert config_hash(base) != config_hash(LoopConfig(prompt="other task"))
+    assert config_hash(base) != config_hash(LoopConfig(prompt="task", command="gemini"))
+
+
+def test_tasks_in_one_working_dir_keep_their_own_checkpoints(tmp_path: Path):
+    first, second = (config_hash(LoopConfig(prompt=p)) for p in ("task one", "task two"))
+    save_checkpoint(str(tmp_path), Checkpoint(first, 2, 1.0))
+    save_checkpoint(str(tmp_path), Checkpoint(second, 5, 9.0))
+    clear_checkpoint(str(tmp_path), first)
+    assert load_checkpoint(str(tmp_path), first) is None
+    assert load_checkpoint(str(tmp_path), second) == Checkpoint(second, 5, 9.0)
+
+
+def test_unreadable_checkpoint_starts_fresh(tmp_path: Path):
+    save_checkpoint(str(tmp_path), Checkpoint("abc", 1, 0.0))
+    path = checkpoint_path(str(tmp_path), "abc")
+    for text in ('{"config_hash": "abc", "itera', "[1, 2]", '"abc"', "null",
+                 '{"config_hash": "abc", "iteration": 1}',
+                 '{"config_hash": "abc", "iteration": 1, "elapsed_seconds": 0, "extra": 1}'):
+        path.write_text(text)
+        assert load_checkpoint(str(tmp_path), "abc") is None
+    path.write_bytes(b"\xff\xfe")
+    assert load_checkpoint(str(tmp_path), "abc") is None
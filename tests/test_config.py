@@ -2,6 +2,8 @@
 
 from pathlib import Path
 
+import pytest
+
 from ralph.config import load_config_file
 
 
@@ -49,3 +51,56 @@ def test_partial_config(tmp_path: Path):
     (tmp_path / "ralph.yml").write_text("max_iterations: 50\n")
     cfg = load_config_file(str(tmp_path))
     assert cfg == {"max_iterations": 50}
+
+
+def test_prompt_strategy(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text("prompt_strategy: digest\n")
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {"prompt_strategy": "digest"}
+
+
+def test_invalid_prompt_strategy(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text("prompt_strategy: sometimes\n")
+    with pytest.raises(ValueError):
+        load_config_file(str(tmp_path))
+
+
+def test_stall_limit(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text("stall_limit: 3\n")
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {"stall_limit": 3}
+
+
+def test_turn_deadlines(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text("iteration_timeout: 600\nidle_timeout: 90.5\nturn_retries: 1\n")
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {"iteration_timeout": 600.0, "idle_timeout": 90.5, "turn_retries": 1}
+
+
+def test_race_backends(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text(
+        'race: gemini --experimental-acp; codex-acp --model "o 3"\nhedge_after: 20\n'
+    )
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {
+        "race": [["gemini", "--experimental-acp"], ["codex-acp", "--model", "o 3"]],
+        "hedge_after_seconds": 20.0,
+    }
+
+
+def test_attempts_and_verify(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text("attempts: 4\nverify: pytest -q && ruff check .\n")
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {"attempts": 4, "verify_command": "pytest -q && ruff check ."}
+
+
+def test_verify_stage(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text(
+        "verify_command: pytest -q\nverify_on: iteration\nverify_overlap: yes\n"
+    )
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {"verify_command": "pytest -q", "verify_on": "iteration", "verify_overlap": True}
+
+    (tmp_path / "ralph.yml").write_text("verify_on: always\n")
+    with pytest.raises(ValueError, match="verify_on"):
+        load_config_file(str(tmp_path))
@@ -1,4 +1,4 @@
-from ralph.detect import detect_promise
+from ralph.detect import PromiseMatcher, detect_promise
 
 
 def test_matches_wrapped_promise():
@@ -24,3 +24,30 @@ def test_partial_tag_returns_false():
 def test_promise_embedded_in_text():
     text = "All tasks finished.\n<promise>任務完成！🥇</promise>"
     assert detect_promise(text, "任務完成！🥇") is True
+
+
+def test_matcher_finds_tag_split_across_chunks():
+    m = PromiseMatcher("DONE")
+    assert m.feed("work <prom") is False
+    assert m.feed("ise>DO") is False
+    assert m.feed("NE</promise>") is True
+    assert m.matched is True
+
+
+def test_matcher_keeps_bounded_tail():
+    m = PromiseMatcher("DONE")
+    m.feed("x" * 10_000)
+    assert len(m._tail) == len("<promise>DONE</promise>") - 1
+
+
+def test_matcher_empty_phrase_never_matches():
+    m = PromiseMatcher("")
+    assert m.feed("<promise></promise>") is False
+
+
+def test_matcher_reset():
+    m = PromiseMatcher("DONE")
+    m.feed("<promise>DONE</promise>")
+    m.reset()
+    assert m.matched is False
+    assert m.feed("nothing") is False
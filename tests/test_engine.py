@@ -3,13 +3,21 @@
 from __future__ import annotations
 
 import asyncio
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from ralph.checkpoint import Checkpoint, config_hash, load_checkpoint, save_checkpoint
 from ralph.engine import LoopConfig, LoopResult, RalphEngine
 
 
+@pytest.fixture(autouse=True)
+def _in_tmp_dir(tmp_path, monkeypatch):
+    # The engine keeps state under <working_dir>/.ralph; keep it out of the repo.
+    monkeypatch.chdir(tmp_path)
+
+
 def _config(**overrides) -> LoopConfig:
     defaults = dict(
         prompt="test prompt",
@@ -26,23 +34,34 @@ def _config(**overrides) -> LoopConfig:
 
 
 class FakeAcpClient:
-    """Minimal mock that mimics AcpClient's async context manager + prompt."""
+    """Minimal mock that mimics AcpClient's connect/disconnect + prompt."""
 
     def __init__(self, responses: list[str] | None = None) -> None:
         self._responses = list(responses or ["no progress"])
         self._call_count = 0
-        # Stubs for event decorators
-        self.on_text = lambda fn: fn
-        self.on_tool_start = lambda fn: fn
-        self.on_tool_end = lambda fn: fn
-        self.on_permission = lambda fn: fn
-        self.on_error = lambda fn: fn
+        self.handlers: dict[str, object] = {}
+        self.cancelled = False
+        self.connected = False
+
+    def _register(self, name: str):
+        def decorator(fn):
+            self.handlers[name] = fn
+            return fn
+        return decorator
 
-    async def __aenter__(self):
-        return self
+    def __getattr__(self, name: str):
+        if name.startswith("on_"):
+            return self._register(name)
+        raise AttributeError(name)
 
-    async def __aexit__(self, *exc):
-        pass
+    async def cancel(self) -> None:
+        self.cancelled = True
+
+    async def connect(self) -> None:
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        self.connected = False
 
     async def prompt(self, text: str) -> str:
         idx = min(self._call_count, len(self._responses) - 1)
@@ -97,6 +116,56 @@ def test_timeout(mock_cls):
     assert result.state == "timeout"
 
 
+class StreamingFakeClient(FakeAcpClient):
+    """Streams chunks through the registered on_text handler, then hangs."""
+
+    def __init__(self, chunks: list[str]) -> None:
+        super().__init__()
+        self._chunks = chunks
+
+    async def prompt(self, text: str) -> str:
+        for chunk in self._chunks:
+            await self.handlers["on_text"](chunk)
+        await asyncio.sleep(30)
+        return "".join(self._chunks)
+
+
+def _engine_with(fake: FakeAcpClient, **overrides) -> RalphEngine:
+    with patch("ralph.engine.AcpClient", return_value=fake):
+        return RalphEngine(_config(**overrides))
+
+
+def test_streamed_promise_ends_turn_early():
+    fake = StreamingFakeClient(["all done <prom", "ise>DO", "NE</promise>"])
+    engine = _engine_with(fake, max_iterations=5, timeout_seconds=10)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.iterations == 1
+    assert result.duration_seconds < 5
+    assert fake.cancelled
+
+
+def test_streamed_promise_waits_for_running_tool():
+    fake = StreamingFakeClient(["<promise>DONE</promise>"])
+
+    async def prompt(text: str) -> str:
+        await fake.handlers["on_tool_start"]("t1", "Bash", {})
+        await fake.handlers["on_text"]("<promise>DONE</promise>")
+        await asyncio.sleep(0.05)
+        assert not engine._promise_idle.is_set()
+        await fake.handlers["on_tool_end"]("t1", "completed", None)
+        await asyncio.sleep(30)
+        return ""
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(fake, timeout_seconds=10)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.duration_seconds < 5
+
+
 @patch("ralph.engine.AcpClient")
 def test_first_iteration_complete(mock_cls):
     fake = FakeAcpClient(["<promise>DONE</promise>"])
@@ -110,3 +179,452 @@ def test_first_iteration_complete(mock_cls):
     assert result.state == "complete"
     assert result.iterations == 1
     assert result.duration_seconds >= 0
+
+
+class FakePool:
+    def __init__(self, client: FakeAcpClient) -> None:
+        self.client = client
+        self.released: list[bool] = []
+
+    async def acquire(self, key):
+        return self.client
+
+    async def release(self, client, reusable: bool = True) -> None:
+        self.released.append(reusable)
+
+
+def test_pool_client_is_leased_and_returned():
+    fake = FakeAcpClient(["<promise>DONE</promise>"])
+    pool = FakePool(fake)
+    engine = RalphEngine(_config(), pool=pool)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert engine.client is fake
+    assert "on_text" in fake.handlers
+    assert pool.released == [True]
+
+
+def test_pool_client_not_reused_after_timeout():
+    async def slow_prompt(text: str) -> str:
+        await asyncio.sleep(5)
+        return "never"
+
+    fake = FakeAcpClient()
+    fake.prompt = slow_prompt  # type: ignore[assignment]
+    pool = FakePool(fake)
+    engine = RalphEngine(_config(timeout_seconds=1), pool=pool)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "timeout"
+    assert pool.released == [False]
+
+
+class RecordingFakeClient(FakeAcpClient):
+    def __init__(self, responses: list[str] | None = None) -> None:
+        super().__init__(responses)
+        self.prompts: list[str] = []
+
+    async def prompt(self, text: str) -> str:
+        self.prompts.append(text)
+        return await super().prompt(text)
+
+
+@pytest.mark.parametrize("strategy", ["full", "once", "digest"])
+def test_prompt_strategy_bytes(strategy):
+    fake = RecordingFakeClient(["still working..."])
+    engine = _engine_with(
+        fake, prompt="big task " * 200, prompt_strategy=strategy, max_iterations=3,
+    )
+
+    result = asyncio.run(engine.run())
+    assert result.prompt_bytes == [len(p.encode("utf-8")) for p in fake.prompts]
+    assert "big task" in fake.prompts[0]
+    if strategy == "full":
+        assert all("big task" in p for p in fake.prompts)
+    else:
+        assert all("big task" not in p for p in fake.prompts[1:])
+        assert result.prompt_bytes[1] < result.prompt_bytes[0] // 5
+
+
+def test_trace_file_records_iterations(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    fake = FakeAcpClient(["working", "<promise>DONE</promise>"])
+
+    async def prompt(text: str) -> str:
+        await fake.handlers["on_tool_start"]("t1", "Bash", {})
+        await fake.handlers["on_text"]("chunk")
+        await fake.handlers["on_tool_end"]("t1", "completed", None)
+        return await FakeAcpClient.prompt(fake, text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(fake, trace_file=str(trace))
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    records = [json.loads(line) for line in trace.read_text().splitlines()]
+    iterations = [r for r in records if r["name"] == "ralph.iteration"]
+    assert [r["attributes"]["ralph.outcome"] for r in iterations] == ["continue", "complete"]
+    assert iterations[0]["attributes"]["ralph.tool_counts"] == {"Bash": 1}
+    assert iterations[0]["attributes"]["ralph.text_bytes"] == 5
+    assert sum(r["name"] == "ralph.tool" for r in records) == 2
+    assert records[-1]["name"] == "ralph.run"
+    assert records[-1]["attributes"]["ralph.state"] == "complete"
+
+
+def test_failed_setup_closes_what_was_started(tmp_path):
+    # The trace file cannot be opened, after the recorder and transcript started.
+    engine = _engine_with(
+        FakeAcpClient(),
+        trace_file=str(tmp_path / "missing" / "trace.jsonl"),
+        record_file=str(tmp_path / "session.jsonl"),
+    )
+
+    async def scenario():
+        with pytest.raises(FileNotFoundError):
+            await engine.run()
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(scenario()) == set()
+    assert engine._recorder is None and engine._transcript is None
+    assert engine.bus._subscriptions == []
+
+
+def test_jsonl_output(capsys):
+    fake = StreamingFakeClient(["<promise>DONE</promise>"])
+    engine = _engine_with(fake, output="jsonl")
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [e["event"] for e in events] == ["iteration_start", "text", "promise"]
+
+
+def test_checkpoint_written_until_interrupted():
+    fake = RecordingFakeClient(["working"])
+    original = fake.prompt
+
+    async def prompt(text: str) -> str:
+        if len(fake.prompts) == 2:
+            raise RuntimeError("process killed")
+        await fake.handlers["on_text"](f"output {len(fake.prompts)}")
+        return await original(text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(fake, max_iterations=5)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine.run())
+    checkpoint = load_checkpoint(".", config_hash(engine.config))
+    assert checkpoint is not None
+    assert checkpoint.iteration == 2
+    assert checkpoint.response_tail == "output 1"
+    assert checkpoint.config_hash == config_hash(engine.config)
+
+
+def test_checkpoint_cleared_when_loop_finishes():
+    fake = FakeAcpClient(["working", "<promise>DONE</promise>"])
+    engine = _engine_with(fake, max_iterations=5)
+
+    assert asyncio.run(engine.run()).state == "complete"
+    assert load_checkpoint(".", config_hash(engine.config)) is None
+
+
+def test_resume_continues_remaining_iterations():
+    config = _config(max_iterations=5, timeout_seconds=600, resume=True)
+    save_checkpoint(".", Checkpoint(
+        config_hash=config_hash(config),
+        iteration=3,
+        elapsed_seconds=100.0,
+        response_tail="last words",
+    ))
+    fake = RecordingFakeClient(["working"])
+    with patch("ralph.engine.AcpClient", return_value=fake):
+        engine = RalphEngine(config)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "max_iterations"
+    assert len(fake.prompts) == 2
+    assert "[Iteration 4/5]" in fake.prompts[0]
+    assert "stopped after iteration 3" in fake.prompts[0]
+    assert "last words" in fake.prompts[0]
+    assert "[Resumed]" not in fake.prompts[1]
+    assert result.duration_seconds >= 100.0
+
+
+def test_resume_ignores_other_tasks_checkpoint():
+    other = Checkpoint(config_hash="other", iteration=4, elapsed_seconds=0.0)
+    save_checkpoint(".", other)
+    fake = RecordingFakeClient(["<promise>DONE</promise>"])
+    with patch("ralph.engine.AcpClient", return_value=fake):
+        engine = RalphEngine(_config(max_iterations=5, resume=True))
+
+    assert asyncio.run(engine.run()).state == "complete"
+    assert "[Iteration 1/5]" in fake.prompts[0]
+    assert load_checkpoint(".", "other") == other
+
+
+def test_stall_limit_stops_idle_loop(tmp_path):
+    fake = FakeAcpClient(["thinking"])
+    engine = _engine_with(fake, max_iterations=10, stall_limit=2, output="quiet")
+
+    result = asyncio.run(engine.run())
+    assert result.state == "stalled"
+    assert result.iterations == 2
+
+
+def test_stall_counter_resets_on_file_change(tmp_path):
+    fake = RecordingFakeClient(["working"])
+    original = fake.prompt
+
+    async def prompt(text: str) -> str:
+        if len(fake.prompts) == 1:
+            (tmp_path / "progress.txt").write_text("done something")
+        return await original(text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(fake, max_iterations=10, stall_limit=2, output="quiet")
+
+    result = asyncio.run(engine.run())
+    assert result.state == "stalled"
+    assert result.iterations == 4
+
+
+def test_changed_files_listed_in_next_prompt(tmp_path):
+    fake = RecordingFakeClient(["working"])
+    original = fake.prompt
+
+    async def prompt(text: str) -> str:
+        if not fake.prompts:
+            (tmp_path / "hello.py").write_text("print('hi')\n")
+        return await original(text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(fake, max_iterations=3)
+
+    asyncio.run(engine.run())
+    assert "Files changed" not in fake.prompts[0]
+    assert "  A hello.py (+1)" in fake.prompts[1]
+    assert "Files changed" not in fake.prompts[2]
+
+
+def test_change_summary_disabled(tmp_path):
+    fake = RecordingFakeClient(["working"])
+    original = fake.prompt
+
+    async def prompt(text: str) -> str:
+        (tmp_path / f"f{len(fake.prompts)}.py").write_text("x\n")
+        return await original(text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(fake, max_iterations=2, change_summary=False)
+
+    asyncio.run(engine.run())
+    assert engine._workspace is None
+    assert all("Files changed" not in p for p in fake.prompts)
+
+
+def test_verify_rejects_promise_until_it_passes(tmp_path):
+    fake = RecordingFakeClient(["<promise>DONE</promise>"])
+    original = fake.prompt
+
+    async def prompt(text: str) -> str:
+        if len(fake.prompts) == 1:
+            (tmp_path / "ok.txt").write_text("fixed\n")
+        return await original(text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    check = "test -f ok.txt || { echo 'ok.txt is missing'; exit 1; }"
+    engine = _engine_with(fake, max_iterations=5, verify_command=check, output="quiet")
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.iterations == 2
+    assert "[Verify]" in fake.prompts[1]
+    assert "ok.txt is missing" in fake.prompts[1]
+    assert [s.outcome for s in engine.spans] == ["verify_failed", "complete"]
+
+
+def test_verify_is_cached_for_an_unchanged_tree(tmp_path):
+    runs = tmp_path.parent / f"{tmp_path.name}-runs"
+    fake = FakeAcpClient(["<promise>DONE</promise>"])
+    engine = _engine_with(
+        fake, max_iterations=3, verify_command=f"echo run >> {runs}; exit 1", output="quiet",
+    )
+
+    result = asyncio.run(engine.run())
+    assert result.state == "max_iterations"
+    assert runs.read_text() == "run\n"
+    assert [s.verify for s in engine.spans] == ["failed", "cached_failed", "cached_failed"]
+
+
+def test_verify_every_iteration(tmp_path):
+    fake = RecordingFakeClient(["working"])
+    engine = _engine_with(
+        fake, max_iterations=2, verify_command="echo broken; exit 1",
+        verify_on="iteration", output="quiet",
+    )
+
+    asyncio.run(engine.run())
+    assert "[Verify]" not in fake.prompts[0]
+    assert "after iteration 1" in fake.prompts[1]
+    assert "broken" in fake.prompts[1]
+
+
+def test_overlapped_verify_reports_on_a_later_turn(tmp_path):
+    fake = RecordingFakeClient(["working"])
+    original = fake.prompt
+
+    async def prompt(text: str) -> str:
+        (tmp_path / f"f{len(fake.prompts)}.py").write_text("x\n")
+        return await original(text)
+
+    fake.prompt = prompt  # type: ignore[assignment]
+    engine = _engine_with(
+        fake, max_iterations=4, verify_command="echo broken; exit 1",
+        verify_on="iteration", verify_overlap=True, output="quiet",
+    )
+
+    asyncio.run(engine.run())
+    # Iteration 1's tree is checked during turn 2 and reported in turn 3.
+    assert "[Verify]" not in fake.prompts[1]
+    assert "after iteration 1" in fake.prompts[2]
+    assert "after iteration 2" in fake.prompts[3]
+    # The tree changed under each run, so nothing was cached.
+    assert engine._verify_cache == {}
+    assert engine._pending_verify is None
+
+
+def test_extra_subscribers_see_loop_events():
+    fake = FakeAcpClient(["working", "<promise>DONE</promise>"])
+    engine = _engine_with(fake, output="quiet")
+    seen: list = []
+    engine.bus.subscribe(seen.append)
+
+    asyncio.run(engine.run())
+    kinds = [e.kind for e in seen]
+    assert kinds == ["iteration_start", "iteration_end", "iteration_start", "promise"]
+
+
+class HangingFakeClient(RecordingFakeClient):
+    """Hangs silently on the first *hangs* prompts, then answers."""
+
+    def __init__(self, responses: list[str], hangs: int) -> None:
+        super().__init__(responses)
+        self.hangs = hangs
+        self.cancels = 0
+
+    async def cancel(self) -> None:
+        self.cancels += 1
+
+    async def prompt(self, text: str) -> str:
+        if len(self.prompts) < self.hangs:
+            self.prompts.append(text)
+            await asyncio.sleep(30)
+        return await super().prompt(text)
+
+
+@pytest.mark.parametrize("deadline,reason", [
+    ({"idle_timeout": 0.05}, "inactivity"),
+    ({"iteration_timeout": 0.05}, "iteration"),
+])
+def test_hung_turn_is_cancelled_and_retried(monkeypatch, capsys, deadline, reason):
+    monkeypatch.setattr("ralph.engine.RETRY_BACKOFF", 0.01)
+    fake = HangingFakeClient(["<promise>DONE</promise>"], hangs=2)
+    engine = _engine_with(fake, max_iterations=3, output="jsonl", **deadline)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.iterations == 1
+    assert fake.cancels == 2
+    assert len(set(fake.prompts)) == 1 and len(fake.prompts) == 3
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    retries = [e for e in events if e["event"] == "retry"]
+    assert [(e["reason"], e["delay"]) for e in retries] == [(reason, 0.01), (reason, 0.02)]
+
+
+def test_retries_exhausted_ends_in_timeout(monkeypatch):
+    monkeypatch.setattr("ralph.engine.RETRY_BACKOFF", 0.01)
+    fake = HangingFakeClient(["<promise>DONE</promise>"], hangs=5)
+    engine = _engine_with(fake, idle_timeout=0.05, turn_retries=1, output="quiet")
+
+    result = asyncio.run(engine.run())
+    assert result.state == "timeout"
+    assert result.iterations == 1
+    assert len(fake.prompts) == 2
+
+
+def test_tool_events_keep_turn_alive():
+    class SlowToolClient(FakeAcpClient):
+        async def prompt(self, text: str) -> str:
+            for n in range(4):
+                await self.handlers["on_tool_start"](f"t{n}", "Bash", {})
+                await asyncio.sleep(0.03)
+                await self.handlers["on_tool_end"](f"t{n}", "completed", None)
+            return "<promise>DONE</promise>"
+
+    engine = _engine_with(SlowToolClient(), idle_timeout=0.05, turn_retries=0, output="quiet")
+    assert asyncio.run(engine.run()).state == "complete"
+
+
+class CrashingFakeClient(RecordingFakeClient):
+    def __init__(self, error: Exception) -> None:
+        super().__init__(["never"])
+        self.error = error
+
+    async def prompt(self, text: str) -> str:
+        self.prompts.append(text)
+        raise self.error
+
+
+def test_dead_agent_is_replaced():
+    crashed = CrashingFakeClient(ConnectionResetError("broken pipe"))
+    fresh = RecordingFakeClient(["<promise>DONE</promise>"])
+    engine = _engine_with(crashed, max_iterations=3, output="quiet")
+
+    with patch("ralph.engine.AcpClient", return_value=fresh):
+        result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.iterations == 1
+    assert result.restarts == 1
+    assert not crashed.connected and engine.client is fresh
+    # No session/load support, so the retry re-sends everything with a note.
+    assert "[Restarted]" in fresh.prompts[0]
+    assert "test prompt" in fresh.prompts[0]
+
+
+def test_restarts_are_limited():
+    engine = _engine_with(
+        CrashingFakeClient(ConnectionResetError()), max_restarts=1, output="quiet",
+    )
+    with patch(
+        "ralph.engine.AcpClient",
+        side_effect=lambda **_: CrashingFakeClient(ConnectionResetError()),
+    ):
+        with pytest.raises(ConnectionResetError):
+            asyncio.run(engine.run())
+    assert engine._restarts == 1
+
+
+def test_agent_errors_are_not_restarted():
+    engine = _engine_with(CrashingFakeClient(ValueError("bad request")), output="quiet")
+
+    with pytest.raises(ValueError):
+        asyncio.run(engine.run())
+    assert engine._restarts == 0
+
+
+def test_dead_pooled_agent_is_discarded():
+    pool = FakePool(CrashingFakeClient(ConnectionResetError()))
+    engine = RalphEngine(_config(output="quiet"), pool=pool)
+    # First lease hands out the crashing client, the restart gets a fresh one.
+    clients = iter([pool.client, FakeAcpClient(["<promise>DONE</promise>"])])
+
+    async def lease(key):
+        return next(clients)
+
+    pool.acquire = lease  # type: ignore[assignment]
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.restarts == 1
+    assert pool.released == [False, True]
@@ -0,0 +1,148 @@
+"""Tests for the event bus: fan-out, bounded queues and overflow policies."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+
+import pytest
+
+from ralph.events import (
+    EventBus,
+    IterationStartEvent,
+    PromiseEvent,
+    TextEvent,
+    ToolStartEvent,
+)
+from ralph.output import JsonlOutput
+
+
+def _collect(bus: EventBus, **kwargs) -> list:
+    seen: list = []
+    bus.subscribe(seen.append, **kwargs)
+    return seen
+
+
+def test_fans_out_in_order():
+    async def scenario():
+        bus = EventBus()
+        first, second = _collect(bus), _collect(bus)
+        bus.start()
+        for n in range(5):
+            bus.publish(TextEvent(str(n)))
+        await bus.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [e.chunk for e in first] == ["0", "1", "2", "3", "4"]
+    assert second == first
+
+
+def test_slow_subscriber_drops_oldest_without_blocking_publisher():
+    async def scenario():
+        bus = EventBus()
+        seen: list = []
+
+        async def slow(event) -> None:
+            await asyncio.sleep(0.01)
+            seen.append(event)
+
+        sub = bus.subscribe(slow, maxsize=3)
+        fast = _collect(bus)
+        bus.start()
+        for n in range(10):
+            bus.publish(IterationStartEvent(n, 10))  # never awaits
+        await bus.close()
+        return seen, fast, sub.dropped
+
+    seen, fast, dropped = asyncio.run(scenario())
+    assert [e.iteration for e in seen] == [7, 8, 9]
+    assert dropped == 7
+    assert len(fast) == 10
+
+
+def test_coalesce_merges_text_chunks():
+    async def scenario():
+        bus = EventBus()
+        seen: list = []
+        sub = bus.subscribe(seen.append, maxsize=2, overflow="coalesce")
+        bus.start()
+        bus.publish(ToolStartEvent("t1", "Bash"))
+        for chunk in ("a", "b", "c", "d"):
+            bus.publish(TextEvent(chunk))
+        bus.publish(PromiseEvent("DONE"))
+        await bus.close()
+        return seen, sub.coalesced, sub.dropped
+
+    seen, coalesced, dropped = asyncio.run(scenario())
+    assert [type(e).__name__ for e in seen] == ["TextEvent", "PromiseEvent"]
+    assert seen[0].chunk == "abcd"
+    # The tool event was the oldest when the non-text promise overflowed.
+    assert (coalesced, dropped) == (3, 1)
+
+
+def test_lossless_merges_text_but_keeps_every_other_event():
+    async def scenario():
+        bus = EventBus()
+        seen: list = []
+        sub = bus.subscribe(seen.append, maxsize=2, overflow="lossless")
+        bus.start()
+        bus.publish(ToolStartEvent("t1", "Bash"))
+        for chunk in ("a", "b", "c"):
+            bus.publish(TextEvent(chunk))
+        bus.publish(PromiseEvent("DONE"))
+        bus.publish(TextEvent("e"))
+        await bus.close()
+        return seen, sub.coalesced, sub.dropped
+
+    seen, coalesced, dropped = asyncio.run(scenario())
+    kinds = [type(e).__name__ for e in seen]
+    assert kinds == ["ToolStartEvent", "TextEvent", "PromiseEvent", "TextEvent"]
+    assert seen[1].chunk == "abc"
+    assert (coalesced, dropped) == (2, 0)
+
+
+def test_failing_subscriber_does_not_stop_delivery():
+    async def scenario():
+        bus = EventBus()
+        seen: list = []
+
+        def flaky(event) -> None:
+            if event.chunk == "bad":
+                raise RuntimeError("boom")
+            seen.append(event.chunk)
+
+        sub = bus.subscribe(flaky)
+        bus.start()
+        for chunk in ("a", "bad", "b"):
+            bus.publish(TextEvent(chunk))
+        await bus.close()
+        return seen, sub.errors
+
+    assert asyncio.run(scenario()) == (["a", "b"], 1)
+
+
+def test_output_sink_renders_bus_events():
+    out = io.StringIO()
+    sink = JsonlOutput(out, io.StringIO())
+
+    async def scenario():
+        bus = EventBus()
+        bus.subscribe(sink.handle)
+        bus.start()
+        bus.publish(IterationStartEvent(1, 2))
+        bus.publish(TextEvent("hi"))
+        await bus.close()
+        await sink.close()
+
+    asyncio.run(scenario())
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {"event": "iteration_start", "iteration": 1, "max_iterations": 2},
+        {"event": "text", "text": "hi"},
+    ]
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        EventBus().subscribe(print, overflow="block")  # type: ignore[arg-type]
@@ -0,0 +1,144 @@
+"""End-to-end engine runs against the bundled fake ACP agent (offline)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from ralph.checkpoint import config_hash, load_checkpoint, save_checkpoint
+from ralph.engine import LoopConfig, RalphEngine
+
+
+def _config(tmp_path: Path, *agent_args: str, **overrides) -> LoopConfig:
+    defaults = dict(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", *agent_args],
+        working_dir=str(tmp_path),
+        max_iterations=4,
+        timeout_seconds=60,
+        output="quiet",
+    )
+    defaults.update(overrides)
+    return LoopConfig(**defaults)
+
+
+def test_completes_on_scripted_iteration(tmp_path: Path):
+    trace = tmp_path / "trace.jsonl"
+    config = _config(
+        tmp_path, "--promise-on", "2", "--tools", "2", "--permission",
+        trace_file=str(trace),
+    )
+
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "complete"
+    assert result.iterations == 2
+
+    spans = [json.loads(line) for line in trace.read_text().splitlines()]
+    iterations = [s["attributes"] for s in spans if s["name"] == "ralph.iteration"]
+    assert [a["ralph.tool_calls"] for a in iterations] == [2, 2]
+    # allow_always on iteration 1: the agent stops asking about those tools.
+    assert [a["ralph.permissions"] for a in iterations] == [2, 0]
+    assert all(a["ralph.text_bytes"] > 0 for a in iterations)
+
+
+def test_max_iterations_without_promise(tmp_path: Path):
+    config = _config(tmp_path, "--chunks", "3", max_iterations=3)
+
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "max_iterations"
+    assert result.iterations == 3
+
+
+def test_slow_agent_times_out(tmp_path: Path):
+    config = _config(tmp_path, "--delay", "30", timeout_seconds=1)
+
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "timeout"
+
+
+def test_resume_reloads_session(tmp_path: Path):
+    agent_args = ("--load-session", "--promise-on", "3")
+    first = _config(tmp_path, *agent_args, max_iterations=2, prompt_strategy="once")
+    # Simulate an interruption: run two iterations, then restore the
+    # checkpoint the engine removed on exit.
+    engine = RalphEngine(first)
+    saved = []
+    original = engine._save_checkpoint
+
+    async def keep(iteration, start):
+        await original(iteration, start)
+        saved.append(load_checkpoint(str(tmp_path), config_hash(engine.config)))
+
+    engine._save_checkpoint = keep  # type: ignore[assignment]
+    asyncio.run(engine.run())
+    save_checkpoint(str(tmp_path), saved[-1])
+
+    resumed = _config(
+        tmp_path, *agent_args, max_iterations=4, prompt_strategy="once", resume=True,
+    )
+    engine = RalphEngine(resumed)
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.iterations == 3
+    # The reloaded session was already primed, so only a short continuation is sent.
+    assert result.prompt_bytes[0] < 500
+
+
+def test_crashed_agent_is_restarted(tmp_path: Path):
+    # Each agent process dies halfway through its second turn.
+    config = _config(tmp_path, "--crash-on", "2", "--promise-on", "3", max_iterations=3)
+
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "complete"
+    assert result.iterations == 3
+    assert result.restarts == 2
+
+
+def test_restart_reloads_session(tmp_path: Path):
+    config = _config(
+        tmp_path, "--crash-on", "2", "--load-session", "--promise-on", "2",
+        prompt_strategy="once",
+    )
+
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "complete"
+    assert result.restarts == 1
+    # The session survived, so the retried turn is a short continuation.
+    assert result.prompt_bytes[-1] < 500
+
+
+def test_concurrent_loops_keep_their_own_checkpoints(tmp_path: Path):
+    short = _config(tmp_path, "--promise-on", "1", prompt="short task")
+    long = _config(tmp_path, "--promise-on", "3", prompt="long task")
+    seen = []
+
+    async def go() -> None:
+        first, second = RalphEngine(short), RalphEngine(long)
+        first_done = asyncio.Event()
+        original = second._save_checkpoint
+
+        async def keep(iteration, start):
+            if iteration == 2:
+                # The short task has finished and cleared its own checkpoint.
+                await first_done.wait()
+                seen.append(load_checkpoint(str(tmp_path), config_hash(long)))
+            await original(iteration, start)
+
+        second._save_checkpoint = keep  # type: ignore[assignment]
+
+        async def run_first():
+            try:
+                return await first.run()
+            finally:
+                first_done.set()
+
+        results = await asyncio.gather(run_first(), second.run())
+        assert [r.state for r in results] == ["complete", "complete"]
+
+    asyncio.run(go())
+    assert seen[0] is not None and seen[0].iteration == 1
+    assert not list((tmp_path / ".ralph" / "checkpoints").iterdir())
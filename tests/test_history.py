@@ -0,0 +1,129 @@
+"""Tests for the run history store and `ralph stats`."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from ralph.cli import main
+from ralph.engine import LoopConfig, LoopResult, RalphEngine
+import ralph.history
+from ralph.history import load_stats, percentile, record_run
+from ralph.trace import IterationSpan
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) is None
+
+
+def _span(iteration: int, seconds: float, tools: int = 0) -> IterationSpan:
+    span = IterationSpan(iteration=iteration, start=0.0)
+    span.end = seconds
+    for t in range(tools):
+        span.tool_start(f"t{t}", "Edit")
+    span.finish("continue")
+    return span
+
+
+def test_stats_group_by_command_and_prompt(tmp_path: Path):
+    def run(command: str, prompt: str, state: str, iterations: int, seconds: float) -> None:
+        config = LoopConfig(prompt=prompt, working_dir=str(tmp_path))
+        spans = [_span(i, seconds / iterations, tools=1) for i in range(1, iterations + 1)]
+        record_run(config, command, LoopResult(state, iterations, seconds), spans)
+
+    for n in range(1, 5):
+        run("claude-code-acp", "Fix the tests", "complete", n, 10.0 * n)
+    run("claude-code-acp", "Write docs\nin detail", "max_iterations", 10, 100.0)
+    run("gemini --experimental-acp", "Fix the tests", "complete", 2, 5.0)
+
+    by_command = {g.key: g for g in load_stats(str(tmp_path), "command")}
+    claude = by_command["claude-code-acp"].summary()
+    assert claude["runs"] == 5
+    assert claude["success_rate"] == 0.8
+    assert claude["iterations_to_complete"] == {"p50": 2, "p90": 4, "p95": 4, "max": 4}
+    assert claude["duration_seconds"]["p95"] == 100.0
+    assert claude["tools"] == {"Edit": 20}
+
+    by_prompt = load_stats(str(tmp_path), "prompt")
+    assert [(g.label, g.runs) for g in by_prompt] == [("Fix the tests", 5), ("Write docs", 1)]
+    assert load_stats(str(tmp_path), "prompt", since=4e9) == []
+
+
+def test_stats_are_one_consistent_read(tmp_path: Path, monkeypatch):
+    def run(command: str) -> None:
+        config = LoopConfig(prompt="Fix the tests", working_dir=str(tmp_path))
+        record_run(config, command, LoopResult("complete", 1, 1.0), [_span(1, 1.0)])
+
+    run("claude-code-acp")
+    writer = threading.Thread(target=run, args=("gemini",))
+    connect = ralph.history._connect
+
+    class Db:
+        """Lets another process record a run right after the runs query."""
+
+        def __init__(self, db) -> None:
+            self._db = db
+
+        def __getattr__(self, name: str):
+            return getattr(self._db, name)
+
+        def execute(self, sql: str, *args):
+            cur = self._db.execute(sql, *args)
+            if "FROM runs r" in sql and writer.ident is None:
+                writer.start()
+                writer.join(0.3)
+            return cur
+
+    @contextlib.contextmanager
+    def intercepted(path):
+        with connect(path) as db:
+            yield Db(db)
+
+    monkeypatch.setattr(ralph.history, "_connect", intercepted)
+    assert [g.key for g in load_stats(str(tmp_path))] == ["claude-code-acp"]
+    monkeypatch.setattr(ralph.history, "_connect", connect)
+    writer.join()
+    assert {g.key for g in load_stats(str(tmp_path))} == {"claude-code-acp", "gemini"}
+
+
+def test_engine_records_each_run(tmp_path: Path):
+    config = LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", "--promise-on", "2"],
+        working_dir=str(tmp_path),
+        output="quiet",
+    )
+    asyncio.run(RalphEngine(config).run())
+    asyncio.run(RalphEngine(config).run())
+
+    [group] = load_stats(str(tmp_path))
+    assert group.runs == 2
+    assert group.iterations_to_complete == [2, 2]
+    assert len(group.turn_seconds) == 4
+
+    asyncio.run(RalphEngine(LoopConfig(**{**vars(config), "history": False})).run())
+    assert load_stats(str(tmp_path))[0].runs == 2
+
+
+def test_stats_command_output(tmp_path: Path, capsys):
+    config = LoopConfig(prompt="Ship it", working_dir=str(tmp_path))
+    record_run(config, "claude-code-acp", LoopResult("complete", 3, 42.0), [_span(1, 1.5)])
+
+    with pytest.raises(SystemExit) as exc:
+        main(["stats", "-d", str(tmp_path)])
+    assert exc.value.code == 0
+    out = capsys.readouterr().out
+    assert "By command" in out and "By prompt" in out
+    assert "runs: 1 (1 complete), success 100%" in out
+    assert "iterations to complete: p50 3" in out
@@ -0,0 +1,116 @@
+"""Tests for buffered output sinks."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+
+from ralph.output import BufferedStream, JsonlOutput, PlainOutput, QuietOutput
+
+
+class CountingStream(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s: str) -> int:
+        self.writes += 1
+        return super().write(s)
+
+
+def test_buffered_stream_coalesces_chunks():
+    stream = CountingStream()
+
+    async def scenario():
+        buf = BufferedStream(stream, interval=0.05)
+        buf.start()
+        for i in range(100):
+            buf.write(f"{i},")
+        await asyncio.sleep(0.1)
+        await buf.close()
+
+    asyncio.run(scenario())
+    assert stream.getvalue() == "".join(f"{i}," for i in range(100))
+    assert stream.writes == 1
+
+
+def test_buffered_stream_flushes_on_size():
+    stream = CountingStream()
+
+    async def scenario():
+        buf = BufferedStream(stream, max_bytes=10, interval=60)
+        buf.start()
+        buf.write("x" * 12)
+        await asyncio.sleep(0.05)
+        flushed = stream.getvalue()
+        await buf.close()
+        return flushed
+
+    assert asyncio.run(scenario()) == "x" * 12
+
+
+def test_buffered_stream_close_without_start():
+    stream = io.StringIO()
+    buf = BufferedStream(stream)
+    buf.write("held")
+    assert stream.getvalue() == ""
+    asyncio.run(buf.close())
+    assert stream.getvalue() == "held"
+
+
+def test_buffered_stream_drops_writes_past_high_water_mark():
+    stream = io.StringIO()
+    buf = BufferedStream(stream, max_pending=10)
+    for line in ("1234\n", "5678\n", "overflow\n", "x\n"):
+        buf.write(line)
+    assert buf.dropped == len("overflow\n") + len("x\n")
+    asyncio.run(buf.close())
+    assert stream.getvalue() == "1234\n5678\n"
+    # Once flushed, there is room again.
+    buf.write("more\n")
+    asyncio.run(buf.close())
+    assert stream.getvalue() == "1234\n5678\nmore\n"
+
+
+def test_plain_output_format():
+    out, err = io.StringIO(), io.StringIO()
+    sink = PlainOutput(out, err)
+    sink.iteration_start(1, 3)
+    sink.text("hi")
+    sink.tool_start("t1", "Bash")
+    sink.tool_end("t1", "completed")
+    sink.error(RuntimeError("bad"))
+    asyncio.run(sink.close())
+    assert "━━━ Iteration 1/3 ━━━" in out.getvalue()
+    assert "🛠️  Bash" in out.getvalue()
+    assert "✔️ completed" in out.getvalue()
+    assert "Error: bad" in err.getvalue()
+
+
+def test_quiet_output_only_errors():
+    out, err = io.StringIO(), io.StringIO()
+    sink = QuietOutput(out, err)
+    sink.text("hi")
+    sink.promise("DONE")
+    sink.error(RuntimeError("bad"))
+    asyncio.run(sink.close())
+    assert out.getvalue() == ""
+    assert "bad" in err.getvalue()
+
+
+def test_jsonl_output_events():
+    out = io.StringIO()
+    sink = JsonlOutput(out, io.StringIO())
+    sink.iteration_start(1, 2)
+    sink.text("héllo")
+    sink.tool_end("t1", "failed")
+    sink.promise("DONE")
+    asyncio.run(sink.close())
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert events == [
+        {"event": "iteration_start", "iteration": 1, "max_iterations": 2},
+        {"event": "text", "text": "héllo"},
+        {"event": "tool_end", "id": "t1", "status": "failed"},
+        {"event": "promise", "phrase": "DONE"},
+    ]
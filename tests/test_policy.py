@@ -0,0 +1,166 @@
+"""Tests for the permission policy."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from ralph.config import load_config_file
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.policy import PermissionPolicy, tool_name
+
+CLAUDE = [
+    {"id": "allow_always", "name": "Always Allow"},
+    {"id": "allow", "name": "Allow"},
+    {"id": "reject", "name": "Reject"},
+]
+GEMINI = [
+    {"id": "proceed_always", "name": "Allow always"},
+    {"id": "proceed_once", "name": "Allow"},
+    {"id": "cancel", "name": "Reject"},
+]
+
+
+def test_default_prefers_allow_always():
+    policy = PermissionPolicy()
+    assert policy.answer("Read", {"file_path": "a.py"}, CLAUDE) == "allow_always"
+    assert policy.answer("Read", {}, GEMINI) == "proceed_always"
+    assert policy.answer("Read", {}, [{"id": "yes", "name": "Yes"}]) == "yes"
+
+
+def test_rules_by_tool_and_argument():
+    policy = PermissionPolicy(
+        allow=["Read", "Bash(git *)"],
+        ask=["Bash(git push*)"],
+        deny=["Bash(rm *)", "Web*"],
+        default="deny",
+    )
+    assert policy.decide("Read", {"file_path": "x"}) == "allow"
+    assert policy.decide("Bash", {"command": "git status"}) == "ask"  # Bash has narrower rules
+    assert policy.decide("Bash", {"command": "git push origin"}) == "ask"
+    assert policy.decide("Bash", {"command": "rm -rf /"}) == "deny"
+    assert policy.decide("Bash", {"command": "make"}) == "deny"  # default
+    assert policy.decide("WebFetch", {"url": "https://example.com"}) == "deny"
+
+    assert policy.answer("Bash", {"command": "git status"}, CLAUDE) == "allow"
+    assert policy.answer("Bash", {"command": "rm -rf /"}, CLAUDE) == "reject"
+    assert policy.answer("WebFetch", {}, GEMINI) == "cancel"
+
+
+def test_tool_name_from_titles():
+    # Titles as claude-code-acp builds them.
+    assert tool_name("Run: git status", {"command": "git status"}) == "Bash"
+    assert tool_name("Read /src/app.py", {"file_path": "/src/app.py"}) == "Read"
+    assert tool_name("Edit /src/app.py", {"file_path": "/src/app.py", "old_string": "a"}) == "Edit"
+    assert tool_name("Find files: **/*.py", {"pattern": "**/*.py"}) == "Glob"
+    assert tool_name("Search: TODO", {"pattern": "TODO"}) == "Grep"
+    assert tool_name("WebFetch", {"url": "https://example.com"}) == "WebFetch"
+    # Prose titles fall back on the input's shape.
+    assert tool_name("List the repo", {"command": "ls"}) == "Bash"
+    assert tool_name("Update config", {"file_path": "a", "content": "x"}) == "Write"
+    assert tool_name("Fake tool 1", {"n": 1}) == "Fake tool 1"
+
+
+def _on_permission(tmp_path: Path, **rules):
+    config = LoopConfig(prompt="p", working_dir=str(tmp_path), **rules)
+    handler = RalphEngine(config).client.events.on_permission
+    return lambda title, input, options=CLAUDE: asyncio.run(handler(title, input, options))
+
+
+def test_rules_match_claude_code_acp_titles(tmp_path: Path):
+    answer = _on_permission(
+        tmp_path,
+        permission_allow=["Read", "Bash(git *)"],
+        permission_deny=["Bash(rm -rf*)"],
+        permission_default="deny",
+    )
+    assert answer("Read /src/app.py", {"file_path": "/src/app.py"}) == "allow_always"
+    assert answer("Run: git status", {"command": "git status"}) == "allow"
+    assert answer("Run: rm -rf build", {"command": "rm -rf build"}) == "reject"
+    assert answer("Write /src/app.py", {"file_path": "/src/app.py", "content": ""}) == "reject"
+
+    # The default allow no longer lets a deny rule slip past.
+    answer = _on_permission(tmp_path, permission_deny=["Bash(rm -rf*)"])
+    assert answer("Run: rm -rf /", {"command": "rm -rf /"}) == "reject"
+    assert answer("Run: make", {"command": "make"}) == "allow"  # Bash is restricted
+    assert answer("Read /a", {"file_path": "/a"}) == "allow_always"
+
+
+def test_deny_without_a_reject_option(tmp_path: Path):
+    policy = PermissionPolicy(deny=["Bash"])
+    nope = [{"id": "yes", "name": "Yes"}, {"id": "no", "name": "No thanks, reject"}]
+    assert policy.answer("Bash", {}, nope) == "no"
+    kinds = [{"id": "ok", "kind": "allow_once"}, {"id": "x", "kind": "reject_once"}]
+    assert policy.answer("Bash", {}, kinds) == "x"
+    assert policy.answer("Bash", {}, [{"id": "yes", "name": "Yes"}]) is None
+
+    answer = _on_permission(tmp_path, permission_deny=["Bash"])
+    with pytest.raises(PermissionError):
+        answer("Run: ls", {"command": "ls"}, [{"id": "yes", "name": "Yes"}])
+
+
+def test_decisions_are_memoized():
+    policy = PermissionPolicy(allow=["Read"], default="deny")
+    policy.decide("Read", {"file_path": "a"})
+    policy._rules = []  # a memoized decision never looks at the rules again
+    assert policy.decide("Read", {"file_path": "a"}) == "allow"
+    assert policy.decide("Read", {"file_path": "b"}) == "deny"
+
+
+def test_bad_rules():
+    with pytest.raises(ValueError):
+        PermissionPolicy(allow=["Bash(git *"])
+    with pytest.raises(ValueError):
+        PermissionPolicy(default="maybe")  # type: ignore[arg-type]
+
+
+def test_rules_from_ralph_yml(tmp_path: Path):
+    (tmp_path / "ralph.yml").write_text(
+        "allow: Read; Bash(git *)\n"
+        "deny: Bash(rm *)\n"
+        "permission_default: ask\n"
+    )
+    cfg = load_config_file(str(tmp_path))
+    assert cfg == {
+        "permission_allow": ["Read", "Bash(git *)"],
+        "permission_deny": ["Bash(rm *)"],
+        "permission_default": "ask",
+    }
+
+
+@pytest.mark.parametrize(
+    "rules, permissions, tool_status",
+    [
+        ({}, [2, 0, 0], "completed"),  # allow_always: asked once per tool
+        ({"permission_ask": ["Fake tool *"]}, [2, 2, 2], "completed"),
+        ({"permission_deny": ["Fake tool 1"]}, [2, 1, 1], "failed"),
+    ],
+)
+def test_fake_agent_round_trips(tmp_path: Path, rules, permissions, tool_status):
+    trace = tmp_path / "trace.jsonl"
+    config = LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=[
+            "-m", "ralph.fake_agent", "--promise", "DONE", "--promise-on", "3",
+            "--tools", "2", "--permission",
+        ],
+        working_dir=str(tmp_path),
+        output="quiet",
+        trace_file=str(trace),
+        checkpoint=False,
+        history=False,
+        **rules,
+    )
+    assert asyncio.run(RalphEngine(config).run()).state == "complete"
+
+    spans = [json.loads(line) for line in trace.read_text().splitlines()]
+    iterations = [s["attributes"] for s in spans if s["name"] == "ralph.iteration"]
+    assert [a["ralph.permissions"] for a in iterations] == permissions
+    tools = [s["attributes"] for s in spans if s["name"] == "ralph.tool"]
+    assert tools[-1]["ralph.tool.status"] == tool_status
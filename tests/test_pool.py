@@ -0,0 +1,166 @@
+"""Tests for the warm agent pool."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from ralph.pool import AgentPool, pool_key
+
+
+class FakeClient:
+    def __init__(self, command: str, args=None, cwd: str = ".") -> None:
+        self.command = command
+        self.events = None
+        self._process = None
+        self._connection = None
+        self.sessions = 0
+        self.disconnected = False
+
+    async def connect(self) -> None:
+        self._process = SimpleNamespace(returncode=None)
+        self._connection = object()
+
+    async def disconnect(self) -> None:
+        self.disconnected = True
+        self._process = None
+        self._connection = None
+
+    async def new_session(self) -> str:
+        self.sessions += 1
+        return f"s{self.sessions}"
+
+
+KEY = pool_key("agent", ["--acp"], "/repo")
+
+
+def _run(coro):
+    with patch("ralph.pool.AcpClient", FakeClient):
+        return asyncio.run(coro)
+
+
+def test_prewarm_then_hit():
+    async def scenario():
+        pool = AgentPool()
+        await pool.prewarm(KEY, 2)
+        a = await pool.acquire(KEY)
+        b = await pool.acquire(KEY)
+        c = await pool.acquire(KEY)
+        return pool, a, b, c
+
+    pool, a, b, c = _run(scenario())
+    assert pool.stats.hits == 2
+    assert pool.stats.misses == 1
+    assert pool.stats.spawned == 3
+    assert a.sessions == 1 and c.sessions == 0
+
+
+def test_release_reuses_client():
+    async def scenario():
+        pool = AgentPool()
+        first = await pool.acquire(KEY)
+        await pool.release(first)
+        second = await pool.acquire(KEY)
+        return pool, first, second
+
+    pool, first, second = _run(scenario())
+    assert first is second
+    assert pool.stats.hits == 1
+
+
+def test_recycle_after_max_uses():
+    async def scenario():
+        pool = AgentPool(max_uses=1)
+        client = await pool.acquire(KEY)
+        await pool.release(client)
+        return pool, client
+
+    pool, client = _run(scenario())
+    assert client.disconnected
+    assert pool.stats.recycled == 1
+
+
+def test_dead_process_is_replaced():
+    async def scenario():
+        pool = AgentPool()
+        client = await pool.acquire(KEY)
+        await pool.release(client)
+        client._process.returncode = -9
+        replacement = await pool.acquire(KEY)
+        return pool, client, replacement
+
+    pool, client, replacement = _run(scenario())
+    assert replacement is not client
+    assert pool.stats.unhealthy == 1
+    assert pool.stats.misses == 2
+
+
+def test_idle_clients_expire():
+    async def scenario():
+        pool = AgentPool(idle_seconds=0)
+        client = await pool.acquire(KEY)
+        await pool.release(client)
+        await pool.acquire(KEY)
+        return pool, client
+
+    pool, client = _run(scenario())
+    assert client.disconnected
+    assert pool.stats.misses == 2
+
+
+def test_unreusable_release_and_close():
+    async def scenario():
+        pool = AgentPool()
+        await pool.prewarm(KEY, 1)
+        dirty = await pool.acquire(KEY)
+        await pool.release(dirty, reusable=False)
+        await pool.prewarm(KEY, 1)
+        await pool.close()
+        return pool, dirty
+
+    pool, dirty = _run(scenario())
+    assert dirty.disconnected
+    assert pool.stats.recycled == 2
+
+
+def test_release_of_unleased_client_stops_it():
+    async def scenario():
+        pool = AgentPool()
+        client = await pool.acquire(KEY)
+        await pool.release(client, reusable=False)
+        # A restart whose acquire failed releases the dead client again.
+        client.disconnected = False
+        await pool.release(client)
+        stranger = FakeClient("agent")
+        await stranger.connect()
+        await pool.release(stranger)
+        return pool, client, stranger
+
+    pool, client, stranger = _run(scenario())
+    assert client.disconnected and stranger.disconnected
+    assert pool._idle[KEY] == []
+    assert pool.stats.recycled == 3
+
+
+def test_reaper_recycles_idle_clients_without_acquires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ralph.pool.time", SimpleNamespace(monotonic=lambda: now[0]))
+
+    async def scenario():
+        pool = AgentPool(idle_seconds=60, reap_interval=0.01)
+        pool.start()
+        await pool.prewarm(KEY, 2)
+        clients = [e.client for e in pool._idle[KEY]]
+        await asyncio.sleep(0.05)
+        kept = [c.disconnected for c in clients]
+        now[0] += 61  # nothing acquires; only the reaper can notice
+        await asyncio.sleep(0.05)
+        reaped = [c.disconnected for c in clients], list(pool._idle[KEY])
+        await pool.close()
+        return pool, kept, reaped
+
+    pool, kept, (disconnected, idle) = _run(scenario())
+    assert kept == [False, False]
+    assert disconnected == [True, True] and idle == []
+    assert pool.stats.recycled == 2 and pool._reaper is None
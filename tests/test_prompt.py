@@ -0,0 +1,77 @@
+"""Tests for iteration prompt building."""
+
+from ralph.prompt import (
+    build_changes_note,
+    build_iteration_prompt,
+    build_system_prompt,
+    build_verify_note,
+    task_digest,
+)
+from ralph.verify import VerifyResult
+from ralph.workspace import WorkspaceChanges
+
+
+def test_system_prompt_substitutes_promise():
+    assert "<promise>DONE</promise>" in build_system_prompt("DONE")
+
+
+def test_full_strategy_always_sends_everything():
+    p = build_iteration_prompt("SYS", "TASK", "DONE", 2, 5, "full", primed=True)
+    assert p.startswith("SYS")
+    assert "[Iteration 2/5]" in p
+    assert p.endswith("TASK")
+
+
+def test_once_strategy_sends_continuation_after_priming():
+    first = build_iteration_prompt("SYS", "TASK", "DONE", 1, 5, "once", primed=False)
+    later = build_iteration_prompt("SYS", "TASK", "DONE", 2, 5, "once", primed=True)
+    assert "SYS" in first and "TASK" in first
+    assert "SYS" not in later and "TASK" not in later
+    assert "[Iteration 2/5]" in later
+    assert "<promise>DONE</promise>" in later
+
+
+def test_digest_strategy_carries_task_hash():
+    later = build_iteration_prompt("SYS", "TASK", "DONE", 3, 5, "digest", primed=True)
+    assert task_digest("TASK") in later
+    assert "TASK" not in later.replace(task_digest("TASK"), "")
+
+
+def test_task_digest_is_stable_and_short():
+    assert task_digest("abc") == task_digest("abc")
+    assert task_digest("abc") != task_digest("abd")
+    assert len(task_digest("abc")) == 16
+
+
+def test_changes_note_lists_files_with_line_deltas():
+    changes = WorkspaceChanges(
+        added=["new.py"], modified=["app.py", "logo.png"], deleted=["old.py"],
+        line_deltas={"new.py": 12, "app.py": -3, "old.py": -40},
+    )
+    note = build_changes_note(changes)
+    assert note.splitlines()[1:] == [
+        "  A new.py (+12)",
+        "  M app.py (-3)",
+        "  M logo.png",
+        "  D old.py (-40)",
+    ]
+
+
+def test_changes_note_is_capped():
+    changes = WorkspaceChanges(added=[f"src/file_{n:04d}.py" for n in range(1000)])
+    note = build_changes_note(changes, max_chars=300)
+    assert len(note) <= 300 + len("  ... and 1000 more")
+    assert note.endswith("more")
+    assert "file_0000.py" in note
+
+
+def test_verify_note_keeps_output_tail():
+    result = VerifyResult(False, 1, "noise\n" * 1000 + "1 failed\n", 2.0)
+    note = build_verify_note("pytest -q", result, 3, max_chars=100)
+    assert "`pytest -q` exited with code 1" in note
+    assert "after iteration 3" in note
+    assert note.rstrip("`\n").endswith("1 failed")
+    assert note.count("noise") < 20
+
+    timed_out = VerifyResult(False, None, "", 9.0)
+    assert "timed out" in build_verify_note("make test", timed_out, 1)
@@ -0,0 +1,128 @@
+"""Race mode end-to-end against the bundled fake ACP agent."""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from ralph.checkpoint import config_hash, load_checkpoint, save_checkpoint
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.race import run_race
+
+AGENT = [sys.executable, "-m", "ralph.fake_agent", "--promise", "DONE"]
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run([*git, "init", "-q"], check=True)
+    (tmp_path / "README").write_text("hi\n")
+    subprocess.run([*git, "add", "-A"], check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "init"], check=True)
+    return tmp_path
+
+
+def _config(repo: Path, primary: list[str], *race: list[str], **overrides) -> LoopConfig:
+    command, *args = [*AGENT, *primary]
+    defaults = dict(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=command,
+        command_args=args,
+        race=[[*AGENT, *r] for r in race],
+        working_dir=str(repo),
+        max_iterations=3,
+        timeout_seconds=60,
+        output="quiet",
+        change_summary=False,
+    )
+    defaults.update(overrides)
+    return LoopConfig(**defaults)
+
+
+def test_fast_backend_wins_and_keeps_running(repo: Path):
+    config = _config(
+        repo,
+        ["--delay", "30"],
+        ["--write", "out.txt", "--promise-on", "2"],
+    )
+    engine = RalphEngine(config)
+
+    result = asyncio.run(engine.run())
+    assert result.state == "complete"
+    assert result.iterations == 2
+    # Iteration 1 ran in the winner's worktree and was merged back.
+    assert (repo / "out.txt").read_text() == "iteration 1\niteration 2\n"
+    assert "--write" in engine._backend
+    assert not list((repo / ".ralph" / "worktrees").iterdir())
+
+
+def _backends(config: LoopConfig) -> list[list[str]]:
+    return [[config.command, *config.command_args], *config.race]
+
+
+def test_progress_beats_an_idle_finisher(repo: Path):
+    config = _config(repo, [], ["--delay", "0.5", "--write", "b.txt"])
+
+    race = asyncio.run(run_race(config, _backends(config), 0, 60))
+    assert race.winner is race.entrants[1]
+
+
+def test_no_progress_falls_back_to_first_finisher(repo: Path):
+    config = _config(repo, [], ["--delay", "0.5"])
+
+    race = asyncio.run(run_race(config, _backends(config), 0, 60))
+    assert race.winner is race.entrants[0]
+    assert race.winner.patch == b""
+    assert race.winner.promised is False
+
+
+def test_concurrent_races_in_one_checkout(repo: Path):
+    config = _config(repo, ["--delay", "0.3"], ["--delay", "0.3", "--write", "b.txt"])
+
+    async def both():
+        return await asyncio.gather(*(run_race(config, _backends(config), 0, 60) for _ in range(2)))
+
+    for race in asyncio.run(both()):
+        assert race.winner is race.entrants[1]
+        assert all(e.error is None for e in race.entrants)
+    assert not list((repo / ".ralph" / "worktrees").iterdir())
+
+
+def test_hedge_waits_for_slow_primary(repo: Path):
+    fast = _config(repo, ["--write", "a.txt"], ["--write", "b.txt"])
+    race = asyncio.run(run_race(fast, _backends(fast), 5, 60))
+    assert len(race.entrants) == 1
+
+    slow = _config(repo, ["--delay", "30"], ["--write", "b.txt"])
+    race = asyncio.run(run_race(slow, _backends(slow), 0.2, 60))
+    assert len(race.entrants) == 2
+    assert race.winner is race.entrants[1]
+    assert b"b.txt" in race.winner.patch
+
+
+def test_resume_keeps_the_winning_backend(repo: Path):
+    config = _config(repo, ["--delay", "30"], ["--write", "out.txt"], max_iterations=1)
+    engine = RalphEngine(config)
+    saved = []
+    original = engine._save_checkpoint
+
+    async def keep(iteration, start):
+        await original(iteration, start)
+        saved.append(load_checkpoint(str(repo), config_hash(engine.config)))
+
+    engine._save_checkpoint = keep  # type: ignore[assignment]
+    asyncio.run(engine.run())
+    assert saved[-1].backend == config.race[0]
+
+    save_checkpoint(str(repo), saved[-1])
+    resumed = RalphEngine(_config(
+        repo, ["--delay", "30"], ["--write", "out.txt"], max_iterations=2, resume=True,
+    ))
+    result = asyncio.run(resumed.run())
+    assert result.state == "max_iterations"
+    assert (repo / "out.txt").read_text() == "iteration 1\niteration 2\n"
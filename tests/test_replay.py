@@ -0,0 +1,155 @@
+"""Tests for session recording and offline replay."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.replay import RecordingReader, ReplayClient, ReplayError
+
+
+def _config(tmp_path: Path, **overrides) -> LoopConfig:
+    defaults = dict(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=[
+            "-m", "ralph.fake_agent", "--promise", "DONE", "--promise-on", "3",
+            "--tools", "2", "--permission",
+        ],
+        working_dir=str(tmp_path),
+        max_iterations=5,
+        output="jsonl",
+        checkpoint=False,
+        history=False,
+    )
+    defaults.update(overrides)
+    return LoopConfig(**defaults)
+
+
+def _events(capsys) -> list[dict]:
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return [e for e in events if e["event"] != "result"]
+
+
+def test_replay_reproduces_recorded_run(tmp_path: Path, capsys):
+    recording = tmp_path / "session.jsonl.gz"
+    recorded = asyncio.run(RalphEngine(_config(tmp_path, record_file=str(recording))).run())
+    live = _events(capsys)
+
+    with gzip.open(recording, "rt") as f:
+        entries = [json.loads(line) for line in f]
+    assert entries[0]["ralph_recording"] == 1
+    types = [e["type"] for e in entries[1:]]
+    assert types.count("prompt") == 3
+    assert types.count("permission") == 2  # then allow_always
+    assert {"text", "tool_start", "tool_end", "response"} <= set(types)
+    assert [e["t"] for e in entries[1:]] == sorted(e["t"] for e in entries[1:])
+
+    # No agent on the other end: the command doesn't even exist.
+    config = _config(tmp_path, command="no-such-agent", command_args=[], replay_file=str(recording))
+    replayed = asyncio.run(RalphEngine(config).run())
+    assert (replayed.state, replayed.iterations) == (recorded.state, recorded.iterations) == ("complete", 3)
+    assert _events(capsys) == live
+
+
+def _write(path: Path, entries: list[tuple[float, str, dict]]) -> None:
+    with gzip.open(path, "wt") as f:
+        f.write(json.dumps({"ralph_recording": 1, "command": ["agent"], "cwd": "."}) + "\n")
+        for t, type, fields in entries:
+            f.write(json.dumps({"t": t, "type": type, **fields}) + "\n")
+
+
+def test_replay_speed_paces_by_timestamps(tmp_path: Path):
+    path = tmp_path / "slow.jsonl.gz"
+    _write(path, [
+        (0.0, "prompt", {"text": "go"}),
+        (0.2, "text", {"text": "a"}),
+        (0.4, "text", {"text": "b"}),
+        (0.4, "response", {"text": "ab"}),
+    ])
+
+    async def replay(speed: float) -> tuple[str, list[str], float]:
+        client = ReplayClient(RecordingReader(str(path)), speed=speed)
+        seen: list[str] = []
+
+        @client.on_text
+        async def on_text(text: str) -> None:
+            seen.append(text)
+
+        t0 = time.monotonic()
+        response = await client.prompt("go")
+        client.reader.close()
+        return response, seen, time.monotonic() - t0
+
+    response, seen, fast = asyncio.run(replay(0))
+    assert (response, seen) == ("ab", ["a", "b"])
+    assert fast < 0.1
+    assert asyncio.run(replay(2.0))[2] >= 0.18
+
+
+def _recorded_turn_ends(path: Path) -> list[dict]:
+    with gzip.open(path, "rt") as f:
+        entries = [json.loads(line) for line in f][1:]
+    return [e for e in entries if e["type"] in ("response", "error", "cancel")]
+
+
+@pytest.mark.parametrize("limits", [
+    {"timeout_seconds": 1},
+    {"idle_timeout": 0.5, "turn_retries": 0},
+    {"iteration_timeout": 0.5, "turn_retries": 0},
+])
+def test_cancelled_turns_replay_without_waiting(tmp_path: Path, limits: dict):
+    recording = tmp_path / "cut.jsonl.gz"
+    agent = ["-m", "ralph.fake_agent", "--delay", "30"]
+    config = _config(tmp_path, command_args=agent, output="quiet", record_file=str(recording), **limits)
+    recorded = asyncio.run(RalphEngine(config).run())
+    assert recorded.state == "timeout"
+    reason = _recorded_turn_ends(recording)[-1]
+    assert reason["type"] == "cancel"
+    assert reason["reason"] in ("timeout", "inactivity", "iteration")
+
+    # The replay's own limits are off; the recorded cancel still ends the turn.
+    config = _config(
+        tmp_path, command="no-such-agent", command_args=[], output="quiet",
+        replay_file=str(recording), turn_retries=0,
+    )
+    started = time.monotonic()
+    replayed = asyncio.run(RalphEngine(config).run())
+    assert time.monotonic() - started < 2
+    assert (replayed.state, replayed.iterations) == (recorded.state, recorded.iterations)
+
+
+def test_promise_cancel_replays_as_complete(tmp_path: Path):
+    path = tmp_path / "promise.jsonl.gz"
+    _write(path, [
+        (0.0, "prompt", {"text": "go"}),
+        (0.1, "text", {"text": "<promise>DONE</promise>"}),
+        (0.1, "cancel", {"reason": "promise"}),
+    ])
+    config = _config(tmp_path, output="quiet", replay_file=str(path))
+    result = asyncio.run(RalphEngine(config).run())
+    assert (result.state, result.iterations) == ("complete", 1)
+
+
+def test_replay_runs_out_of_turns(tmp_path: Path):
+    path = tmp_path / "short.jsonl.gz"
+    _write(path, [(0.0, "prompt", {"text": "go"}), (0.1, "response", {"text": "nope"})])
+
+    config = _config(tmp_path, output="quiet", replay_file=str(path))
+    with pytest.raises(ReplayError, match="no more turns"):
+        asyncio.run(RalphEngine(config).run())
+
+
+def test_not_a_recording(tmp_path: Path):
+    path = tmp_path / "plain.txt"
+    path.write_text("hello\n")
+    with pytest.raises(ReplayError, match="not a ralph recording"):
+        RecordingReader(str(path)).next()
@@ -0,0 +1,97 @@
+"""Tests for the /proc resource sampler and the agent resource limits."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from ralph import resources
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.resources import ResourceMonitor, ResourceSample, process_tree, sample_tree
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+
+
+@pytest.fixture
+def child():
+    proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def test_samples_the_whole_tree(child):
+    assert child.pid in process_tree(os.getpid())
+    sample = sample_tree(os.getpid())
+    assert sample is not None
+    assert sample.processes >= 2
+    assert sample.rss_bytes > 10 * 1024 * 1024
+    assert sample.cpu_seconds > 0
+
+
+def test_falls_back_to_scanning_proc(child, monkeypatch):
+    monkeypatch.setattr(resources, "_children", lambda pid: None)
+    assert child.pid in process_tree(os.getpid())
+
+
+def test_monitor_tracks_iterations_and_trips_limits():
+    monitor = ResourceMonitor(lambda: None, max_rss_mb=500, max_cpu_seconds=10)
+    mb = 1024 * 1024
+    monitor.observe(1, ResourceSample(100 * mb, 50.0, 2))  # first sight: baseline
+    monitor.observe(1, ResourceSample(300 * mb, 54.0, 5))
+    assert (monitor.peak_rss_mb, monitor.iteration_cpu_seconds, monitor.max_processes) == (300, 4, 5)
+
+    monitor.begin_iteration()
+    monitor.observe(2, ResourceSample(50 * mb, 1.0, 1))  # restarted agent
+    monitor.observe(2, ResourceSample(60 * mb, 4.0, 1))
+    assert monitor.iteration_cpu_seconds == 3
+    assert monitor.cpu_seconds == 7
+    assert not monitor.exceeded.is_set()
+
+    monitor.observe(2, ResourceSample(600 * mb, 5.0, 1))
+    assert monitor.exceeded.is_set()
+    assert "max_rss_mb" in monitor.reason
+
+    cpu = ResourceMonitor(lambda: None, max_cpu_seconds=2)
+    cpu.observe(1, ResourceSample(mb, 0.0, 1))
+    cpu.observe(1, ResourceSample(mb, 2.5, 1))
+    assert "max_cpu_seconds" in cpu.reason
+
+
+def _config(tmp_path: Path, *agent_args: str, **overrides) -> LoopConfig:
+    return LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", *agent_args],
+        working_dir=str(tmp_path),
+        max_iterations=3,
+        output="quiet",
+        checkpoint=False,
+        history=False,
+        resource_interval=0.02,
+        **overrides,
+    )
+
+
+def test_result_records_usage_per_iteration(tmp_path: Path):
+    config = _config(tmp_path, "--promise-on", "2", "--chunks", "10", "--rate", "100")
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "complete"
+    assert [r.iteration for r in result.resources] == [1, 2]
+    assert all(r.processes >= 1 and r.peak_rss_mb > 1 for r in result.resources)
+
+
+def test_runaway_agent_ends_the_run(tmp_path: Path):
+    # Any Python process is well past 1 MB; the turn itself would take 30s.
+    config = _config(tmp_path, "--delay", "30", max_rss_mb=1)
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "resource_limit"
+    assert result.iterations == 1
+    assert result.duration_seconds < 10
+    assert "max_rss_mb" in result.error
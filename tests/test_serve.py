@@ -0,0 +1,221 @@
+"""``ralph serve`` end-to-end over a Unix socket against the bundled fake agent."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from ralph import serve as serve_module
+from ralph.serve import RalphServer, job_config, serve
+
+
+def _job(tmp_path: Path, *agent_args: str, **overrides) -> dict:
+    body = {
+        "prompt": "test prompt",
+        "promise": "DONE",
+        "command": sys.executable,
+        "command_args": ["-m", "ralph.fake_agent", "--promise", "DONE", *agent_args],
+        "working_dir": str(tmp_path),
+        "max_iterations": 4,
+        "timeout": 60,
+        "checkpoint": False,
+    }
+    body.update(overrides)
+    return body
+
+
+async def _request(
+    sock: str, method: str, path: str, body: dict | None = None, headers: str | None = None,
+):
+    reader, writer = await asyncio.open_unix_connection(sock)
+    data = json.dumps(body).encode() if body is not None else b""
+    if headers is None:
+        headers = f"Content-Length: {len(data)}\r\n"
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: ralph\r\n{headers}\r\n".encode() + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    if b"x-ndjson" in head:
+        return status, [json.loads(line) for line in payload.splitlines()]
+    return status, json.loads(payload)
+
+
+def _serving(tmp_path: Path, scenario, concurrency: int = 2, token: str | None = None):
+    sock = str(tmp_path / "s.sock")
+
+    async def main():
+        server = RalphServer(concurrency, token=token)
+        ready = asyncio.Event()
+        task = asyncio.ensure_future(serve(server, sock, ready=ready))
+        await ready.wait()
+        try:
+            return await scenario(server, sock)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def test_job_config_accepts_yaml_keys_and_field_names():
+    config = job_config(
+        {"prompt": "p", "timeout": "90", "max_iterations": 3, "name": "x"},
+        base={"command": "gemini"},
+    )
+    assert (config.command, config.timeout_seconds, config.max_iterations) == ("gemini", 90, 3)
+
+    with pytest.raises(ValueError, match="no prompt"):
+        job_config({"timeout": 5})
+
+
+def test_job_config_coerces_field_names_like_yaml_keys():
+    config = job_config({
+        "prompt": "p",
+        "command_args": "--experimental-acp --x",
+        "max_iterations": "5",
+        "race": "gemini --acp",
+        "timeout_seconds": "60",
+        "checkpoint": "false",
+    })
+    assert config.command_args == ["--experimental-acp", "--x"]
+    assert config.max_iterations == 5 and config.timeout_seconds == 60
+    assert config.race == [["gemini", "--acp"]]
+    assert config.checkpoint is False
+
+    with pytest.raises(ValueError, match="output must be one of"):
+        job_config({"prompt": "p", "output": "loud"})
+
+
+def test_job_streams_events_and_reports_status(tmp_path: Path):
+    async def scenario(server, sock):
+        status, job = await _request(sock, "POST", "/jobs", _job(tmp_path, "--promise-on", "2"))
+        assert status == 201 and job["status"] == "queued"
+
+        status, events = await _request(sock, "GET", f"/jobs/{job['id']}/events")
+        assert status == 200
+        kinds = [e["event"] for e in events]
+        assert kinds[:2] == ["status", "status"]
+        assert "iteration_start" in kinds and "promise" in kinds
+        assert events[-1]["event"] == "result" and events[-1]["state"] == "complete"
+
+        _, info = await _request(sock, "GET", f"/jobs/{job['id']}")
+        assert info["status"] == "complete" and info["iterations"] == 2
+
+        # A second job with the same agent command reuses the warm process.
+        _, again = await _request(sock, "POST", "/jobs", _job(tmp_path, "--promise-on", "2"))
+        await _request(sock, "GET", f"/jobs/{again['id']}/events")
+        assert server.pool.stats.hits == 1
+
+        _, listing = await _request(sock, "GET", "/jobs")
+        return [j["status"] for j in listing["jobs"]]
+
+    assert _serving(tmp_path, scenario) == ["complete", "complete"]
+
+
+def test_string_typed_fields_are_coerced(tmp_path: Path):
+    async def scenario(server, sock):
+        body = _job(
+            tmp_path,
+            command_args="-m ralph.fake_agent --promise DONE --promise-on 2",
+            max_iterations="3",
+            timeout_seconds="60",
+        )
+        status, job = await _request(sock, "POST", "/jobs", body)
+        assert status == 201
+        _, events = await _request(sock, "GET", f"/jobs/{job['id']}/events")
+        assert events[-1]["state"] == "complete" and events[-1]["iterations"] == 2
+
+        bad = _job(tmp_path, max_iterations="five")
+        assert (await _request(sock, "POST", "/jobs", bad))[0] == 400
+
+    _serving(tmp_path, scenario)
+
+
+def test_cancel_queued_and_running_jobs(tmp_path: Path):
+    async def scenario(server, sock):
+        slow = _job(tmp_path, "--delay", "30")
+        _, running = await _request(sock, "POST", "/jobs", slow)
+        _, queued = await _request(sock, "POST", "/jobs", slow)
+        while server.jobs[running["id"]].status != "running":
+            await asyncio.sleep(0.01)
+
+        status, info = await _request(sock, "POST", f"/jobs/{queued['id']}/cancel")
+        assert status == 202 and info["status"] == "cancelled"
+
+        await _request(sock, "POST", f"/jobs/{running['id']}/cancel")
+        _, events = await _request(sock, "GET", f"/jobs/{running['id']}/events")
+        assert events[-1]["state"] == "cancelled"
+
+    _serving(tmp_path, scenario, concurrency=1)
+
+
+def test_bad_requests(tmp_path: Path):
+    async def scenario(server, sock):
+        assert (await _request(sock, "GET", "/jobs/nope"))[0] == 404
+        assert (await _request(sock, "POST", "/jobs", {"timeout": 5}))[0] == 400
+        assert (await _request(sock, "POST", "/jobs", ["x"]))[0] == 400
+        assert (await _request(sock, "DELETE", "/jobs"))[0] == 404
+        for length in ("abc", "-5", ""):
+            headers = f"Content-Length: {length}\r\n"
+            assert (await _request(sock, "POST", "/jobs", headers=headers))[0] == 400
+
+    _serving(tmp_path, scenario)
+
+
+def test_token_is_required_when_set(tmp_path: Path):
+    async def scenario(server, sock):
+        assert (await _request(sock, "GET", "/jobs"))[0] == 401
+        wrong = "Authorization: Bearer nope\r\n"
+        assert (await _request(sock, "GET", "/jobs", headers=wrong))[0] == 401
+        right = "Authorization: Bearer s3cret\r\n"
+        assert await _request(sock, "GET", "/jobs", headers=right) == (200, {"jobs": []})
+
+    _serving(tmp_path, scenario, token="s3cret")
+
+
+def test_refuses_non_loopback_host_without_token():
+    with pytest.raises(ValueError, match="non-loopback"):
+        asyncio.run(serve(RalphServer(), host="0.0.0.0", port=0))
+    assert serve_module.is_loopback("127.0.0.1") and serve_module.is_loopback("::1")
+    assert serve_module.is_loopback("localhost")
+    assert not serve_module.is_loopback("example.com")
+
+
+def test_finished_jobs_are_forgotten(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(serve_module, "MAX_FINISHED_JOBS", 2)
+
+    async def main():
+        server = RalphServer()
+        jobs = [server.submit(_job(tmp_path)) for _ in range(4)]
+        for job in jobs[:3]:
+            server.cancel(job)
+        return server, jobs
+
+    server, jobs = asyncio.run(main())
+    assert list(server.jobs) == [jobs[1].id, jobs[2].id, jobs[3].id]  # the queued one stays
+
+
+def test_attempts_stream_events_through_the_pool(tmp_path: Path):
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run([*git, "init", "-q"], check=True)
+    (tmp_path / "README").write_text("hi\n")
+    subprocess.run([*git, "add", "-A"], check=True)
+    subprocess.run([*git, "commit", "-q", "-m", "init"], check=True)
+
+    async def scenario(server, sock):
+        body = _job(tmp_path, "--promise-on", "1", attempts=2)
+        _, job = await _request(sock, "POST", "/jobs", body)
+        _, events = await _request(sock, "GET", f"/jobs/{job['id']}/events")
+        assert events[-1]["state"] == "complete"
+        starts = [e for e in events if e["event"] == "iteration_start"]
+        assert {e["attempt"] for e in starts} <= {1, 2} and starts
+        assert server.pool.stats.spawned >= 1
+
+    _serving(tmp_path, scenario)
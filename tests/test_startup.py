@@ -0,0 +1,58 @@
+"""Startup-time regression tests based on ``python -X importtime``."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Cumulative import time allowed for the ralph package on --help / --dry-run.
+STARTUP_BUDGET_US = 100_000
+
+# Modules that must only be imported once a loop actually runs.
+_HEAVY = ("asyncio", "claude_code_acp", "acp", "ralph.engine")
+
+
+def _importtime(tmp_path: Path, *args: str) -> tuple[set[str], int]:
+    """Run the CLI; return imported module names and ralph's cumulative µs."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "ralph", *args],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    modules: set[str] = set()
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        modules.add(name.strip())
+        # Nested imports are indented; count each top-level ralph import once.
+        if not name[1:].startswith(" ") and name.strip().split(".")[0] == "ralph":
+            total += int(cumulative)
+    return modules, total
+
+
+@pytest.mark.parametrize("args", [("--help",), ("task", "--dry-run"), ("--max-iterations",)])
+def test_cli_paths_skip_agent_stack(tmp_path: Path, args):
+    modules, _ = _importtime(tmp_path, *args)
+    assert "ralph.cli" in modules
+    for heavy in _HEAVY:
+        assert heavy not in modules, f"{heavy} imported on {' '.join(args)}"
+
+
+def test_dry_run_import_budget(tmp_path: Path):
+    # Take the best of a few runs to smooth out noisy CI machines.
+    best = min(_importtime(tmp_path, "task", "--dry-run")[1] for _ in range(3))
+    assert best < STARTUP_BUDGET_US, f"ralph imports took {best / 1000:.1f}ms"
+
+
+def test_lazy_engine_export():
+    import ralph
+
+    assert ralph.RalphEngine.__name__ == "RalphEngine"
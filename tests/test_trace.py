@@ -0,0 +1,65 @@
+"""Tests for iteration spans and the JSONL trace writer."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+from ralph.trace import IterationSpan, Tracer
+
+
+def test_span_pairs_tools_by_id():
+    span = IterationSpan(iteration=1)
+    span.tool_start("a", "Read")
+    span.tool_start("b", "Bash")
+    span.tool_end("a", "in_progress")
+    assert span.tools["a"].end is None
+    span.tool_end("a", "completed")
+    span.tool_end("b", "failed")
+    span.tool_end("zzz", "completed")
+    assert span.tools["a"].status == "completed"
+    assert span.tools["b"].status == "failed"
+    assert span.tool_counts() == {"Read": 1, "Bash": 1}
+
+
+def test_span_text_and_ttft():
+    span = IterationSpan(iteration=1)
+    assert span.ttft_seconds is None
+    span.text("héllo")
+    span.text("!")
+    assert span.text_bytes == 7
+    assert span.ttft_seconds is not None and span.ttft_seconds >= 0
+
+
+def test_tracer_writes_iteration_and_tool_spans(tmp_path: Path):
+    path = tmp_path / "trace.jsonl"
+
+    async def scenario():
+        tracer = Tracer(str(path))
+        await tracer.start()
+        span = IterationSpan(iteration=2, prompt_bytes=100)
+        span.tool_start("t1", "Edit")
+        span.tool_end("t1", "completed")
+        span.permission(0.001)
+        span.error("boom")
+        span.finish("continue")
+        tracer.iteration(span)
+        tracer.run(span.start, {"ralph.state": "complete"})
+        await tracer.close()
+        return tracer
+
+    tracer = asyncio.run(scenario())
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["ralph.iteration", "ralph.tool", "ralph.run"]
+    iteration, tool, run = records
+    assert {r["trace_id"] for r in records} == {tracer.trace_id}
+    assert iteration["parent_span_id"] == run["span_id"]
+    assert tool["parent_span_id"] == iteration["span_id"]
+    attrs = iteration["attributes"]
+    assert attrs["ralph.prompt_bytes"] == 100
+    assert attrs["ralph.tool_calls"] == 1
+    assert attrs["ralph.permissions"] == 1
+    assert attrs["ralph.errors"] == ["boom"]
+    assert tool["attributes"]["ralph.tool.status"] == "completed"
+    assert tool["end_time_unix_nano"] >= tool["start_time_unix_nano"]
@@ -0,0 +1,147 @@
+"""Tests for transcript spooling and `ralph log`."""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+from ralph.cli import main
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.events import IterationStartEvent, TextEvent, ToolEndEvent, ToolStartEvent
+from ralph.transcript import Transcript, TranscriptWriter, find_run, list_runs
+
+
+def _write(tmp_path: Path, events: list, **kwargs) -> Transcript:
+    async def write() -> None:
+        writer = TranscriptWriter(tmp_path / "run", **kwargs)
+        writer.start()
+        for event in events:
+            writer.handle(event)
+            await asyncio.sleep(0)  # let the writer task take batches as they come
+        await writer.close()
+
+    asyncio.run(write())
+    return Transcript(tmp_path / "run")
+
+
+def _writer(tmp_path: Path, iterations: list[list[str]], **kwargs) -> Transcript:
+    events = []
+    for n, chunks in enumerate(iterations, 1):
+        events.append(IterationStartEvent(n, len(iterations)))
+        events.extend(TextEvent(chunk) for chunk in chunks)
+    return _write(tmp_path, events, **kwargs)
+
+
+def test_iterations_are_indexed_and_read_back(tmp_path: Path):
+    transcript = _writer(tmp_path, [["hello ", "world"], ["second\n", "turn"]])
+    entries = transcript.entries()
+    assert [e.iteration for e in entries] == [1, 2]
+    assert transcript.read(entries[0]) == b"=== iteration 1/2 ===\nhello world"
+    assert transcript.read(entries[1]) == b"=== iteration 2/2 ===\nsecond\nturn"
+
+
+def test_tool_events_get_their_own_lines(tmp_path: Path):
+    transcript = _write(tmp_path, [
+        IterationStartEvent(1, 1),
+        TextEvent("editing"),
+        ToolStartEvent("t1", "Edit"),
+        ToolEndEvent("t1", "completed"),
+    ])
+    assert transcript.read(transcript.entries()[0]).splitlines() == [
+        b"=== iteration 1/1 ===", b"editing", b"[tool] Edit (t1)", b"[tool completed] t1",
+    ]
+
+
+def test_segments_rotate_at_iteration_boundaries(tmp_path: Path):
+    transcript = _writer(tmp_path, [["a" * 50], ["b" * 50], ["c" * 10]], segment_bytes=40)
+    entries = transcript.entries()
+    assert [e.segment for e in entries] == ["000001.log", "000002.log", "000003.log"]
+    assert all(e.offset == 0 for e in entries)
+    assert transcript.read(entries[1]).endswith(b"b" * 50)
+
+
+def test_search_reports_iteration_and_line(tmp_path: Path):
+    transcript = _writer(tmp_path, [["no match\nerror: one\n"], ["fine\nok\nError: two"]])
+    pattern = re.compile(b"error", re.IGNORECASE)
+    hits = [(e.iteration, n, line) for e, n, line in transcript.search(pattern)]
+    assert hits == [(1, 3, b"error: one"), (2, 4, b"Error: two")]
+
+    second = [e for e in transcript.entries() if e.iteration == 2]
+    assert [n for _, n, _ in transcript.search(pattern, second)] == [4]
+
+
+def test_engine_spools_a_transcript(tmp_path: Path, capsys):
+    config = LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", "--promise-on", "2", "--tools", "1"],
+        working_dir=str(tmp_path),
+        max_iterations=5,
+        output="quiet",
+        checkpoint=False,
+        history=False,
+    )
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "complete"
+    transcript = find_run(str(tmp_path))
+    assert transcript.run_id == result.transcript
+    assert transcript.meta["prompt"] == "test prompt"
+    entries = transcript.entries()
+    assert [e.iteration for e in entries] == [1, 2]
+    assert b"DONE" in transcript.read(entries[1])
+    assert b"[tool]" in transcript.read(entries[0])
+
+    with pytest.raises(SystemExit) as exit:
+        main(["log", "-d", str(tmp_path), "-n", "2", "-s", "DONE"])
+    assert exit.value.code == 0
+    assert capsys.readouterr().out.startswith("2:")
+
+    with pytest.raises(SystemExit) as exit:
+        main(["log", result.transcript[:15], "-d", str(tmp_path), "-n", "7"])
+    assert exit.value.code == 1
+
+
+def test_engine_transcript_keeps_every_event_under_load(tmp_path: Path, monkeypatch):
+    import ralph.engine
+
+    # A tiny queue: the console output drops events, the transcript must not.
+    monkeypatch.setattr(ralph.engine, "OUTPUT_QUEUE_SIZE", 1)
+    config = LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=[
+            "-m", "ralph.fake_agent", "--promise", "DONE", "--promise-on", "3",
+            "--tools", "3", "--chunks", "50",
+        ],
+        working_dir=str(tmp_path),
+        output="quiet",
+        checkpoint=False,
+        history=False,
+    )
+    result = asyncio.run(RalphEngine(config).run())
+    transcript = find_run(str(tmp_path), result.transcript)
+    entries = transcript.entries()
+    assert [e.iteration for e in entries] == [1, 2, 3]
+    for entry in entries:
+        text = transcript.read(entry)
+        assert text.startswith(f"=== iteration {entry.iteration}/".encode())
+        assert text.count(b"[tool] ") == 3 and text.count(b"[tool completed] ") == 3
+
+
+def test_find_run(tmp_path: Path):
+    base = tmp_path / ".ralph" / "transcripts"
+    for run_id in ("20260101-000000-aaaa", "20260101-000000-aabb", "20260102-000000-cccc"):
+        (base / run_id).mkdir(parents=True)
+    assert [t.run_id for t in list_runs(str(tmp_path))][0] == "20260101-000000-aaaa"
+    assert find_run(str(tmp_path)).run_id == "20260102-000000-cccc"
+    assert find_run(str(tmp_path), "20260101-000000-aab").run_id == "20260101-000000-aabb"
+    with pytest.raises(LookupError, match="more than one"):
+        find_run(str(tmp_path), "20260101")
+    with pytest.raises(LookupError, match="no run"):
+        find_run(str(tmp_path), "1999")
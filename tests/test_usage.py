@@ -0,0 +1,87 @@
+"""Tests for token / cost accounting and budget stops."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+from ralph.engine import LoopConfig, RalphEngine
+from ralph.models import TokenUsage
+from ralph.usage import UsageMeter, estimate_tokens, usage_from_meta
+
+
+def test_usage_from_meta():
+    assert usage_from_meta({"usage": {"inputTokens": 10, "outputTokens": 5}}) == TokenUsage(10, 5)
+    assert usage_from_meta({"usage": {"input_tokens": 7, "cost_usd": 0.5}}) == TokenUsage(7, 0, 0.5)
+    assert usage_from_meta({"other": 1}) is None
+    assert usage_from_meta(None) is None
+    assert estimate_tokens(9) == 3
+
+
+def test_meter_prices_and_projects():
+    meter = UsageMeter(token_budget=3000, input_cost_per_mtok=3.0, output_cost_per_mtok=15.0)
+    assert meter.over_budget(prompt_tokens=500) is None
+    assert "token budget" in meter.over_budget(prompt_tokens=3001)
+
+    usage = meter.record(TokenUsage(1_000, 200))
+    assert usage.cost_usd == (1_000 * 3 + 200 * 15) / 1e6
+    meter.record(TokenUsage(1_000, 200, cost_usd=1.0))  # reported cost wins
+    assert meter.total.total_tokens == 2_400
+    assert meter.total.cost_usd == usage.cost_usd + 1.0
+    # The average turn (1200 tokens) no longer fits in the 600 left.
+    assert meter.projected(prompt_tokens=100)[0] == 1_200
+    assert "2400 used" in meter.over_budget(prompt_tokens=100)
+
+    spent = UsageMeter(cost_budget=1.5)
+    spent.record(TokenUsage(1, 1, cost_usd=1.0))
+    assert "cost budget" in spent.over_budget(prompt_tokens=1)
+
+
+def _config(tmp_path: Path, *agent_args: str, **overrides) -> LoopConfig:
+    return LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", "--promise-on", "3", *agent_args],
+        working_dir=str(tmp_path),
+        max_iterations=5,
+        output="quiet",
+        checkpoint=False,
+        history=False,
+        **overrides,
+    )
+
+
+def test_reported_usage_is_totalled(tmp_path: Path):
+    result = asyncio.run(RalphEngine(_config(tmp_path, "--usage", "1000", "200")).run())
+    assert result.state == "complete"
+    assert result.iteration_usage == [TokenUsage(1000, 200, 0.0)] * 3
+    assert result.usage == TokenUsage(3000, 600, 0.0)
+
+
+def test_unreported_usage_is_estimated(tmp_path: Path):
+    result = asyncio.run(RalphEngine(_config(tmp_path)).run())
+    first = result.iteration_usage[0]
+    assert first.estimated and result.usage.estimated
+    assert first.input_tokens == estimate_tokens(result.prompt_bytes[0])
+    assert first.output_tokens > 0
+
+
+def test_stops_before_going_over_budget(tmp_path: Path):
+    config = _config(tmp_path, "--usage", "1000", "200", token_budget=3000)
+    result = asyncio.run(RalphEngine(config).run())
+    assert result.state == "budget"
+    assert result.iterations == 2
+    assert result.usage.total_tokens == 2400
+    assert "token budget 3000" in result.error
+
+
+def test_prompt_is_sized_to_the_remaining_budget(tmp_path: Path):
+    unbounded = asyncio.run(RalphEngine(_config(tmp_path)).run())
+    assert unbounded.prompt_bytes[1] == unbounded.prompt_bytes[0]
+
+    result = asyncio.run(RalphEngine(_config(tmp_path, token_budget=2000)).run())
+    assert result.state == "complete"
+    # Iteration 2 can't afford the full system prompt + task again.
+    assert result.prompt_bytes[1] < result.prompt_bytes[0] / 2
@@ -0,0 +1,34 @@
+"""Tests for the verify command runner."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+from ralph.verify import VERIFY_TAIL_CHARS, run_verify
+
+
+def test_pass_and_fail(tmp_path: Path):
+    ok = asyncio.run(run_verify("echo fine", str(tmp_path), 10))
+    assert ok.ok and ok.returncode == 0 and ok.output == "fine\n"
+
+    bad = asyncio.run(run_verify("echo broken >&2; exit 3", str(tmp_path), 10))
+    assert not bad.ok and bad.returncode == 3 and "broken" in bad.output
+
+
+def test_runs_in_cwd_and_keeps_tail(tmp_path: Path):
+    (tmp_path / "marker").write_text("x")
+    script = "print('a' * 10000 + 'END')"
+    command = f'test -f marker && {sys.executable} -c "{script}"'
+    result = asyncio.run(run_verify(command, str(tmp_path), 10))
+    assert result.ok
+    assert len(result.output) == VERIFY_TAIL_CHARS
+    assert result.output.endswith("END\n")
+
+
+def test_timeout(tmp_path: Path):
+    result = asyncio.run(run_verify("sleep 30", str(tmp_path), 0.2))
+    assert not result.ok
+    assert result.returncode is None
+    assert result.seconds < 5
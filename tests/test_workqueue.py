@@ -0,0 +1,172 @@
+"""Tests for the SQLite work queue: leases, reclaiming and real worker processes."""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from ralph.checkpoint import Checkpoint, config_hash, save_checkpoint
+from ralph.engine import LoopConfig, LoopResult
+from ralph.workqueue import WorkQueue, _run_claimed
+
+
+def _config(tmp_path: Path, *agent_args: str) -> LoopConfig:
+    return LoopConfig(
+        prompt="test prompt",
+        promise_phrase="DONE",
+        command=sys.executable,
+        command_args=["-m", "ralph.fake_agent", "--promise", "DONE", *agent_args],
+        working_dir=str(tmp_path),
+        max_iterations=3,
+        timeout_seconds=60,
+        output="quiet",
+        checkpoint=False,
+    )
+
+
+def test_claims_by_priority_and_round_trips_config(tmp_path: Path):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    low = queue.enqueue(_config(tmp_path), "low")
+    high = queue.enqueue(_config(tmp_path, "--promise-on", "1"), "high", priority=5)
+
+    job = queue.claim("w1")
+    assert job is not None and job.id == high and job.claims == 1
+    assert job.config == _config(tmp_path, "--promise-on", "1")
+    assert queue.claim("w2").id == low
+    assert queue.claim("w3") is None
+
+    assert queue.complete(high, "w1", LoopResult("complete", 1, 0.5))
+    jobs = {j["id"]: j for j in queue.jobs()}
+    assert jobs[high]["status"] == "complete"
+    assert jobs[high]["result"]["iterations"] == 1
+    assert jobs[low]["status"] == "running" and jobs[low]["worker"] == "w2"
+
+
+def test_expired_lease_is_reclaimed_and_old_worker_fenced(tmp_path: Path):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    job_id = queue.enqueue(_config(tmp_path), "job")
+    assert queue.claim("crashed", lease=0.05).id == job_id
+    assert queue.claim("other") is None  # still leased
+
+    time.sleep(0.1)
+    job = queue.claim("other", lease=30)
+    assert job is not None and job.id == job_id and job.claims == 2
+    assert not queue.heartbeat(job_id, "crashed")
+    assert not queue.complete(job_id, "crashed", LoopResult("complete", 1, 0.1))
+    assert queue.heartbeat(job_id, "other")
+
+
+def test_job_fails_after_too_many_lost_workers(tmp_path: Path):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    queue.enqueue(_config(tmp_path), "cursed")
+    for n in range(2):
+        assert queue.claim(f"w{n}", lease=0.01, max_claims=2) is not None
+        time.sleep(0.03)
+
+    assert queue.claim("w2", max_claims=2) is None
+    [job] = queue.jobs()
+    assert job["status"] == "failed"
+    assert "worker lost" in job["result"]["error"]
+
+
+def test_release_requeues(tmp_path: Path):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    job_id = queue.enqueue(_config(tmp_path), "job")
+    queue.claim("w1")
+    assert queue.release(job_id, "w1")
+    assert queue.claim("w2").id == job_id
+
+
+def test_heartbeat_errors_are_retried(tmp_path: Path, monkeypatch):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    job_id = queue.enqueue(_config(tmp_path, "--delay", "0.4", "--promise-on", "2"), "job")
+    job = queue.claim("w1", lease=0.6)
+    renew = queue.heartbeat
+    failures = []
+
+    def flaky(*args):
+        if len(failures) < 2:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return renew(*args)
+
+    monkeypatch.setattr(queue, "heartbeat", flaky)
+    asyncio.run(_run_claimed(queue, job, "w1", 0.6, None))
+    [row] = queue.jobs()
+    assert row["id"] == job_id and row["status"] == "complete"
+    assert len(failures) == 2
+
+
+def test_loop_stops_before_an_unrenewable_lease_expires(tmp_path: Path, monkeypatch):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    queue.enqueue(_config(tmp_path, "--delay", "30"), "job")
+    job = queue.claim("w1", lease=0.5)
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(queue, "heartbeat", locked)
+    t0 = time.monotonic()
+    asyncio.run(_run_claimed(queue, job, "w1", 0.5, None))
+    assert time.monotonic() - t0 < 2
+    [row] = queue.jobs()
+    assert row["status"] == "running"  # left for the lease to expire and another worker
+
+
+def test_reclaimed_job_resumes_from_its_checkpoint(tmp_path: Path):
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    config = _config(tmp_path, "--promise-on", "1")
+    config.checkpoint = True
+    queue.enqueue(config, "job")
+    queue.claim("crashed", lease=0.01)
+    save_checkpoint(str(tmp_path), Checkpoint(config_hash(config), 2, 1.0))
+    time.sleep(0.03)
+
+    job = queue.claim("w2", lease=30)
+    assert job.claims == 2
+    asyncio.run(_run_claimed(queue, job, "w2", 30, None))
+    [row] = queue.jobs()
+    assert row["status"] == "complete"
+    assert row["result"]["iterations"] == 3  # iterations 1 and 2 were done before
+
+
+def test_job_with_attempts_runs_best_of(tmp_path: Path):
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run([*git, "init", "-q"], check=True)
+    subprocess.run([*git, "commit", "-q", "--allow-empty", "-m", "init"], check=True)
+    queue = WorkQueue(str(tmp_path / "q.db"))
+    config = _config(tmp_path, "--promise-on", "1", "--write", "out.txt")
+    config.attempts = 2
+    # Passes only inside an attempt's worktree, never in the checkout itself.
+    config.verify_command = "pwd | grep -q attempt-"
+    queue.enqueue(config, "job")
+
+    job = queue.claim("w1", lease=30)
+    asyncio.run(_run_claimed(queue, job, "w1", 30, None))
+    [row] = queue.jobs()
+    assert row["status"] == "complete"
+    # Only the winning attempt's change lands in the checkout.
+    assert (tmp_path / "out.txt").read_text() == "iteration 1\n"
+
+
+def test_worker_processes_drain_the_queue(tmp_path: Path):
+    db = str(tmp_path / "q.db")
+    queue = WorkQueue(db)
+    ids = [queue.enqueue(_config(tmp_path, "--promise-on", "2"), f"job-{n}") for n in range(4)]
+
+    worker = [sys.executable, "-m", "ralph", "worker", "-q", db, "--exit-when-empty"]
+    procs = [
+        subprocess.Popen([*worker, "--id", f"w{n}"], stdout=subprocess.DEVNULL)
+        for n in range(2)
+    ]
+    for proc in procs:
+        assert proc.wait(timeout=120) == 0
+
+    jobs = queue.jobs()
+    assert [j["id"] for j in jobs] == ids
+    assert all(j["status"] == "complete" and j["claims"] == 1 for j in jobs)
+    assert all(j["result"]["iterations"] == 2 for j in jobs)
@@ -0,0 +1,119 @@
+"""Tests for the incremental working-tree fingerprint."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from ralph.workspace import WorkspaceIndex
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    # Force a distinct mtime even on filesystems with coarse timestamps.
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture(params=["git", "walk"])
+def tree(request, tmp_path: Path):
+    if request.param == "git":
+        subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+        yield tmp_path
+    else:
+        with patch("ralph.workspace._git_files", return_value=None):
+            yield tmp_path
+
+
+def test_baseline_reports_nothing(tree: Path):
+    _write(tree / "a.py", "a")
+    index = WorkspaceIndex(str(tree))
+
+    assert not index.scan()
+    assert set(index.entries) == {"a.py"}
+    assert index.entries["a.py"].digest is None  # baseline reads no files
+    assert not index.scan()
+
+
+def test_added_modified_deleted(tree: Path):
+    _write(tree / "keep.py", "1")
+    _write(tree / "edit.py", "1")
+    _write(tree / "gone.py", "1")
+    index = WorkspaceIndex(str(tree))
+    index.scan()
+
+    _write(tree / "edit.py", "2")
+    (tree / "gone.py").unlink()
+    _write(tree / "pkg" / "new.py", "1")
+    changes = index.scan()
+
+    assert changes.added == ["pkg/new.py"]
+    assert changes.modified == ["edit.py"]
+    assert changes.deleted == ["gone.py"]
+    assert len(changes) == 3
+
+
+def test_identical_rewrite_is_not_a_change(tree: Path):
+    _write(tree / "a.py", "same")
+    index = WorkspaceIndex(str(tree))
+    index.scan()
+    _write(tree / "a.py", "other")
+    assert index.scan().modified == ["a.py"]
+
+    _write(tree / "a.py", "other")
+    assert not index.scan()
+
+
+def test_gitignore_is_honored(tree: Path):
+    (tree / ".gitignore").write_text("build/\n*.log\n")
+    index = WorkspaceIndex(str(tree))
+    index.scan()
+
+    _write(tree / "build" / "out.bin", "x")
+    _write(tree / "debug.log", "x")
+    _write(tree / ".ralph" / "checkpoint.json", "{}")
+    assert not index.scan()
+
+    _write(tree / "src.py", "x")
+    assert index.scan().added == ["src.py"]
+
+
+def test_fingerprint_tracks_content(tree: Path):
+    _write(tree / "a.py", "v1")
+    index = WorkspaceIndex(str(tree))
+    index.scan()
+    _write(tree / "a.py", "v1")
+    index.scan()
+    before = index.fingerprint
+
+    _write(tree / "a.py", "v2")
+    index.scan()
+    assert index.fingerprint != before
+
+    _write(tree / "a.py", "v1")
+    index.scan()
+    assert index.fingerprint == before
+
+
+def test_line_deltas(tree: Path):
+    _write(tree / "a.py", "1\n2\n")
+    _write(tree / "gone.py", "1\n")
+    index = WorkspaceIndex(str(tree))
+    index.scan()
+    _write(tree / "a.py", "1\n2\n3\n")
+    _write(tree / "b.py", "x\ny\n")
+    _write(tree / "blob.bin", "\0\n\n")
+    changes = index.scan()
+    # a.py had not been read before, so its old line count is unknown.
+    assert changes.line_deltas == {"b.py": 2}
+
+    _write(tree / "a.py", "1\n")
+    (tree / "b.py").unlink()
+    (tree / "gone.py").unlink()
+    changes = index.scan()
+    assert changes.line_deltas == {"a.py": -2, "b.py": -2}
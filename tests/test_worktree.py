@@ -0,0 +1,110 @@
+"""Tests for disposable git worktrees."""
+
+from __future__ import annotations
+
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from ralph.worktree import (
+    WorktreeError,
+    apply_diff,
+    create_worktree,
+    git_toplevel,
+    remove_worktree,
+    worktree_diff,
+)
+
+
+def _git(repo: Path, *args: str) -> None:
+    subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        check=True, capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "app.py").write_text("v1\n")
+    (tmp_path / "old.py").write_text("old\n")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-q", "-m", "init")
+    return tmp_path
+
+
+def test_worktree_mirrors_uncommitted_state(repo: Path):
+    (repo / "app.py").write_text("v2 (uncommitted)\n")
+    (repo / "notes.txt").write_text("untracked\n")
+    (repo / ".gitignore").write_text("*.log\n")
+    (repo / "debug.log").write_text("ignored\n")
+
+    wt = create_worktree(str(repo), "a")
+    try:
+        path = Path(wt.working_dir)
+        assert path.parent.parent == repo / ".ralph"
+        assert (path / "app.py").read_text() == "v2 (uncommitted)\n"
+        assert (path / "notes.txt").read_text() == "untracked\n"
+        assert not (path / "debug.log").exists()
+        assert worktree_diff(wt) == b""
+    finally:
+        remove_worktree(wt)
+    assert not wt.path.exists()
+
+
+def test_diff_applies_back(repo: Path):
+    (repo / "notes.txt").write_text("untracked\n")
+    wt = create_worktree(str(repo), "a")
+    path = Path(wt.working_dir)
+    (path / "app.py").write_text("v3\n")
+    (path / "old.py").unlink()
+    (path / "pkg").mkdir()
+    (path / "pkg" / "new.bin").write_bytes(b"\0\1\2")
+    (path / "notes.txt").write_text("edited\n")
+
+    patch = worktree_diff(wt)
+    remove_worktree(wt)
+    apply_diff(wt, patch)
+    assert (repo / "app.py").read_text() == "v3\n"
+    assert not (repo / "old.py").exists()
+    assert (repo / "pkg" / "new.bin").read_bytes() == b"\0\1\2"
+    assert (repo / "notes.txt").read_text() == "edited\n"
+
+
+def test_subdirectory_working_dir(repo: Path):
+    (repo / "sub").mkdir()
+    (repo / "sub" / "x.py").write_text("x\n")
+    wt = create_worktree(str(repo / "sub"), "a")
+    try:
+        assert git_toplevel(str(repo / "sub")) == repo.resolve()
+        assert (Path(wt.working_dir) / "x.py").read_text() == "x\n"
+    finally:
+        remove_worktree(wt)
+
+
+def test_concurrent_worktrees(repo: Path):
+    with ThreadPoolExecutor(4) as pool:
+        trees = list(pool.map(lambda n: create_worktree(str(repo), f"w{n}"), range(4)))
+    assert all((t.path / "app.py").read_text() == "v1\n" for t in trees)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(remove_worktree, trees))
+    assert not any(t.path.exists() for t in trees)
+
+
+def test_existing_worktree_is_not_taken_over(repo: Path):
+    wt = create_worktree(str(repo), "busy")
+    try:
+        (wt.path / "work.txt").write_text("in progress\n")
+        with pytest.raises(WorktreeError, match="already exists"):
+            create_worktree(str(repo), "busy")
+        assert (wt.path / "work.txt").exists()
+    finally:
+        remove_worktree(wt)
+
+
+def test_not_a_repository(tmp_path: Path):
+    assert git_toplevel(str(tmp_path)) is None
+    with pytest.raises(WorktreeError):
+        create_worktree(str(tmp_path), "a")